@@ -0,0 +1,81 @@
+import io
+import os
+import queue
+import threading
+
+from classes.social_network import calculate_internal_conflict, calculate_max_effort
+from main import read_social_network
+
+
+class LoadCancelled(Exception):
+	pass
+
+
+class CancellableFile(io.FileIO):
+	"""A file that stops the load on its next read once it is cancelled, even in the middle of a long line."""
+	def __init__(self, path: str, cancelled: threading.Event):
+		super().__init__(path, "r")
+		self.cancelled = cancelled
+
+	def readinto(self, buffer) -> int:
+		if self.cancelled.is_set():
+			raise LoadCancelled()
+		return super().readinto(buffer)
+
+
+class FileLoader:
+	"""
+	Loads a social network file in a background thread so the Tk main loop is never blocked by it.
+
+	The UI polls the loader periodically (with `after()`). Messages are tuples whose first element is the
+	message kind:
+	- ("progress", bytes_read, total_bytes, groups_parsed, n_groups)
+	- ("network", social_network)
+	- ("statistics", max_effort, internal_conflict)
+	- ("error", message)
+	"""
+	def __init__(self, file_path: str):
+		self.file_path = file_path
+		self.messages = queue.Queue()
+		self.cancelled = threading.Event()
+		self.thread = threading.Thread(target=self.load, daemon=True)
+
+	def start(self) -> None:
+		self.thread.start()
+
+	def load(self) -> None:
+		total_bytes = os.path.getsize(self.file_path)
+
+		def progress(bytes_read: int, groups_parsed: int, n_groups: int) -> None:
+			if self.cancelled.is_set():
+				raise LoadCancelled()
+			self.messages.put(("progress", bytes_read, total_bytes, groups_parsed, n_groups))
+
+		try:
+			with io.TextIOWrapper(io.BufferedReader(CancellableFile(self.file_path, self.cancelled))) as file:
+				social_network = read_social_network(file, progress)
+			self.messages.put(("network", social_network))
+
+			# The statistics need a full pass over the groups, so they are sent once they are ready
+			max_effort = calculate_max_effort(social_network)
+			internal_conflict = calculate_internal_conflict(social_network)
+			self.messages.put(("statistics", max_effort, internal_conflict))
+		except LoadCancelled:
+			pass
+		except Exception as e:
+			self.messages.put(("error", str(e)))
+
+	def poll(self) -> list:
+		"""Returns every message sent by the loader since the last call, without blocking."""
+		received = []
+		while True:
+			try:
+				received.append(self.messages.get_nowait())
+			except queue.Empty:
+				return received
+
+	def is_alive(self) -> bool:
+		return self.thread.is_alive()
+
+	def cancel(self) -> None:
+		self.cancelled.set()
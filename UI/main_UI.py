@@ -4,9 +4,16 @@ import sys
 # Add project root directory to PYTHONPATH
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import importlib
+
 import customtkinter as ctk
 from menu import Menu
-from result import Result
+
+# Pages built on their first use, by name: (module, class). The results page imports matplotlib, so it is
+# only loaded when the first result is shown
+LAZY_PAGES = {
+	"Result": ("result", "Result"),
+}
 
 
 class Main(ctk.CTk):
@@ -21,7 +28,7 @@ class Main(ctk.CTk):
 		ctk.set_default_color_theme("dark-blue") # Options: "blue", "green", "dark-blue"
 
 		# Create a container for frames
-		container = ctk.CTkFrame(self)
+		self.container = container = ctk.CTkFrame(self)
 		container.pack(side="top", fill="both", expand=True)
 		container.grid_rowconfigure(0, weight=1)
 		container.grid_columnconfigure(0, weight=1)
@@ -36,11 +43,8 @@ class Main(ctk.CTk):
 		# Dictionary to store frames
 		self.frames = {}
 
-		# Initialize frames
-		for F in (Menu, Result):
-			frame = F(container, self)
-			self.frames[F.__name__] = frame
-			frame.grid(row=0, column=0, sticky="nsew")
+		# Initialize the first frame (the others are built by get_frame)
+		self.add_frame("Menu", Menu)
 
 		# Show initial frame
 		self.show_frame("Menu")
@@ -52,10 +56,27 @@ class Main(ctk.CTk):
 		y = (screen_height // 2) - (height // 2)
 		self.geometry(f"{width}x{height}+{x}+{y}")
 
+	def add_frame(self, page_name, frame_class):
+		frame = frame_class(self.container, self)
+		self.frames[page_name] = frame
+		frame.grid(row=0, column=0, sticky="nsew")
+		return frame
+
+	def get_frame(self, page_name):
+		"""Returns the frame for the given page name, importing and building it the first time"""
+		if page_name not in self.frames:
+			if page_name not in LAZY_PAGES:
+				raise KeyError(f"Error: unknown page {page_name}")
+			module_name, class_name = LAZY_PAGES[page_name]
+			frame_class = getattr(importlib.import_module(module_name), class_name)
+			self.add_frame(page_name, frame_class)
+		return self.frames[page_name]
+
 	def show_frame(self, page_name):
 		"""Show a frame for the given page name"""
-		frame = self.frames[page_name]
+		frame = self.get_frame(page_name)
 		frame.tkraise()
+		return frame
 
 
 if __name__ == "__main__":
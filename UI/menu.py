@@ -4,9 +4,41 @@ from tkinter import filedialog, messagebox
 import customtkinter as ctk
 from PIL import Image
 
-from algorithms.wrappers import modciFB, modciPD, modciV
-from classes.social_network import SocialNetwork, calculate_internal_conflict
-from main import load_social_network_from_txt
+from algorithms.registry import SOLVERS
+from classes.social_network import SocialNetwork
+from file_loader import FileLoader
+from solver_worker import SolverWorker
+
+# Milliseconds between two polls of the solver worker and the file loader
+POLL_INTERVAL = 100
+# Size of the window and of its background
+WINDOW_SIZE = (700, 600)
+# Where the wallpapers resized to the window are kept between runs
+WALLPAPER_CACHE_DIR = os.path.join(os.path.dirname(__file__), "wallpapers", ".cache")
+
+
+def load_wallpaper(path, size):
+	"""
+	Opens a wallpaper at the given size. A wallpaper of another size is resized once and saved in
+	WALLPAPER_CACHE_DIR, so later runs open the resized copy (until the original changes).
+	"""
+	img = Image.open(path) # Only reads the header
+	if img.size == tuple(size):
+		return img
+
+	name, _ = os.path.splitext(os.path.basename(path))
+	cached_path = os.path.join(WALLPAPER_CACHE_DIR, f"{name}_{size[0]}x{size[1]}.png")
+	if os.path.exists(cached_path) and os.path.getmtime(cached_path) >= os.path.getmtime(path):
+		img.close()
+		return Image.open(cached_path)
+
+	img = img.resize(size)
+	try:
+		os.makedirs(WALLPAPER_CACHE_DIR, exist_ok=True)
+		img.save(cached_path)
+	except OSError as e: # A read-only installation only loses the cache
+		print(f"Could not cache {cached_path}: {e}")
+	return img
 
 
 class Menu(ctk.CTkFrame):
@@ -21,9 +53,8 @@ class Menu(ctk.CTkFrame):
 		bg_path = os.path.join(os.path.dirname(__file__), "wallpapers", "page1.png")
 
 		if os.path.exists(bg_path):
-			img = Image.open(bg_path)
-			img = img.resize((700, 600))
-			self.bg_image = ctk.CTkImage(light_image=img, dark_image=img, size=(700, 600))
+			img = load_wallpaper(bg_path, WINDOW_SIZE)
+			self.bg_image = ctk.CTkImage(light_image=img, dark_image=img, size=WINDOW_SIZE)
 			self.bg_label = ctk.CTkLabel(self, image=self.bg_image, text="")
 			self.bg_label.place(relx=0.5, rely=0.5,anchor="center")
 		else:
@@ -61,11 +92,21 @@ class Menu(ctk.CTkFrame):
 		)
 		self.lbl_file_path.pack(pady=5) #5
 
-		# Algorithm selection
+		# Statistics of the loaded network
+		self.lbl_statistics = ctk.CTkLabel(
+			main_frame,
+			text="",
+			text_color="gray",
+			font=("Segoe UI", 12)
+		)
+		self.lbl_statistics.pack(pady=5)
+
+		# Algorithm selection (the solver names by label)
+		self.algorithms = {info.label: name for name, info in SOLVERS.items()}
 		self.algorithm_var = ctk.StringVar(value="Select algorithm")
 		self.dropdown_algorithm = ctk.CTkOptionMenu(
 			main_frame,
-			values=["Greedy", "Brute force", "Dynamic programming"],
+			values=list(self.algorithms),
 			variable=self.algorithm_var,
 			width=200,
 			height=35,
@@ -82,23 +123,125 @@ class Menu(ctk.CTkFrame):
 			height=40,
 			corner_radius=10,
 			fg_color="#3B82F6",
-			hover_color="#2563EB"
+			hover_color="#2563EB",
+			state="disabled" # Enabled once a network is loaded
 		)
 		self.btn_run.pack(pady=25) # 25
 
+		# Progress of the file being loaded or of the running algorithm (only shown while they run)
+		self.progress_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+
+		self.progress_bar = ctk.CTkProgressBar(self.progress_frame, width=200)
+		self.progress_bar.set(0)
+		self.progress_bar.pack(pady=5)
+
+		self.lbl_progress = ctk.CTkLabel(
+			self.progress_frame,
+			text="",
+			text_color="gray",
+			font=("Segoe UI", 12)
+		)
+		self.lbl_progress.pack(pady=5)
+
+		self.btn_cancel = ctk.CTkButton(
+			self.progress_frame,
+			text="Cancel",
+			command=self.cancel,
+			width=200,
+			height=30,
+			corner_radius=10,
+			fg_color="#EF4444",
+			hover_color="#DC2626"
+		)
+		self.btn_cancel.pack(pady=5)
+
+		self.worker = None
+		self.loader = None
+
 	def load_file(self):
 		file_path = filedialog.askopenfilename(filetypes=[("TXT Files", "*.txt")])
 		if file_path:
-			try:
-				social_network = load_social_network_from_txt(file_path)
+			# The previous network is discarded, so nothing can run until the new one is ready
+			self.controller.social_network = None
+			self.controller.file_path = None
+
+			self.loader = FileLoader(file_path)
+			self.loader.start()
+
+			self.btn_run.configure(state="disabled")
+			self.btn_load.configure(state="disabled")
+			self.lbl_file_path.configure(text=f"Loading: {os.path.basename(file_path)}")
+			self.lbl_statistics.configure(text="")
+			self.progress_bar.set(0)
+			self.lbl_progress.configure(text="Reading file...")
+			self.progress_frame.pack(pady=5)
+
+			self.after(POLL_INTERVAL, self.poll_loader)
+
+	def poll_loader(self):
+		if self.loader is None: # Cancelled
+			return
+
+		for message in self.loader.poll():
+			kind = message[0]
+			if kind == "progress":
+				_, bytes_read, total_bytes, groups_parsed, n_groups = message
+				self.progress_bar.set(bytes_read / total_bytes if total_bytes > 0 else 0)
+				self.lbl_progress.configure(text=f"{bytes_read}/{total_bytes} bytes · {groups_parsed}/{n_groups} groups")
+			elif kind == "network":
+				social_network = message[1]
 				if not isinstance(social_network, SocialNetwork):
-					raise ValueError("Error: the file did not generate a valid social network")
+					self.finish_loading()
+					messagebox.showerror("Error", "Could not load file: the file did not generate a valid social network")
+					return
 				self.controller.social_network = social_network
-				self.controller.file_path = file_path
-				self.lbl_file_path.configure(text=f"✅ Loaded: {os.path.basename(file_path)}")
-				messagebox.showinfo("Success", "File loaded successfully.")
-			except Exception as e:
-				messagebox.showerror("Error", f"Could not load file: {e}")
+				self.lbl_statistics.configure(
+					text=f"{len(social_network.groups)} groups · R_max = {social_network.r_max}"
+				)
+			elif kind == "statistics":
+				_, max_effort, internal_conflict = message
+				social_network = self.controller.social_network
+				self.controller.file_path = self.loader.file_path
+				self.controller.original_conflict = internal_conflict
+				self.lbl_statistics.configure(
+					text=f"{len(social_network.groups)} groups · R_max = {social_network.r_max}\n"
+						 f"Max effort = {max_effort} · IC = {internal_conflict:.2f}"
+				)
+				self.lbl_file_path.configure(text=f"✅ Loaded: {os.path.basename(self.loader.file_path)}")
+				self.finish_loading()
+				self.btn_run.configure(state="normal")
+				return
+			elif kind == "error":
+				self.controller.social_network = None
+				self.lbl_file_path.configure(text="No file loaded")
+				self.finish_loading()
+				messagebox.showerror("Error", f"Could not load file: {message[1]}")
+				return
+
+		if not self.loader.is_alive() and self.loader.messages.empty():
+			# Cancelled from the loader thread side
+			self.finish_loading()
+			return
+
+		self.after(POLL_INTERVAL, self.poll_loader)
+
+	def finish_loading(self):
+		self.loader.cancel()
+		self.loader = None
+
+		self.progress_frame.pack_forget()
+		self.btn_load.configure(state="normal")
+
+	def cancel(self):
+		if self.loader is not None:
+			self.controller.social_network = None
+			self.lbl_file_path.configure(text="No file loaded")
+			self.lbl_statistics.configure(text="")
+			self.finish_loading()
+			print("Loading cancelled")
+		elif self.worker is not None:
+			self.finish_algorithm()
+			print("Algorithm cancelled")
 
 	def run_algorithm(self):
 		if not self.controller.social_network:
@@ -110,31 +253,85 @@ class Menu(ctk.CTkFrame):
 			messagebox.showwarning("Warning", "Please select a valid algorithm.")
 			return
 
-		try:
-			print(f"Running algorithm: {algorithm}")
+		print(f"Running algorithm: {algorithm}")
+
+		self.worker = SolverWorker(self.algorithms[algorithm], self.controller.social_network)
+		self.worker.start()
 
-			if algorithm == "Greedy":
-				result = modciV(self.controller.social_network)
-			elif algorithm == "Brute force":
-				result = modciFB(self.controller.social_network)
-			elif algorithm == "Dynamic programming":
-				result = modciPD(self.controller.social_network)
+		self.btn_run.configure(state="disabled")
+		self.btn_load.configure(state="disabled")
+		self.progress_bar.set(0)
+		self.lbl_progress.configure(text="Starting...")
+		self.progress_frame.pack(pady=5)
+
+		self.after(POLL_INTERVAL, self.poll_algorithm)
+
+	def poll_algorithm(self):
+		if self.worker is None: # Cancelled
+			return
 
-			if not isinstance(result, tuple) or len(result) != 3:
+		if self.handle_algorithm_messages(self.worker.poll()):
+			return
+
+		if not self.worker.is_alive():
+			# The worker may have sent its result and exited after the queue was read
+			if self.handle_algorithm_messages(self.worker.poll()):
+				return
+			self.finish_algorithm()
+			messagebox.showerror("Error", "The algorithm stopped unexpectedly.")
+			return
+
+		self.after(POLL_INTERVAL, self.poll_algorithm)
+
+	def handle_algorithm_messages(self, messages):
+		"""Shows the messages of the solver worker. Returns if the algorithm finished (with a result or an error)."""
+		for message in messages:
+			kind = message[0]
+			if kind == "progress":
+				_, done, total, explored = message
+				self.show_progress(done, total, explored)
+			elif kind == "result":
+				self.finish_algorithm()
+				self.show_algorithm_result(message[1])
+				return True
+			elif kind == "error":
+				self.finish_algorithm()
+				print(f"Error: {message[1]}")
+				messagebox.showerror("Error", f"An error occurred while running the algorithm: {message[1]}")
+				return True
+
+		return False
+
+	def show_progress(self, done, total, explored):
+		self.progress_bar.set(done / total if total > 0 else 0)
+
+		eta = self.worker.eta(done, total)
+		eta_text = f"{eta:.1f} s" if eta != float("inf") else "unknown"
+		self.lbl_progress.configure(text=f"{done}/{total} done · {explored} states explored · ETA {eta_text}")
+
+	def finish_algorithm(self):
+		self.worker.cancel()
+		self.worker = None
+
+		self.progress_frame.pack_forget()
+		self.btn_run.configure(state="normal")
+		self.btn_load.configure(state="normal")
+
+	def show_algorithm_result(self, result):
+		try:
+			if not isinstance(result, tuple) or len(result) != 4:
 				raise ValueError(f"Error: invalid algorithm result ({result})")
 
-			strategy, effort, conflict = result
+			strategy, effort, conflict, optimality = result
 
 			self.controller.strategy = strategy
 			self.controller.effort = effort
 			self.controller.conflict = conflict
-			self.controller.original_conflict = calculate_internal_conflict(self.controller.social_network)
 
 			# Switch to results page
-			self.controller.show_frame("Result")
-			results_page = self.controller.frames["Result"]
-			results_page.show_result(strategy, effort, conflict)
+			results_page = self.controller.show_frame("Result")
+			results_page.show_result(strategy, effort, conflict, optimality)
 
 		except Exception as e:
 			print(f"Error: {e}")
-			messagebox.showerror("Error", f"An error occurred while running the algorithm: {e}")
\ No newline at end of file
+			messagebox.showerror("Error", f"An error occurred while running the algorithm: {e}")
@@ -2,10 +2,18 @@ from tkinter import messagebox
 
 import customtkinter as ctk
 import matplotlib.pyplot as plt
+import numpy as np
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 from main import write_output
 
+# Above this number of groups, groups are aggregated onto the opinion grid before plotting
+AGGREGATION_THRESHOLD = 2000
+# Opinions are integers in [-100, 100], so the opinion grid has 201 x 201 cells
+GRID_SIZE = 201
+# Marker area of the largest aggregated cell
+MAX_CELL_AREA = 400
+
 
 class Result(ctk.CTkFrame):
 	def __init__(self, parent, controller):
@@ -40,6 +48,25 @@ class Result(ctk.CTkFrame):
 		self.canvas_widget = self.canvas.get_tk_widget()
 		self.canvas_widget.pack(fill="both", expand=True)
 
+		# Artists are created once and only their offsets and sizes are updated on every run
+		empty = np.empty((0, 2))
+		self.scatter_orig = self.ax.scatter(empty[:, 0], empty[:, 1], alpha=0.5, color="blue", label="Original")
+		self.scatter_mod = self.ax.scatter(empty[:, 0], empty[:, 1], alpha=0.5, color="red", label="Moderated")
+
+		# Add reference lines at x=0 and y=0
+		self.ax.axhline(y=0, color="gray", linestyle="--", alpha=0.3)
+		self.ax.axvline(x=0, color="gray", linestyle="--", alpha=0.3)
+
+		# Set labels and title
+		self.ax.set_xlabel("Opinion 1")
+		self.ax.set_ylabel("Opinion 2")
+		self.ax.set_title("Opinion distribution in social network")
+		self.ax.legend()
+
+		# Set axis limits to show the full range of possible opinions
+		self.ax.set_xlim(-110, 110)
+		self.ax.set_ylim(-110, 110)
+
 		# Labels for effort and conflict
 		self.results_frame = ctk.CTkFrame(main_frame)
 		self.results_frame.pack(fill="x", pady=10)
@@ -59,47 +86,28 @@ class Result(ctk.CTkFrame):
 		)
 		self.btn_save.pack(pady=10)
 
-	def show_result(self, strategy, effort, conflict):
-		self.ax.clear()
-
+	def show_result(self, strategy, effort, conflict, optimality="unknown"):
 		# Get the original social network
 		original_network = self.controller.social_network
 
-		# This is the same for both networks
-		o_1 = [group.o_1 for group in original_network.groups]
-		o_2 = [group.o_2 for group in original_network.groups]
+		offsets, sizes_orig, sizes_mod = plot_arrays(original_network.groups, strategy)
 
-		# Extract data for plotting
-		# Original network data
-		sizes_orig = [group.n * 20 for group in original_network.groups] # Scale for visibility
+		self.scatter_orig.set_offsets(offsets)
+		self.scatter_orig.set_sizes(sizes_orig)
+		self.scatter_mod.set_offsets(offsets)
+		self.scatter_mod.set_sizes(sizes_mod)
 
-		# Moderated network data
-		sizes_mod = [e * 20 for e in strategy] # Scale for visibility
+		if len(original_network.groups) > AGGREGATION_THRESHOLD:
+			self.ax.set_title("Opinion distribution in social network (aggregated by opinion)")
+		else:
+			self.ax.set_title("Opinion distribution in social network")
 
-		# Create scatter plots
-		scatter_orig = self.ax.scatter(o_1, o_2, s=sizes_orig, alpha=0.5, color="blue", label="Original")
-		scatter_mod = self.ax.scatter(o_1, o_2, s=sizes_mod, alpha=0.5, color="red", label="Moderated")
-
-		# Add reference lines at x=0 and y=0
-		self.ax.axhline(y=0, color="gray", linestyle="--", alpha=0.3)
-		self.ax.axvline(x=0, color="gray", linestyle="--", alpha=0.3)
-
-		# Set labels and title
-		self.ax.set_xlabel("Opinion 1")
-		self.ax.set_ylabel("Opinion 2")
-		self.ax.set_title("Opinion distribution in social network")
-		self.ax.legend()
-
-		# Set axis limits to show the full range of possible opinions
-		self.ax.set_xlim(-110, 110)
-		self.ax.set_ylim(-110, 110)
-
-		self.canvas.draw()
+		self.canvas.draw_idle()
 
 		# Update labels
 		self.lbl_effort.configure(text=f"Effort: {effort}")
 		self.lbl_original_conflict.configure(text="Original conflict: " + str(self.controller.original_conflict))
-		self.lbl_moderated_conflict.configure(text=f"New conflict: {conflict}")
+		self.lbl_moderated_conflict.configure(text=f"New conflict: {conflict} ({optimality})")
 
 	def save_results(self):
 		if not self.controller.social_network or not hasattr(self.controller, "strategy"):
@@ -111,3 +119,47 @@ class Result(ctk.CTkFrame):
 			messagebox.showinfo("Success", "Results saved in \"output.txt\"")
 		except Exception as e:
 			messagebox.showerror("Error", f"Could not save the file: {e}")
+
+
+def plot_arrays(groups, strategy):
+	"""
+	Builds the scatter plot offsets and marker sizes of the original and moderated networks.
+
+	Up to `AGGREGATION_THRESHOLD` groups, every group is a point whose size is proportional to its number
+	of agents (original) or to its number of moderated agents (moderated). Above it, groups are summed
+	onto the 201 x 201 opinion grid and every non-empty cell is a point, so the number of points (and the
+	drawing time) is bounded no matter how large the network is.
+
+	Parameters
+	----------
+	groups : List[AgentGroup]
+		The agent groups of the original network.
+	strategy : List[int]
+		The number of moderated agents per group.
+
+	Returns
+	-------
+	Tuple[NDArray, NDArray, NDArray]
+		The (x, y) offsets of the points and the marker sizes of the original and moderated points.
+	"""
+	# One vectorized conversion of the groups into columns: n, o_1, o_2, r
+	columns = np.array(groups, dtype=float).reshape(-1, 4)
+	n, o_1, o_2 = columns[:, 0], columns[:, 1], columns[:, 2]
+	moderated = np.asarray(strategy, dtype=float)
+
+	if len(groups) <= AGGREGATION_THRESHOLD:
+		return np.column_stack((o_1, o_2)), n * 20, moderated * 20 # Scale for visibility
+
+	cells = (o_1.astype(int) + 100) * GRID_SIZE + (o_2.astype(int) + 100)
+	agents_per_cell = np.bincount(cells, weights=n, minlength=GRID_SIZE * GRID_SIZE)
+	moderated_per_cell = np.bincount(cells, weights=moderated, minlength=GRID_SIZE * GRID_SIZE)
+
+	occupied = np.flatnonzero(agents_per_cell)
+	if len(occupied) == 0:
+		return np.empty((0, 2)), np.empty(0), np.empty(0)
+
+	offsets = np.column_stack((occupied // GRID_SIZE - 100, occupied % GRID_SIZE - 100))
+
+	# Both series are scaled by the largest original cell so that their sizes remain comparable
+	scale = MAX_CELL_AREA / agents_per_cell[occupied].max()
+	return offsets, agents_per_cell[occupied] * scale, moderated_per_cell[occupied] * scale
@@ -0,0 +1,88 @@
+import multiprocessing
+import queue
+import time
+from typing import Optional
+
+from classes.social_network import SocialNetwork
+
+# Minimum number of seconds between two progress messages sent by the worker
+PROGRESS_PERIOD = 0.1
+
+
+def solve_in_worker(algorithm: str, social_network: SocialNetwork, messages: multiprocessing.Queue,
+					options: Optional[dict] = None) -> None:
+	"""
+	Runs a solver (by its name in `algorithms.registry.SOLVERS`) inside the worker process and reports its progress and result through a queue.
+
+	Messages are tuples whose first element is the message kind:
+	- ("progress", done, total, explored)
+	- ("result", (strategy, effort, conflict, optimality))
+	- ("error", message)
+	"""
+	# Imported here so the solvers are only loaded in the worker process
+	from algorithms.wrappers import modci
+
+	last_report = 0.0
+
+	def progress(done: int, total: int, explored: int) -> None:
+		nonlocal last_report
+		now = time.monotonic()
+		if now - last_report >= PROGRESS_PERIOD or done == total:
+			last_report = now
+			messages.put(("progress", done, total, explored))
+
+	try:
+		result = modci(algorithm, social_network, progress, options=options)
+		messages.put(("result", tuple(result)))
+	except Exception as e:
+		messages.put(("error", str(e)))
+
+
+class SolverWorker:
+	"""
+	Runs a solver in a separate process so the Tk main loop is never blocked by it.
+
+	The UI starts the worker, polls it periodically (with `after()`) to get progress and the result,
+	and can cancel it at any time, which terminates the process.
+	"""
+	def __init__(self, algorithm: str, social_network: SocialNetwork, options: Optional[dict] = None):
+		# Spawned (not forked) so the child does not inherit the Tk interpreter state
+		context = multiprocessing.get_context("spawn")
+		self.messages = context.Queue()
+		self.process = context.Process(
+			target=solve_in_worker,
+			args=(algorithm, social_network, self.messages, options),
+			daemon=True
+		)
+		self.start_time = None
+
+	def start(self) -> None:
+		self.start_time = time.monotonic()
+		self.process.start()
+
+	def poll(self) -> list:
+		"""Returns every message sent by the worker since the last call, without blocking."""
+		received = []
+		while True:
+			try:
+				received.append(self.messages.get_nowait())
+			except queue.Empty:
+				return received
+
+	def is_alive(self) -> bool:
+		return self.process.is_alive()
+
+	def elapsed(self) -> float:
+		return time.monotonic() - self.start_time if self.start_time is not None else 0.0
+
+	def eta(self, done: int, total: int) -> float:
+		"""Estimates the remaining seconds from the elapsed time and the fraction of work done."""
+		if done <= 0 or total <= 0:
+			return float("inf")
+		return self.elapsed() * (total - done) / done
+
+	def cancel(self) -> None:
+		if self.process.is_alive():
+			self.process.terminate()
+		self.process.join()
+		self.messages.close()
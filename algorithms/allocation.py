@@ -0,0 +1,331 @@
+import heapq
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from numpy.typing import NDArray
+
+from algorithms.dynamic import dynamic_bottom_up, fill_layer_slice, network_options
+from classes.social_network import SocialNetwork, calculate_max_effort
+
+# Maximum number of (budget, choice) pairs evaluated at once by `min_plus_merge`
+MERGE_CHUNK_CELLS = 1 << 22
+# Maximum number of bisection steps on the multiplier of the Lagrangian bound
+MAX_BISECTION_STEPS = 200
+# Relative width of the multiplier interval at which the bisection stops
+BISECTION_TOLERANCE = 1e-9
+# Larger than any conflict numerator, and small enough that two of them do not overflow int64
+NO_CONFLICT_BOUND = np.iinfo(np.int64).max // 4
+
+
+class BudgetAllocation(NamedTuple):
+	budgets: List[int] # Effort given to every network
+	strategies: List[List[int]] # Optimal strategy of every network with its budget
+	conflict: int # Total conflict numerator ∑ (n_i - e_i) * (o_i,1 - o_i,2)² left in all the networks
+
+
+def conflict_curve(social_network: SocialNetwork, max_budget: int) -> NDArray[np.int64]:
+	"""
+	Returns the least conflict numerator left in a network with an effort of at most b, for every budget
+	b = 0..min(max_budget, max effort): the last row of the DP of `dynamic_bottom_up` without the trimming
+	by R_max, which keeps every budget. The R_max of the network is ignored. The curve is non-increasing,
+	and larger budgets give its last value.
+	"""
+	width = min(max_budget, calculate_max_effort(social_network)) + 1
+	previous = np.zeros(width)
+	current = np.empty(width)
+	prefix_effort = 0
+
+	for efforts, conflicts in network_options(social_network):
+		prefix_effort += int(efforts[-1])
+
+		# Larger budgets than the effort of fully moderating the groups so far give the same result
+		high = min(width - 1, prefix_effort)
+		# No decisions: the strategy is solved again for one budget
+		fill_layer_slice(previous, current, None, efforts, conflicts, 0, high + 1)
+		current[high + 1:] = current[high]
+		previous, current = current, previous
+
+	return np.rint(previous).astype(np.int64)
+
+
+def is_convex(curve: NDArray[np.int64]) -> bool:
+	"""Whether the conflict removed by every extra unit of effort never increases along the curve."""
+	return bool(np.all(np.diff(curve, n=2) >= 0))
+
+
+def min_plus_merge(left: NDArray[np.int64], right: NDArray[np.int64], width: int) -> Tuple[NDArray[np.int64], NDArray[np.integer]]:
+	"""
+	Returns merged[s] = min over x of left[s - x] + right[x] for s = 0..width-1 (only the pairs inside both
+	curves), and the smallest x reaching it. Every row of sums is evaluated with NumPy over a sliding
+	window of `left`, in chunks of at most MERGE_CHUNK_CELLS pairs.
+	"""
+	choices_count = min(len(right), width)
+	right = right[:choices_count]
+
+	# padded[s + choices_count - 1 - x] = left[s - x], +∞ outside left
+	padded = np.full(width + choices_count - 1, NO_CONFLICT_BOUND, dtype=np.int64)
+	count = min(len(left), width)
+	padded[choices_count - 1:choices_count - 1 + count] = left[:count]
+	windows = sliding_window_view(padded, choices_count)[:, ::-1] # windows[s, x] = left[s - x]
+
+	merged = np.empty(width, dtype=np.int64)
+	choices = np.empty(width, dtype=np.min_scalar_type(choices_count - 1))
+	rows = max(1, MERGE_CHUNK_CELLS // choices_count)
+	for start in range(0, width, rows):
+		totals = windows[start:start + rows] + right
+		best = np.argmin(totals, axis=1) # The first minimum, so the smallest x
+		merged[start:start + rows] = totals[np.arange(len(best)), best]
+		choices[start:start + rows] = best
+
+	return merged, choices
+
+
+def next_segment(curve: NDArray[np.int64], budget: int) -> Tuple[float, int]:
+	"""
+	Returns the next segment of the lower convex hull of a curve from one of its vertices: the largest
+	conflict removed per unit of effort from `budget` to a larger budget, and the largest budget reaching it.
+	"""
+	rates = (curve[budget] - curve[budget + 1:]) / np.arange(1, len(curve) - budget)
+	last = len(rates) - 1 - int(np.argmax(rates[::-1]))
+	return float(rates[last]), budget + last + 1
+
+
+def hull_split(curves: List[NDArray[np.int64]], total_budget: int, start: NDArray[np.int64]) -> NDArray[np.int64]:
+	"""
+	Splits total_budget with the greedy of the fractional knapsack on the lower convex hulls of the
+	curves, from a split `start` of hull vertices: the next segments of the hulls are taken by decreasing
+	conflict removed per unit of effort while they fit (a curve stops at the first one that does not fit).
+	The budget left goes to the curves whose segment did not fit, in the same order.
+	"""
+	split = start.copy()
+	remaining_budget = total_budget - int(split.sum())
+	heap = []
+	for j, curve in enumerate(curves):
+		if split[j] < len(curve) - 1:
+			rate, budget = next_segment(curve, int(split[j]))
+			heap.append((-rate, j, budget))
+	heapq.heapify(heap)
+
+	blocked = []
+	while heap:
+		_, j, budget = heapq.heappop(heap)
+		if budget - split[j] > remaining_budget:
+			blocked.append(j)
+			continue
+		remaining_budget -= budget - int(split[j])
+		split[j] = budget
+		if budget < len(curves[j]) - 1:
+			rate, budget = next_segment(curves[j], budget)
+			heapq.heappush(heap, (-rate, j, budget))
+
+	for j in blocked:
+		if remaining_budget <= 0:
+			break
+		curve = curves[j]
+		budget = min(len(curve) - 1, int(split[j]) + remaining_budget)
+		budget = int(np.argmax(curve <= curve[budget])) # The smallest budget with the same conflict
+		remaining_budget -= budget - int(split[j])
+		split[j] = budget
+
+	return split
+
+
+class LagrangianSpans(NamedTuple):
+	"""
+	The Lagrangian relaxation of a split of total_budget between curves f_j, at a multiplier λ >= 0.
+
+	L(λ) = ∑ min_b (f_j(b) + λ * b) - λ * total_budget is a lower bound on the conflict of every split, and a
+	split that gives b_j to curve j costs at least L(λ) plus the excess ∑ (f_j(b_j) + λ * b_j - minimums[j]).
+	A known split of conflict U bounds the excess of the optimal one, and of any subset of its curves, by
+	gap = U - L(λ).
+	"""
+	lows: NDArray[np.int64] # Lowest budget of every curve whose excess fits in the gap
+	highs: NDArray[np.int64] # Highest budget of every curve whose excess fits in the gap
+	minimums: NDArray[np.float64] # min_b (f_j(b) + λ * b) of every curve
+	multiplier: float
+	lower_bound: float
+	gap: float
+
+
+def candidate_budgets(curves: List[NDArray[np.int64]], total_budget: int) -> LagrangianSpans:
+	"""
+	Computes the Lagrangian relaxation of a split of total_budget between the curves (see
+	`LagrangianSpans`) and the budgets of every curve that it cannot rule out. The multiplier λ is found by
+	bisection as the smallest one whose minimizers use at most total_budget; from those minimizers,
+	`hull_split` spends the rest of the budget on the hull segments, and that split is the known one that
+	bounds the gap.
+	"""
+	lengths = np.array([len(curve) for curve in curves], dtype=np.int64)
+	starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+	owners = np.repeat(np.arange(len(curves)), lengths)
+	budgets = np.arange(int(lengths.sum())) - starts[owners]
+	conflicts = np.concatenate(curves).astype(np.float64)
+
+	def minimizers(multiplier: float) -> Tuple[NDArray[np.float64], NDArray[np.float64], NDArray[np.int64]]:
+		values = conflicts + multiplier * budgets
+		minimums = np.minimum.reduceat(values, starts)
+		# The smallest budget reaching the minimum of every curve
+		smallest = np.minimum.reduceat(np.where(values <= minimums[owners], budgets, len(budgets)), starts)
+		return values, minimums, smallest
+
+	# Above the largest gain of one unit of effort every curve takes budget 0
+	low, high = 0.0, float(np.max(conflicts[:-1] - conflicts[1:], initial=0.0)) + 1
+	if minimizers(low)[2].sum() <= total_budget:
+		high = low
+	for _ in range(MAX_BISECTION_STEPS):
+		if high - low <= BISECTION_TOLERANCE * high:
+			break # Any λ gives a lower bound; closer ones only tighten it marginally
+		middle = (low + high) / 2
+		if minimizers(middle)[2].sum() > total_budget:
+			low = middle
+		else:
+			high = middle
+
+	values, minimums, smallest = minimizers(high)
+	lower_bound = float(minimums.sum()) - high * total_budget
+	# The smallest minimizers are vertices of the hulls, and every hull segment before them is steeper than λ
+	split = hull_split(curves, total_budget, smallest)
+	upper_bound = sum(int(curve[b]) for curve, b in zip(curves, split))
+
+	# Keep the budgets whose term fits in the gap, with some slack for the rounding of the floats
+	gap = (upper_bound - lower_bound) + 1e-9 * upper_bound + 1e-6
+	candidate = values - minimums[owners] <= gap
+	lows = np.minimum.reduceat(np.where(candidate, budgets, len(budgets)), starts)
+	highs = np.maximum.reduceat(np.where(candidate, budgets, -1), starts)
+
+	return LagrangianSpans(lows, highs, minimums, high, max(lower_bound, 0.0), gap)
+
+
+def allocate_budget(social_networks: List[SocialNetwork], total_budget: int,
+					stats: Optional[dict] = None) -> BudgetAllocation:
+	"""
+	Splits one moderation budget between independent social networks so that the total conflict left in
+	all of them is minimal, and returns the budget and the optimal strategy of every network.
+
+	This is the optimum of the network that concatenates all the groups with R_max = total_budget, which
+	`dynamic_bottom_up` solves in O(∑ n * total_budget * max(n_i)). Instead, the conflict curve of every
+	network (`conflict_curve`) is computed once, up to its own max effort, and the curves are combined:
+
+	- Convex curves, where every extra unit of effort removes no more conflict than the previous one, are
+	  combined exactly into one convex curve by taking the largest marginal gains of all of them, sorted
+	  once.
+	- That curve and the other ones are combined with `min_plus_merge`, keeping the best split of every
+	  sum of budgets to recover the budget of every curve afterwards. Every curve only takes part with the
+	  budgets that the Lagrangian bound of `candidate_budgets` cannot rule out, so each merge only spans
+	  the sums those budgets reach.
+
+	Finally, every network is solved with `dynamic_bottom_up` at its budget (lowered to the smallest budget
+	with the same conflict). The R_max of the networks is ignored.
+
+	Parameters
+	----------
+	social_networks : List[SocialNetwork]
+		The networks that share the budget.
+	total_budget : int
+		The effort available for all of them.
+	stats : dict, optional
+		If given, it is filled with "convex_networks", "candidate_budgets" (budgets of all the curves left
+		after the Lagrangian bound), "budgets_total" (budgets of all the curves), "lower_bound",
+		"curve_time", "merge_time" and "time".
+
+	Returns
+	-------
+	BudgetAllocation
+		The budget and strategy of every network, in the same order, and the total conflict numerator.
+
+	Raises
+	------
+	ValueError
+		If total_budget is negative.
+
+	Notes
+	-----
+	- Time complexity: O(∑ n_j * w_j * max(n_i)) for the curves, where w_j <= total_budget + 1 is the width
+	  of the curve of network j, O(G log G) for the G marginal gains of the convex curves,
+	  O(MAX_BISECTION_STEPS * ∑ w_j) for the bound and O(S * c_j) for every merge, where c_j is the number
+	  of candidate budgets of the curve and S <= total_budget + 1 the number of sums reached so far.
+	- Space complexity: O(∑ w_j) plus O(S) bytes per curve for its choices.
+	"""
+	if total_budget < 0:
+		raise ValueError("Error: total_budget must be non-negative")
+
+	start_time = time.perf_counter()
+
+	curves = [conflict_curve(social_network, total_budget) for social_network in social_networks]
+	curve_time = time.perf_counter() - start_time
+
+	# Combine the convex curves: the k-th unit of effort of the combined curve goes to the largest gain left
+	convex = [j for j, curve in enumerate(curves) if is_convex(curve)]
+	convex_set = set(convex)
+	others = [j for j in range(len(curves)) if j not in convex_set]
+
+	gains = np.concatenate([-np.diff(curves[j]) for j in convex] + [np.zeros(0, dtype=np.int64)])
+	owners = np.repeat(np.arange(len(convex)), [len(curves[j]) - 1 for j in convex])
+	# Stable, so the gains of a network (non-increasing) are taken in order even when they tie
+	order = np.argsort(-gains, kind="stable")
+	width = min(total_budget, len(gains)) + 1
+	convex_curve = (sum(int(curves[j][0]) for j in convex)
+					- np.concatenate(([0], np.cumsum(gains[order][:width - 1]))).astype(np.int64))
+
+	parts = [convex_curve] + [curves[j] for j in others]
+	spans = candidate_budgets(parts, total_budget)
+
+	# combined[s] is the least conflict of the parts merged so far with a sum of budgets of offset + s
+	combined = np.zeros(1, dtype=np.int64)
+	offset = 0
+	prefix_minimum = 0.0
+	all_choices = []
+	# The parts with the fewest candidate budgets first, so the sums stay few for most merges
+	merge_order = np.argsort(spans.highs - spans.lows, kind="stable")
+	for p in merge_order:
+		part = parts[p]
+		low, high = int(spans.lows[p]), int(spans.highs[p])
+		offset += low
+		width = min(total_budget - offset, len(combined) - 1 + high - low) + 1
+		combined, choices = min_plus_merge(combined, part[low:high + 1], width)
+
+		# Keep the sums whose excess fits in the gap, as the sum of the parts merged so far of the best split
+		prefix_minimum += spans.minimums[p]
+		excess = combined + spans.multiplier * (offset + np.arange(width)) - prefix_minimum
+		kept = np.flatnonzero(excess <= spans.gap)
+		first, last = int(kept[0]), int(kept[-1])
+		combined = combined[first:last + 1]
+		offset += first
+		all_choices.append((choices[first:last + 1], first))
+
+	merge_time = time.perf_counter() - start_time - curve_time
+
+	# Walk the merges back from the best sum, then split the budget of the convex curve by its gains
+	part_budgets = [0] * len(parts)
+	position = int(np.argmin(combined))
+	for p, (choices, first) in zip(merge_order[::-1], all_choices[::-1]):
+		x = int(choices[position])
+		part_budgets[p] = int(spans.lows[p]) + x
+		position += first - x
+
+	budgets = [0] * len(social_networks)
+	for j, budget in zip(others, part_budgets[1:]):
+		budgets[j] = budget
+	for p, count in enumerate(np.bincount(owners[order[:part_budgets[0]]], minlength=len(convex))):
+		budgets[convex[p]] = int(count)
+
+	strategies = []
+	conflict = 0
+	for j, (social_network, curve) in enumerate(zip(social_networks, curves)):
+		# Budget that the network does not use does not lower its conflict
+		budgets[j] = int(np.argmax(curve <= curve[budgets[j]]))
+		strategies.append(dynamic_bottom_up(SocialNetwork(social_network.groups, budgets[j])))
+		conflict += int(curve[budgets[j]])
+
+	if stats is not None:
+		stats["convex_networks"] = len(convex)
+		stats["candidate_budgets"] = int(np.sum(spans.highs - spans.lows + 1))
+		stats["budgets_total"] = sum(len(part) for part in parts)
+		stats["lower_bound"] = spans.lower_bound
+		stats["curve_time"] = curve_time
+		stats["merge_time"] = merge_time
+		stats["time"] = time.perf_counter() - start_time
+
+	return BudgetAllocation(budgets, strategies, conflict)
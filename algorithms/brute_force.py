@@ -1,13 +1,26 @@
+import math
 from itertools import product
-from typing import List
+from typing import Callable, List, Optional
 
-from classes.social_network import (SocialNetwork, apply_strategy,
-                                    calculate_effort,
-                                    calculate_internal_conflict,
-                                    calculate_max_effort)
+import numpy as np
 
+from classes.cost_index import cost_index
+from classes.social_network import SocialNetwork, calculate_max_effort
 
-def brute_force(social_network: SocialNetwork) -> List[int]:
+
+# Number of strategies evaluated between two progress reports
+PROGRESS_INTERVAL = 10_000
+# Number of strategies decoded and evaluated at once by `brute_force_vectorized`
+DEFAULT_BLOCK_SIZE = 1 << 16
+
+
+def strategy_count(social_network: SocialNetwork) -> int:
+	"""Number of strategies enumerated by the brute force solvers: ∏(n_i + 1)."""
+	return math.prod(group.n + 1 for group in social_network.groups)
+
+
+def brute_force(social_network: SocialNetwork,
+				progress: Optional[Callable[[int, int, int], None]] = None) -> List[int]:
 	"""
 	Finds the optimal strategy to minimize internal conflict in a social network
 	using brute force approach by evaluating all possible combinations.
@@ -20,6 +33,9 @@ def brute_force(social_network: SocialNetwork) -> List[int]:
 	----------
 	social_network : SocialNetwork
 		The social network to optimize.
+	progress : Callable[[int, int, int], None], optional
+		Called every `PROGRESS_INTERVAL` strategies (and once at the end) with the number of strategies
+		evaluated, the total number of strategies and the number of strategies explored so far.
 
 	Returns
 	-------
@@ -46,17 +62,126 @@ def brute_force(social_network: SocialNetwork) -> List[int]:
 	ranges = [range(0, group.n + 1) for group in groups]
 	cartesian_product = product(*ranges)
 
+	total = strategy_count(social_network)
+
+	# Effort and remaining conflict numerator of every option of every group, as plain lists for fast lookups
+	costs = cost_index(social_network)
+	efforts = [costs.options(i).efforts.tolist() for i in range(len(groups))]
+	conflicts = [costs.options(i).conflicts.tolist() for i in range(len(groups))]
+
 	best_strategy = None
 	best_IC = float("inf")
 
-	for strategy in cartesian_product:
-		effort = calculate_effort(social_network, strategy)
+	for explored, strategy in enumerate(cartesian_product, start=1):
+		effort = sum(group_efforts[e_i] for group_efforts, e_i in zip(efforts, strategy))
 
 		if effort <= r_max:
-			new_social_network = apply_strategy(social_network, strategy)
-			conflict = calculate_internal_conflict(new_social_network)
+			conflict = sum(group_conflicts[e_i] for group_conflicts, e_i in zip(conflicts, strategy))
 			if conflict < best_IC:
 				best_strategy = strategy
 				best_IC = conflict
 
+		if progress is not None and explored % PROGRESS_INTERVAL == 0:
+			progress(explored, total, explored)
+
+	if progress is not None:
+		progress(total, total, total)
+
 	return best_strategy
+
+
+def brute_force_vectorized(social_network: SocialNetwork, block_size: int = DEFAULT_BLOCK_SIZE,
+						   progress: Optional[Callable[[int, int, int], None]] = None) -> List[int]:
+	"""
+	Finds the optimal strategy to minimize internal conflict in a social network by evaluating all
+	possible combinations, a block of consecutive combinations at a time.
+
+	The combinations are numbered in the order of `itertools.product` over the ranges 0..n_i: the index
+	of a strategy is its mixed-radix number with radices n_i + 1 and the last group as the least
+	significant digit. Every block of `block_size` consecutive indices is decoded into a matrix of
+	strategies (one column per block entry) with vectorized division and remainder, and the effort and
+	remaining conflict of all of them are looked up and added up with array operations. The best
+	applicable strategy of the block is found with a masked argmin. It returns the same strategy as
+	`brute_force`: ties are broken in favour of the first strategy in enumeration order.
+
+	Parameters
+	----------
+	social_network : SocialNetwork
+		The social network to optimize.
+	block_size : int
+		Number of strategies evaluated at once. Memory grows as O(n * block_size).
+	progress : Callable[[int, int, int], None], optional
+		Called after every block with the number of strategies evaluated, the total number of strategies
+		and the number of strategies explored so far.
+
+	Returns
+	-------
+	List[int]
+		The best strategy as a list of integers where each value represents
+			the number of agents to moderate in the corresponding group.
+
+	Raises
+	------
+	ValueError
+		If block_size is not positive or there are more than 2^63 - 1 strategies.
+
+	Notes
+	-----
+	- Time complexity is exponential O(n * ∏(n_i + 1)), as in `brute_force`, with a much smaller constant.
+	"""
+	if block_size <= 0:
+		raise ValueError("Error: block_size must be positive")
+
+	groups = social_network.groups
+	r_max = social_network.r_max
+
+	# Check if the effort required to moderate the entire social network is less than or equal to the
+	# max effort allowed. If we have enough effort to moderate the entire social network, the optimal
+	# strategy is to moderate all agents in all groups
+	if calculate_max_effort(social_network) <= r_max:
+		return [group.n for group in groups]
+
+	total = strategy_count(social_network)
+	if total > np.iinfo(np.int64).max:
+		raise ValueError(f"Error: too many strategies to enumerate ({total})")
+
+	costs = cost_index(social_network)
+	options = [costs.options(i) for i in range(len(groups))]
+
+	best_index = None
+	best_conflict = None
+
+	for start in range(0, total, block_size):
+		stop = min(start + block_size, total)
+
+		# Decode the indices, from the least significant digit (the last group) to the most significant one
+		indices = np.arange(start, stop, dtype=np.int64)
+		effort = np.zeros(stop - start, dtype=np.int64)
+		conflict = np.zeros(stop - start, dtype=np.int64)
+		for group, (efforts, conflicts) in zip(reversed(groups), reversed(options)):
+			indices, digits = np.divmod(indices, group.n + 1)
+			effort += efforts[digits]
+			conflict += conflicts[digits]
+
+		applicable = effort <= r_max
+		if np.any(applicable):
+			# argmin returns the first minimum, so ties keep the earliest strategy
+			conflict[~applicable] = np.iinfo(np.int64).max
+			block_best = int(np.argmin(conflict))
+			if best_conflict is None or conflict[block_best] < best_conflict:
+				best_index = start + block_best
+				best_conflict = int(conflict[block_best])
+
+		if progress is not None:
+			progress(stop, total, stop)
+
+	if best_index is None:
+		return None
+
+	# Decode the best index
+	strategy = []
+	for group in reversed(groups):
+		best_index, e_i = divmod(best_index, group.n + 1)
+		strategy.append(e_i)
+
+	return strategy[::-1]
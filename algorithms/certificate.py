@@ -0,0 +1,74 @@
+import math
+from fractions import Fraction
+from typing import List, NamedTuple, Optional
+
+from algorithms.greedy import greedy_moderation_with_radix_sort
+from algorithms.lagrangian import lagrangian_lower_bound
+from classes.cost_index import cost_index
+from classes.social_network import SocialNetwork, evaluate_strategy
+
+# Values of the optimality field of a result
+PROVEN = "proven"
+UNKNOWN = "unknown"
+
+
+def bounded(gap: float) -> str:
+	"""Optimality of a strategy whose internal conflict is at most `gap` above the optimal one."""
+	return f"bounded({gap:.6g})"
+
+
+class GreedyCertificate(NamedTuple):
+	strategy: List[int]
+	effort: int
+	IC: float
+	lower_bound: float # Lower bound on the optimal internal conflict
+	optimality: str
+
+
+def strategy_optimality(social_network: SocialNetwork, strategy: List[int],
+						lower_bound: Optional[Fraction] = None) -> str:
+	"""
+	Returns "proven" if the strategy is proven optimal by the fractional knapsack lower bound on the
+	internal conflict, and "bounded(gap)" with the gap to that bound otherwise.
+
+	The conflict numerator ∑ (n_i - e_i) * (o_i,1 - o_i,2)² of every strategy is an integer, so a strategy
+	is optimal if its numerator is at most the bound rounded up. The comparison is exact. `lower_bound` is
+	the `lagrangian_lower_bound` of the network, computed here when it is not given.
+	"""
+	costs = cost_index(social_network)
+	conflict = sum((n - e_i) * conflict_per_agent
+				   for n, e_i, conflict_per_agent in zip(costs.n, strategy, costs.conflicts_per_agent))
+	if lower_bound is None:
+		lower_bound = lagrangian_lower_bound(social_network)
+
+	if conflict <= math.ceil(lower_bound):
+		return PROVEN
+	n = len(social_network.groups)
+	return bounded(float((conflict - lower_bound) / (n if n > 0 else 1)))
+
+
+def removed_conflict_optimality(social_network: SocialNetwork, removed: int, removed_bound: float) -> str:
+	"""
+	Optimality of a strategy that removes a conflict numerator of `removed` when no applicable strategy
+	removes more than `removed_bound` (such as the bound of an `FPTASSolution`). The optimal removed
+	numerator is an integer, so the strategy is proven optimal when the bound is less than 1 above it.
+	"""
+	if removed_bound - removed < 1:
+		return PROVEN
+	n = len(social_network.groups)
+	return bounded((removed_bound - removed) / (n if n > 0 else 1))
+
+
+def certify_greedy(social_network: SocialNetwork) -> GreedyCertificate:
+	"""
+	Runs the greedy solver and checks its strategy against the fractional knapsack lower bound, both in
+	O(n). When the optimality is "proven" no exact solver needs to run.
+	"""
+	strategy = greedy_moderation_with_radix_sort(social_network)
+	effort, IC, _ = evaluate_strategy(social_network, strategy)
+
+	n = len(social_network.groups)
+	lower_bound = lagrangian_lower_bound(social_network)
+	optimality = strategy_optimality(social_network, strategy, lower_bound)
+
+	return GreedyCertificate(strategy, effort, IC, float(lower_bound) / (n if n > 0 else 1), optimality)
@@ -0,0 +1,209 @@
+import time
+from collections import defaultdict, deque
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from algorithms.dynamic import dynamic_bottom_up
+from algorithms.greedy import (counting_sort_by_discrepancy,
+                               greedy_moderation_with_radix_sort,
+                               radix_sort_groups)
+from classes.agent_group import RIGIDITY_SCALE
+from classes.cost_index import cost_index
+from classes.social_network import SocialNetwork
+
+# Groups on each side of the break group in the first core window
+DEFAULT_CORE_RADIUS = 8
+# Groups with a lower rigidity are moderated first by the greedy
+R_MIN = 10**-6
+
+
+def greedy_order(social_network: SocialNetwork) -> List[int]:
+	"""
+	Returns the indices of the groups in the order of `greedy_moderation_with_radix_sort`: the groups with
+	r < R_MIN by decreasing discrepancy, then the rest by decreasing discrepancy-to-rigidity ratio.
+	"""
+	groups = social_network.groups
+
+	# The same group object may appear more than once, so every object maps to all its indices
+	indices = defaultdict(deque)
+	for i, group in enumerate(groups):
+		indices[id(group)].append(i)
+
+	priority_groups = [group for group in groups if group.r < R_MIN]
+	normal_groups = [group for group in groups if group.r >= R_MIN]
+	sorted_groups = counting_sort_by_discrepancy(priority_groups) + radix_sort_groups(normal_groups)
+
+	return [indices[id(group)].popleft() for group in sorted_groups]
+
+
+class LagrangianFixing(NamedTuple):
+	"""
+	The Lagrangian relaxation of a network at a multiplier λ = c_b / e_b, scaled by E_b (the effort
+	numerator of group b) so every value is an integer.
+
+	The value of moderating k agents of group i is v_i(k) = k * c_i - λ * effort_i(k), with the exact
+	rounded-up effort. Any applicable strategy removes at most
+		U = λ * R_max + ∑ max_k v_i(k)
+	conflict, and at most U - penalties[i] if it does not moderate decisions[i] agents of group i.
+	"""
+	upper_bound: int # U * E_b
+	decisions: List[int] # The k that maximizes v_i(k) for every group
+	penalties: List[int] # (max_k v_i(k) - max of v_i over the other k) * E_b
+
+
+def lagrangian_fixing(social_network: SocialNetwork, b: int) -> LagrangianFixing:
+	"""Computes the Lagrangian relaxation of a network at the multiplier of group b (with effort)."""
+	costs = cost_index(social_network)
+	c_b, E_b = costs.conflicts_per_agent[b], costs.effort_numerators[b]
+
+	# v_i(k) * E_b = k * c_i * E_b - c_b * SCALE * effort_i(k), in int64 when it cannot overflow
+	largest = (max(costs.n) * max(costs.conflicts_per_agent) * E_b
+			   + c_b * RIGIDITY_SCALE * max(costs.effort(i, n) for i, n in enumerate(costs.n)))
+	dtype = np.int64 if largest < 2**62 else object
+
+	upper_bound = c_b * RIGIDITY_SCALE * social_network.r_max
+	decisions = []
+	penalties = []
+	for i, n in enumerate(costs.n):
+		efforts, _ = costs.options(i)
+		values = (np.arange(n + 1).astype(dtype) * (costs.conflicts_per_agent[i] * E_b)
+				  - efforts.astype(dtype) * (c_b * RIGIDITY_SCALE))
+
+		k = int(np.argmax(values))
+		best = int(values[k])
+		upper_bound += best
+		decisions.append(k)
+		if n == 0:
+			penalties.append(None) # There is no other decision
+		else:
+			penalties.append(best - int(np.max(np.delete(values, k))))
+
+	return LagrangianFixing(upper_bound, decisions, penalties)
+
+
+def core_moderation(social_network: SocialNetwork, radius: int = DEFAULT_CORE_RADIUS,
+					stats: Optional[dict] = None) -> List[int]:
+	"""
+	Finds the optimal strategy to minimize internal conflict by solving exactly only a core of groups
+	around the break group of the greedy order.
+
+	In the greedy order, the groups before the break group (the first one that does not fit fully in the
+	effort left) are moderated fully, and the groups far after it are left untouched. The core starts as
+	the groups within `radius` positions of the break group. Every other group is fixed to its decision in
+	the Lagrangian relaxation at the multiplier λ = c_b / e_b of the break group (see `LagrangianFixing`;
+	it is full moderation above the break group and none below it, up to the rounding of the effort), and
+	the core is solved with `dynamic_bottom_up` with the effort the fixed groups leave.
+
+	A strategy that changes the decision of a fixed group i removes at most U - penalties[i] conflict, so
+	if that is less than one more than the conflict removed by the best known strategy (the core strategy
+	or the greedy one; conflicts are integers), the best known strategy is optimal. The core is widened
+	with the fixed groups for which this does not hold and solved again until it holds for every fixed
+	group.
+
+	Parameters
+	----------
+	social_network : SocialNetwork
+		The social network to optimize.
+	radius : int
+		Groups on each side of the break group in the first core.
+	stats : dict, optional
+		If given, it is filled with "core_size" (groups in the last core), "widenings", "core_budget"
+		(effort left for the last core) and "time".
+
+	Returns
+	-------
+	List[int]
+		The best strategy as a list of integers where each value represents
+			the number of agents to remove from the corresponding group.
+
+	Raises
+	------
+	ValueError
+		If radius is negative.
+
+	Notes
+	-----
+	- Time complexity: O(∑ n_i) for the relaxation plus the DP of every core, O(c * R_c * max(n_i)) for a
+	  core of c groups with a budget of R_c, usually much less than R_max.
+	- Every bound is computed with integer arithmetic, scaled by the effort numerator of the break group.
+	"""
+	if radius < 0:
+		raise ValueError("Error: radius must be non-negative")
+
+	start_time = time.perf_counter()
+
+	groups = social_network.groups
+	n = len(groups)
+	r_max = social_network.r_max
+	costs = cost_index(social_network)
+
+	# If we have enough effort to moderate the entire social network, moderate all agents in all groups
+	if costs.max_effort <= r_max:
+		if stats is not None:
+			stats.update(core_size=0, widenings=0, core_budget=0, time=time.perf_counter() - start_time)
+		return [group.n for group in groups]
+
+	order = greedy_order(social_network)
+
+	# Break group: the first group of the order that does not fit fully in the effort left
+	remaining_effort = r_max
+	break_position = 0
+	for position, i in enumerate(order):
+		full_effort = costs.effort(i, costs.n[i])
+		if full_effort > remaining_effort:
+			break_position = position
+			break
+		remaining_effort -= full_effort
+
+	E_b = costs.effort_numerators[order[break_position]]
+	fixing = lagrangian_fixing(social_network, order[break_position])
+
+	greedy_strategy = greedy_moderation_with_radix_sort(social_network)
+	greedy_removed = sum(k * costs.conflicts_per_agent[i] for i, k in enumerate(greedy_strategy))
+
+	in_core = [False] * n
+	for i in order[max(0, break_position - radius):break_position + radius + 1]:
+		in_core[i] = True
+
+	widenings = 0
+	while True:
+		core = [i for i in range(n) if in_core[i]]
+		core_budget = r_max - sum(costs.effort(i, fixing.decisions[i]) for i in range(n) if not in_core[i])
+
+		if core_budget < 0:
+			# The fixed decisions do not fit in R_max; add the fixed groups closest to the break group
+			radius = max(1, 2 * radius)
+			for i in order[max(0, break_position - radius):break_position + radius + 1]:
+				in_core[i] = True
+			widenings += 1
+			continue
+
+		strategy = list(fixing.decisions)
+		core_strategy = dynamic_bottom_up(SocialNetwork([groups[i] for i in core], core_budget))
+		for i, k in zip(core, core_strategy):
+			strategy[i] = k
+
+		removed = sum(k * costs.conflicts_per_agent[i] for i, k in enumerate(strategy))
+		if greedy_removed > removed:
+			strategy, removed = list(greedy_strategy), greedy_removed
+
+		# Fixed groups whose decision the bound cannot prove; changing groups without conflict (and so
+		# without effort) does not change the conflict removed
+		slack = fixing.upper_bound - (removed + 1) * E_b
+		unproven = [i for i in range(n) if not in_core[i] and costs.conflicts_per_agent[i] > 0
+					and fixing.penalties[i] is not None and fixing.penalties[i] <= slack]
+		if not unproven:
+			break
+
+		for i in unproven:
+			in_core[i] = True
+		widenings += 1
+
+	if stats is not None:
+		stats["core_size"] = len(core)
+		stats["widenings"] = widenings
+		stats["core_budget"] = core_budget
+		stats["time"] = time.perf_counter() - start_time
+
+	return strategy
@@ -0,0 +1,303 @@
+import hashlib
+import heapq
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, NamedTuple, Optional
+
+import numpy as np
+from numpy.typing import NDArray
+
+from algorithms.dynamic import fill_layer_slice, network_options
+from classes.agent_group import AgentGroup, fixed_point_rigidity
+from classes.social_network import SocialNetwork, calculate_max_effort
+
+# Default memory used by the rows kept in RAM
+DEFAULT_CACHE_BYTES = 256 * 2**20
+
+
+class CachedLayer(NamedTuple):
+	"""The DP row of a group prefix: the least conflict and the decision of the last group per budget."""
+	conflicts: NDArray[np.float64]
+	decisions: NDArray[np.integer]
+
+	@property
+	def width(self) -> int:
+		return len(self.conflicts)
+
+	@property
+	def nbytes(self) -> int:
+		return self.conflicts.nbytes + self.decisions.nbytes
+
+
+def prefix_keys(groups: List[AgentGroup]) -> List[str]:
+	"""
+	Returns, for i = 1..n, a key of the prefix of groups 0..i-1: a chained hash where each key is the
+	digest of the previous key and the next group (with its rigidity in fixed point), so every key is
+	computed in O(1) from the previous one.
+	"""
+	keys = []
+	digest = b""
+	for group in groups:
+		data = f"{group.n},{group.o_1},{group.o_2},{fixed_point_rigidity(group.r)}".encode()
+		digest = hashlib.blake2b(digest + data, digest_size=16).digest()
+		keys.append(digest.hex())
+	return keys
+
+
+class DPRowCache:
+	"""
+	Keeps the DP rows of group prefixes, so networks that share their first groups do not recompute them.
+
+	A row of budgets 0..w-1 does not depend on the table width, so a row is stored with the widest width
+	computed for its prefix and serves any narrower table. A prefix is only reused if the rows of all its
+	shorter prefixes are kept too, so once the rows use more than `max_bytes` those of the longest prefixes
+	are evicted first (in LRU order among prefixes of the same length). When `spill_dir` is given, evicted
+	rows are written there (up to `max_disk_bytes`, evicted in the same order) and loaded back when they are
+	requested again.
+	"""
+	def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES, spill_dir: Optional[str] = None,
+				 max_disk_bytes: Optional[int] = None):
+		self.max_bytes = max_bytes
+		self.spill_dir = spill_dir
+		self.max_disk_bytes = max_disk_bytes
+
+		self.layers = {}
+		self.spilled = OrderedDict() # key -> size on disk
+		self.depths = {} # key -> number of groups of the prefix, for the rows in memory and on disk
+		self.ticks = {} # key -> time of the last use, for the rows in memory
+		self.eviction_heap = [] # (-depth, tick, key), with stale entries skipped when popped
+		self.tick = 0
+		self.nbytes = 0
+		self.disk_bytes = 0
+		self.lock = threading.Lock()
+
+		self.hits = 0
+		self.disk_hits = 0
+		self.misses = 0
+		self.spills = 0
+
+		if spill_dir is not None:
+			os.makedirs(spill_dir, exist_ok=True)
+
+	def get(self, key: str, width: int) -> Optional[CachedLayer]:
+		"""Returns the first `width` budgets of the row of a prefix, or None if no row that wide is kept."""
+		with self.lock:
+			layer = self.layers.get(key)
+			if layer is not None:
+				self._touch(key)
+			elif key in self.spilled:
+				layer = self._load(key)
+				self.disk_hits += layer is not None and layer.width >= width
+
+			if layer is None or layer.width < width:
+				self.misses += 1
+				return None
+
+			self.hits += 1
+			return CachedLayer(layer.conflicts[:width], layer.decisions[:width])
+
+	def put(self, key: str, layer: CachedLayer, depth: int) -> None:
+		"""Stores the row of the prefix `key` of `depth` groups."""
+		with self.lock:
+			old_layer = self.layers.get(key)
+			if old_layer is not None:
+				if old_layer.width >= layer.width:
+					return
+				self.nbytes -= old_layer.nbytes
+			elif key in self.spilled:
+				self._remove_spilled(key)
+			self.layers[key] = layer
+			self.depths[key] = depth
+			self.nbytes += layer.nbytes
+			self._touch(key)
+			self._evict()
+
+	def clear(self) -> None:
+		with self.lock:
+			for key in list(self.spilled):
+				self._remove_spilled(key)
+			self.layers.clear()
+			self.depths.clear()
+			self.ticks.clear()
+			self.eviction_heap.clear()
+			self.nbytes = 0
+
+	def _touch(self, key: str) -> None:
+		self.tick += 1
+		self.ticks[key] = self.tick
+		heapq.heappush(self.eviction_heap, (-self.depths[key], self.tick, key))
+
+		# Drop the stale entries once they outnumber the rows
+		if len(self.eviction_heap) > 2 * len(self.layers) + 64:
+			self.eviction_heap = [(-self.depths[key], tick, key) for key, tick in self.ticks.items()]
+			heapq.heapify(self.eviction_heap)
+
+	def _evict(self, protected: Optional[str] = None) -> None:
+		"""Evicts the rows of the longest prefixes until the rows fit in `max_bytes`, except `protected`."""
+		kept = None
+		while self.nbytes > self.max_bytes and len(self.layers) > 1 and self.eviction_heap:
+			entry = heapq.heappop(self.eviction_heap)
+			_, tick, key = entry
+			if self.ticks.get(key) != tick:
+				continue
+			if key == protected:
+				kept = entry
+				continue
+
+			evicted = self.layers.pop(key)
+			del self.ticks[key]
+			self.nbytes -= evicted.nbytes
+			self._spill(key, evicted)
+
+		if kept is not None:
+			heapq.heappush(self.eviction_heap, kept)
+
+	def _path(self, key: str) -> str:
+		return os.path.join(self.spill_dir, f"{key}.npz")
+
+	def _spill(self, key: str, layer: CachedLayer) -> None:
+		if self.spill_dir is None:
+			del self.depths[key]
+			return
+
+		np.savez(self._path(key), conflicts=layer.conflicts, decisions=layer.decisions)
+		size = os.path.getsize(self._path(key))
+		self.spilled[key] = size
+		self.disk_bytes += size
+		self.spills += 1
+
+		while self.max_disk_bytes is not None and self.disk_bytes > self.max_disk_bytes and self.spilled:
+			# The first of the longest prefixes is the least recently spilled
+			self._remove_spilled(max(self.spilled, key=self.depths.__getitem__))
+
+	def _load(self, key: str) -> Optional[CachedLayer]:
+		"""Moves a spilled row back to memory, evicting others if it does not fit."""
+		try:
+			with np.load(self._path(key)) as data:
+				layer = CachedLayer(data["conflicts"], data["decisions"])
+		except OSError:
+			layer = None
+		depth = self.depths[key]
+		self._remove_spilled(key)
+
+		if layer is not None:
+			self.layers[key] = layer
+			self.depths[key] = depth
+			self.nbytes += layer.nbytes
+			self._touch(key)
+			self._evict(protected=key)
+		return layer
+
+	def _remove_spilled(self, key: str) -> None:
+		self.disk_bytes -= self.spilled.pop(key)
+		if key not in self.layers:
+			del self.depths[key]
+		try:
+			os.remove(self._path(key))
+		except OSError:
+			pass
+
+
+def dynamic_bottom_up_cached(social_network: SocialNetwork, cache: DPRowCache,
+							 progress: Optional[Callable[[int, int, int], None]] = None,
+							 stats: Optional[dict] = None) -> List[int]:
+	"""
+	Finds the optimal strategy to minimize internal conflict in a social network using dynamic
+	programming, reusing the rows of the longest group prefix kept in `cache` and storing the new ones.
+
+	Unlike `dynamic_bottom_up`, every row covers all the budgets 0..min(R_max, max effort), so it can be
+	reused by networks with other last groups or another R_max. Rows are keyed by `prefix_keys`. The
+	strategy is reconstructed from the decisions of every row, so a prefix is only reused if the rows of
+	all its shorter prefixes are cached too.
+
+	Parameters
+	----------
+	social_network : SocialNetwork
+		The social network to optimize.
+	cache : DPRowCache
+		The rows shared between solves.
+	progress : Callable[[int, int, int], None], optional
+		See `dynamic_bottom_up`.
+	stats : dict, optional
+		If given, it is filled with "layers_reused", "layers_computed" and "time".
+
+	Returns
+	-------
+	List[int]
+		The best strategy as a list of integers where each value represents
+			the number of agents to remove from the corresponding group.
+
+	Notes
+	-----
+	- Time complexity: O((n - p) * R_max * max(n_i)) where p is the number of reused layers.
+	- Space complexity: O(n * R_max) for the decisions, in the smallest integer type of every group.
+	"""
+	start_time = time.perf_counter()
+
+	groups = social_network.groups
+	n = len(groups)
+	r_max = social_network.r_max
+
+	# Check if the effort required to moderate the entire social network is less than or equal to the
+	# max effort allowed. If we have enough effort to moderate the entire social network, the optimal
+	# strategy is to moderate all agents in all groups
+	max_effort = calculate_max_effort(social_network)
+	if max_effort <= r_max:
+		if stats is not None:
+			stats.update(layers_reused=0, layers_computed=0, time=time.perf_counter() - start_time)
+		return [group.n for group in groups]
+
+	width = min(r_max, max_effort) + 1
+	options = network_options(social_network)
+	keys = prefix_keys(groups)
+
+	# Longest prefix whose rows are all cached
+	layers = []
+	for key in keys:
+		layer = cache.get(key, width)
+		if layer is None:
+			break
+		layers.append(layer)
+	reused = len(layers)
+
+	previous = layers[-1].conflicts if layers else np.zeros(width)
+	prefix_effort = sum(int(options[i][0][-1]) for i in range(reused))
+
+	for i in range(reused + 1, n + 1):
+		efforts, conflicts = options[i - 1]
+		prefix_effort += int(efforts[-1])
+
+		current = np.empty(width)
+		decisions = np.zeros(width, dtype=np.min_scalar_type(groups[i - 1].n))
+
+		# Larger budgets than the effort of fully moderating groups 0..i-1 give the same result
+		high = min(width - 1, prefix_effort)
+		fill_layer_slice(previous, current, decisions, efforts, conflicts, 0, high + 1)
+		current[high + 1:] = current[high]
+		decisions[high + 1:] = decisions[high]
+
+		layer = CachedLayer(current, decisions)
+		cache.put(keys[i - 1], layer, i)
+		layers.append(layer)
+		previous = current
+
+		if progress is not None:
+			progress(i, n, (i - reused) * width)
+
+	# Reconstruct the optimal strategy
+	optimal_strategy = [0] * n
+	remaining_effort = width - 1
+
+	for i in range(n, 0, -1):
+		k = int(layers[i - 1].decisions[remaining_effort])
+		optimal_strategy[i - 1] = k
+		remaining_effort -= int(options[i - 1][0][k])
+
+	if stats is not None:
+		stats["layers_reused"] = reused
+		stats["layers_computed"] = n - reused
+		stats["time"] = time.perf_counter() - start_time
+
+	return optimal_strategy
@@ -1,15 +1,31 @@
-import math
-from typing import List
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
 
 import numpy as np
 from numpy.typing import NDArray
 
-from classes.agent_group import AgentGroup
+from algorithms.greedy import greedy_moderation_with_radix_sort
+from classes.agent_group import RIGIDITY_SCALE, AgentGroup, fixed_point_rigidity
+from classes.cost_index import CostIndex, cost_index
 from classes.social_network import (SocialNetwork, apply_strategy,
                                     calculate_effort,
                                     calculate_internal_conflict,
                                     calculate_max_effort)
 
+# Budgets filled at a time by the out-of-core DP: small enough for the slices of one block to stay in cache
+OUT_OF_CORE_BLOCK_SIZE = 1 << 15
+# Maximum number of decision cells (networks * groups * budgets) solved at once by the batched DP
+BATCH_MAX_CELLS = 1 << 24
+# Networks with more cells (groups * budgets) than this are solved one at a time by the batched DP: the
+# per-call overhead is negligible next to their DP
+BATCH_MAX_NETWORK_CELLS = 1 << 16
+# Largest group solved by the batched DP, so E_i * k stays in int64 (see `group_costs`)
+BATCH_MAX_AGENTS = 4 * 10**7
+
 
 def get_solution_value(social_network: SocialNetwork) -> float:
 	"""
@@ -33,24 +49,19 @@ def get_solution_value(social_network: SocialNetwork) -> float:
 	groups = social_network.groups
 	n = len(groups)
 	r_max = social_network.r_max
+	costs = cost_index(social_network)
 
 	def IC(i: int, r: float):
 		if i == 0:
 			return 0
 		else: # i > 0
-			group = groups[i - 1]
-			n = group.n
-			o_1 = group.o_1
-			o_2 = group.o_2
-			r_i = group.r
-
-			conflict_per_agent = (o_1 - o_2) ** 2
-			effort_per_agent = abs(o_1 - o_2) * r_i
+			n = costs.n[i - 1]
+			conflict_per_agent = costs.conflicts_per_agent[i - 1]
 
 			min_conflict = float("inf")
 
 			for k in range(n + 1):
-				required_effort = math.ceil(effort_per_agent * k)
+				required_effort = costs.effort(i - 1, k)
 
 				if required_effort <= r:
 					remaining_conflict = (n - k) * conflict_per_agent
@@ -67,7 +78,9 @@ def get_solution_value(social_network: SocialNetwork) -> float:
 	return min_conflict
 
 
-def dynamic_bottom_up(social_network: SocialNetwork) -> List[int]:
+def dynamic_bottom_up(social_network: SocialNetwork,
+					  progress: Optional[Callable[[int, int, int], None]] = None,
+					  stats: Optional[dict] = None) -> List[int]:
 	"""
 	Finds the optimal strategy to minimize internal conflict in a social network
 	using dynamic programming.
@@ -75,10 +88,26 @@ def dynamic_bottom_up(social_network: SocialNetwork) -> List[int]:
 	This function efficiently finds the strategy that minimizes internal conflict
 	while staying within the maximum allowed effort (R_max).
 
+	Only the budgets that can matter are computed for every group layer i:
+	- Budgets above the full-moderation effort of groups 0..i-1 give the same result as that effort, so
+	  they are copied instead of computed.
+	- Budgets below R_max minus the full-moderation effort of groups i..n-1 can never be reached when the
+	  strategy is reconstructed from R_max, so they are skipped.
+	- Budgets for which a fractional lower bound on the conflict of the whole network (groups 0..i-1 with
+	  that budget plus groups i..n-1 with the rest) exceeds the conflict of the greedy strategy cannot be
+	  part of an optimal strategy, so they are skipped as well.
+
 	Parameters
 	----------
 	social_network : SocialNetwork
 		The social network to optimize.
+	progress : Callable[[int, int, int], None], optional
+		Called after every group layer with the number of layers done, the total number of layers and
+		the number of (group, effort) states explored so far.
+	stats : dict, optional
+		If given, it is filled with the instrumentation of the run: "cells_total" and "cells_computed"
+		(states of the full table and states actually computed), "table_bytes" and "table_bytes_full"
+		(memory used by the DP tables and memory a full int64/float64 table would use) and "time".
 
 	Returns
 	-------
@@ -89,9 +118,12 @@ def dynamic_bottom_up(social_network: SocialNetwork) -> List[int]:
 	Notes
 	-----
 	- Time complexity: O(n * R_max * max(n_i)) where n is the number of groups, R_max is
-	   the maximum effort, and max(n_i) is the maximum number of agents in any group.
-	- Space complexity: O(n * R_max).
+	   the maximum effort, and max(n_i) is the maximum number of agents in any group. Trimming only reduces
+	   the R_max factor of every layer.
+	- Space complexity: O(∑ w_i + R_max) where w_i <= R_max + 1 is the number of budgets computed in layer i.
 	"""
+	start_time = time.perf_counter()
+
 	groups = social_network.groups
 	n = len(groups)
 	r_max = social_network.r_max
@@ -99,83 +131,154 @@ def dynamic_bottom_up(social_network: SocialNetwork) -> List[int]:
 	# Check if the effort required to moderate the entire social network is less than or equal to the
 	# max effort allowed. If we have enough effort to moderate the entire social network, the optimal
 	# strategy is to moderate all agents in all groups
-	if calculate_max_effort(social_network) <= r_max:
+	max_effort = calculate_max_effort(social_network)
+	if max_effort <= r_max:
 		return [group.n for group in groups]
 
-	# Create DP matrices using NumPy for better performance
-	# storage[i][r] = minimum conflict achievable for first i groups with r effort
-	storage = np.full((n + 1, r_max + 1), np.inf)
-	# decisions[i][r] = how many agents to moderate in group i to achieve storage[i][r]
-	decisions = np.zeros((n + 1, r_max + 1), dtype=int)
+	width = min(r_max, max_effort) + 1
+	options = network_options(social_network)
+	windows = layer_windows(social_network, options, width)
 
-	# Base case: no groups, no conflict
-	storage[0, :] = 0
+	max_agents = max((group.n for group in groups), default=0)
+	decision_type = np.min_scalar_type(max_agents)
+
+	# Only two conflict rows are kept; decisions[i] holds the decisions of layer i for budgets low_i..high_i
+	previous = np.zeros(width)
+	current = np.empty(width)
+	decisions = [(0, -1, np.zeros(0, dtype=decision_type))]
+	cells_computed = 0
 
 	# Bottom-up DP approach
 	for i in range(1, n + 1):
-		group = groups[i - 1]
-		n_i = group.n
-		o_1 = group.o_1
-		o_2 = group.o_2
-		r = group.r
+		efforts, conflicts = options[i - 1]
+		low, high, reachable_high = windows[i - 1]
 
-		conflict_per_agent = (o_1 - o_2) ** 2
-		effort_per_agent = abs(o_1 - o_2) * r
+		row = np.zeros(max(0, high - low + 1), dtype=decision_type)
+		current[:] = np.inf
+		if low <= high:
+			fill_layer_slice(previous, current, row, efforts, conflicts, low, high + 1, offset=low)
+			cells_computed += high - low + 1
 
-		for r in range(r_max + 1):
-			# Try moderating k agents from current group
-			for k in range(n_i + 1):
-				required_effort = math.ceil(effort_per_agent * k)
+			# Larger budgets than the effort of fully moderating groups 0..i-1 give the same result
+			if high == reachable_high:
+				current[high + 1:] = current[high]
 
-				if required_effort <= r:
-					# Calculate remaining conflict after moderating k agents
-					remaining_conflict = (n_i - k) * conflict_per_agent
+		decisions.append((low, high, row))
+		previous, current = current, previous
 
-					# Total conflict = optimal conflict for previous groups + remaining conflict
-					total_conflict = storage[i - 1, r - required_effort] + remaining_conflict
-
-					if total_conflict < storage[i, r]:
-						storage[i, r] = total_conflict
-						decisions[i, r] = k
+		if progress is not None:
+			progress(i, n, cells_computed)
 
 	# Reconstruct the optimal strategy
 	optimal_strategy = [0] * n
-	remaining_effort = r_max
+	remaining_effort = min(r_max, width - 1)
 
 	for i in range(n, 0, -1):
-		group = groups[i - 1]
-		k = decisions[i, remaining_effort]
+		low, high, row = decisions[i]
+		k = int(row[min(remaining_effort, high) - low])
 		optimal_strategy[i - 1] = k
+		remaining_effort -= int(options[i - 1][0][k])
 
-		effort_per_agent = abs(group.o_1 - group.o_2) * group.r
-		required_effort = math.ceil(effort_per_agent * k)
-		remaining_effort -= required_effort
+	if stats is not None:
+		stats["cells_total"] = n * (r_max + 1)
+		stats["cells_computed"] = cells_computed
+		stats["table_bytes"] = sum(row.nbytes for _, _, row in decisions) + previous.nbytes + current.nbytes
+		stats["table_bytes_full"] = 2 * (n + 1) * (r_max + 1) * 8
+		stats["time"] = time.perf_counter() - start_time
 
 	return optimal_strategy
 
+
+def layer_windows(social_network: SocialNetwork, options: List[Tuple[NDArray[np.int64], NDArray[np.float64]]],
+				  width: int) -> List[Tuple[int, int, int]]:
+	"""
+	Returns, for every group layer i = 1..n, the budgets low..high that `dynamic_bottom_up` computes and
+	the largest budget reachable_high whose result may differ from smaller budgets (see its docstring).
+	The window is empty when low > high.
+	"""
+	groups = social_network.groups
+	n = len(groups)
+	r_max = social_network.r_max
+
+	# prefix_effort[i] = effort to fully moderate groups 0..i-1, suffix_effort[i] = same for groups i..n-1
+	full_efforts = np.array([int(efforts[-1]) for efforts, _ in options], dtype=np.int64)
+	prefix_effort = np.concatenate(([0], np.cumsum(full_efforts)))
+	suffix_effort = prefix_effort[-1] - prefix_effort
+
+	# Conflict of the greedy strategy: an upper bound on the optimal conflict
+	greedy_strategy = greedy_moderation_with_radix_sort(social_network)
+	upper_bound = sum((group.n - k) * (group.o_1 - group.o_2) ** 2 for group, k in zip(groups, greedy_strategy))
+	prefix_bound = FractionalBound(groups)
+	suffix_bound = FractionalBound(groups[::-1])
+
+	windows = []
+	for i in range(1, n + 1):
+		low = max(0, r_max - int(suffix_effort[i]))
+		reachable_high = min(width - 1, int(prefix_effort[i]))
+		high = reachable_high
+
+		# Keep only the budgets whose lower bound does not exceed the greedy conflict. The bound is convex in
+		# the budget, so those budgets are an interval
+		if low <= high:
+			budgets = np.arange(low, high + 1)
+			lower_bound = prefix_bound.lower_bound(i, budgets) + suffix_bound.lower_bound(n - i, r_max - budgets)
+			candidates = np.flatnonzero(lower_bound <= upper_bound * (1 + 1e-9) + 1e-9)
+			if len(candidates) > 0:
+				high = low + int(candidates[-1])
+				low = low + int(candidates[0])
+
+		windows.append((low, high, reachable_high))
+
+	return windows
+
+
+class FractionalBound:
+	"""
+	Lower bound on the conflict that remains in the first i groups of a sequence when at most a given
+	effort is spent on them.
+
+	Groups whose agents can be moderated without effort (r = 0) can lose all their conflict. Any other
+	agent removes (o_1 - o_2)² conflict for at least |o_1 - o_2| * r effort, so with budget b the remaining
+	conflict is at least the conflict of the paid groups minus b times the best conflict/effort rate.
+	"""
+	def __init__(self, groups: List[AgentGroup]):
+		paid_conflict = [0]
+		best_rate = [0.0]
+
+		for group in groups:
+			conflict = group.n * (group.o_1 - group.o_2) ** 2
+			effort_per_agent = abs(group.o_1 - group.o_2) * group.r
+			if effort_per_agent > 0:
+				paid_conflict.append(paid_conflict[-1] + conflict)
+				best_rate.append(max(best_rate[-1], (group.o_1 - group.o_2) ** 2 / effort_per_agent))
+			else:
+				paid_conflict.append(paid_conflict[-1])
+				best_rate.append(best_rate[-1])
+
+		self.paid_conflict = np.array(paid_conflict, dtype=np.float64)
+		self.best_rate = np.array(best_rate)
+
+	def lower_bound(self, i: int, budgets: NDArray[np.int64]) -> NDArray[np.float64]:
+		return np.maximum(0.0, self.paid_conflict[i] - budgets * self.best_rate[i])
+
+
 UNKNOWN = -1
 
-def dynamic_top_down_helper(groups: List[AgentGroup], i: int, j: int, storage: NDArray[np.float64],
+def dynamic_top_down_helper(costs: CostIndex, i: int, j: int, storage: NDArray[np.float64],
 							decisions: NDArray[np.int_]) -> float:
 	if (storage[i, j] == UNKNOWN):
-		group = groups[i - 1]
-		n = group.n
-		o_1 = group.o_1
-		o_2 = group.o_2
-		r = group.r
-
-		conflict_per_agent = (o_1 - o_2) ** 2
-		effort_per_agent = abs(o_1 - o_2) * r
+		n = costs.n[i - 1]
+		conflict_per_agent = costs.conflicts_per_agent[i - 1]
 
 		min_conflict = float("inf")
 
 		for k in range(n + 1):
-			required_effort = math.ceil(effort_per_agent * k)
+			required_effort = costs.effort(i - 1, k)
 
 			if required_effort <= j:
 				remaining_conflict = (n - k) * conflict_per_agent
 
-				value = dynamic_top_down_helper(groups, i - 1, j - required_effort, storage, decisions) \
+				value = dynamic_top_down_helper(costs, i - 1, j - required_effort, storage, decisions) \
 							+ remaining_conflict
 
 				if value < min_conflict:
@@ -207,19 +310,495 @@ def dynamic_top_down(social_network: SocialNetwork) -> List[int]:
 	# Base case: no groups, no conflict
 	storage[0, :] = 0
 
-	dynamic_top_down_helper(groups, n, r_max, storage, decisions)
+	costs = cost_index(social_network)
+	dynamic_top_down_helper(costs, n, r_max, storage, decisions)
 
 	# Reconstruct the optimal strategy
 	optimal_strategy = [0] * n
 	remaining_effort = r_max
 
 	for i in range(n, 0, -1):
-		group = groups[i - 1]
-		k = decisions[i, remaining_effort]
+		k = int(decisions[i, remaining_effort])
 		optimal_strategy[i - 1] = k
+		remaining_effort -= costs.effort(i - 1, k)
+
+	return optimal_strategy
+
+
+def network_options(social_network: SocialNetwork) -> List[Tuple[NDArray[np.int64], NDArray[np.float64]]]:
+	"""
+	Returns, for every group and k = 0..n_i, the exact effort required to moderate k agents of the group
+	(from the cost index of the network) and the conflict that remains in the group, as floats.
+	"""
+	costs = cost_index(social_network)
+	options = []
+	for i in range(len(social_network.groups)):
+		efforts, conflicts = costs.options(i)
+		options.append((efforts, conflicts.astype(np.float64)))
+	return options
+
+
+def fill_layer_slice(previous: NDArray[np.float64], current: NDArray[np.float64],
+					 decisions: Optional[NDArray[np.integer]], efforts: NDArray[np.int64],
+					 conflicts: NDArray[np.float64], start: int, stop: int, offset: int = 0) -> None:
+	"""
+	Fills the budgets start..stop-1 of a DP layer from the previous layer.
+
+	For every budget r, current[r] = min over k of previous[r - efforts[k]] + conflicts[k], and decisions[r]
+	is the smallest k reaching that minimum (the same tie-breaking as the scalar DP). Every operation is a
+	NumPy kernel that releases the GIL, so disjoint slices of the same layer can be filled by several
+	threads at the same time.
+
+	`decisions` may hold only part of the layer: decisions[r - offset] is the decision for budget r. When it
+	is None, only the conflicts are computed.
+	"""
+	current[start:stop] = np.inf
+	if decisions is not None:
+		decisions[start - offset:stop - offset] = 0
+
+	for k in range(len(efforts)):
+		effort = int(efforts[k])
+		if effort >= stop:
+			break # Efforts increase with k, so no larger k fits either
+
+		low = max(start, effort)
+		candidates = previous[low - effort:stop - effort] + conflicts[k]
+		if decisions is None:
+			np.minimum(current[low:stop], candidates, out=current[low:stop])
+			continue
+
+		better = candidates < current[low:stop]
+		np.copyto(current[low:stop], candidates, where=better)
+		np.copyto(decisions[low - offset:stop - offset], k, where=better)
+
 
-		effort_per_agent = abs(group.o_1 - group.o_2) * group.r
-		required_effort = math.ceil(effort_per_agent * k)
-		remaining_effort -= required_effort
+def dynamic_bottom_up_parallel(social_network: SocialNetwork, workers: Optional[int] = None,
+							   progress: Optional[Callable[[int, int, int], None]] = None) -> List[int]:
+	"""
+	Finds the optimal strategy to minimize internal conflict in a social network using dynamic
+	programming, filling every group layer with several threads.
+
+	Every budget of layer i only depends on layer i - 1, so each layer is split into `workers` disjoint
+	effort slices that are filled at the same time; all of them must finish (a barrier) before the next
+	layer starts. It returns the same strategy as `dynamic_bottom_up`.
+
+	Parameters
+	----------
+	social_network : SocialNetwork
+		The social network to optimize.
+	workers : int, optional
+		Number of threads (the number of CPUs by default).
+	progress : Callable[[int, int, int], None], optional
+		See `dynamic_bottom_up`.
+
+	Returns
+	-------
+	List[int]
+		The best strategy as a list of integers where each value represents
+			the number of agents to remove from the corresponding group.
+
+	Notes
+	-----
+	- Time complexity: O(n * R_max * max(n_i) / workers).
+	- Space complexity: O(n * R_max) for the decisions, stored in the smallest integer type that fits,
+	  and O(R_max) for the conflicts, since only two layers are kept.
+	"""
+	groups = social_network.groups
+	n = len(groups)
+	r_max = social_network.r_max
+	workers = workers or os.cpu_count() or 1
+
+	# Check if the effort required to moderate the entire social network is less than or equal to the
+	# max effort allowed. If we have enough effort to moderate the entire social network, the optimal
+	# strategy is to moderate all agents in all groups
+	if calculate_max_effort(social_network) <= r_max:
+		return [group.n for group in groups]
+
+	max_agents = max((group.n for group in groups), default=0)
+	decisions = np.zeros((n + 1, r_max + 1), dtype=np.min_scalar_type(max_agents))
+
+	# Base case: no groups, no conflict
+	previous = np.zeros(r_max + 1)
+	current = np.empty(r_max + 1)
+
+	bounds = np.linspace(0, r_max + 1, workers + 1).astype(int)
+	slices = [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if start < stop]
+
+	options = network_options(social_network)
+
+	with ThreadPoolExecutor(max_workers=workers) as pool:
+		for i in range(1, n + 1):
+			efforts, conflicts = options[i - 1]
+
+			# Consuming the results waits for every slice of the layer (and raises their errors)
+			list(pool.map(
+				lambda bounds: fill_layer_slice(previous, current, decisions[i], efforts, conflicts, *bounds),
+				slices
+			))
+
+			previous, current = current, previous
+
+			if progress is not None:
+				progress(i, n, i * (r_max + 1))
+
+	# Reconstruct the optimal strategy
+	optimal_strategy = [0] * n
+	remaining_effort = r_max
+
+	for i in range(n, 0, -1):
+		efforts, _ = options[i - 1]
+		k = int(decisions[i, remaining_effort])
+		optimal_strategy[i - 1] = k
+		remaining_effort -= int(efforts[k])
 
 	return optimal_strategy
+
+
+def dynamic_bottom_up_out_of_core(social_network: SocialNetwork, scratch_dir: Optional[str] = None,
+								  block_size: int = OUT_OF_CORE_BLOCK_SIZE,
+								  progress: Optional[Callable[[int, int, int], None]] = None,
+								  stats: Optional[dict] = None) -> List[int]:
+	"""
+	Finds the optimal strategy to minimize internal conflict in a social network using dynamic
+	programming, keeping the decisions table in a memory-mapped file instead of in memory.
+
+	It computes the same windows of budgets as `dynamic_bottom_up` and returns the same strategy. The
+	decisions of every layer are written, in the smallest integer type that fits, to consecutive ranges of
+	a file in a temporary directory created inside `scratch_dir`; the layer is filled in blocks of
+	`block_size` budgets so the slices read from the previous layer stay in cache. The reconstruction
+	reads back a single decision per layer. Only two rows of conflicts stay in memory, and the operating
+	system writes the decisions to disk as memory is needed. The temporary directory is always removed,
+	even if the run fails or is interrupted.
+
+	Parameters
+	----------
+	social_network : SocialNetwork
+		The social network to optimize.
+	scratch_dir : str, optional
+		Directory where the temporary decisions file is created (the system temporary directory by
+		default). It must have room for "file_bytes" (see `stats`).
+	block_size : int
+		Number of budgets filled at a time.
+	progress : Callable[[int, int, int], None], optional
+		See `dynamic_bottom_up`.
+	stats : dict, optional
+		If given, it is filled with "cells_total", "cells_computed", "table_bytes" (memory used by the
+		conflict rows), "file_bytes" (size of the decisions file), "bytes_written", "bytes_read",
+		"fill_time" (filling the layers, including writes to the mapping), "flush_time" (writing the
+		remaining dirty pages to disk), "reconstruction_time" and "time".
+
+	Returns
+	-------
+	List[int]
+		The best strategy as a list of integers where each value represents
+			the number of agents to remove from the corresponding group.
+
+	Notes
+	-----
+	- Time complexity: the same as `dynamic_bottom_up`, plus writing the decisions file once.
+	- Space complexity: O(R_max) in memory and O(∑ w_i) on disk.
+	"""
+	start_time = time.perf_counter()
+
+	groups = social_network.groups
+	n = len(groups)
+	r_max = social_network.r_max
+
+	# Check if the effort required to moderate the entire social network is less than or equal to the
+	# max effort allowed. If we have enough effort to moderate the entire social network, the optimal
+	# strategy is to moderate all agents in all groups
+	max_effort = calculate_max_effort(social_network)
+	if max_effort <= r_max:
+		return [group.n for group in groups]
+
+	if block_size <= 0:
+		raise ValueError("Error: block_size must be positive")
+
+	width = min(r_max, max_effort) + 1
+	options = network_options(social_network)
+	windows = layer_windows(social_network, options, width)
+
+	max_agents = max((group.n for group in groups), default=0)
+	decision_type = np.min_scalar_type(max_agents)
+
+	# The decisions of layer i are stored in offsets[i - 1]..offsets[i] - 1 of the file
+	sizes = [max(0, high - low + 1) for low, high, _ in windows]
+	offsets = np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+	cells = int(offsets[-1])
+
+	previous = np.zeros(width)
+	current = np.empty(width)
+
+	directory = tempfile.mkdtemp(prefix="dynamic-", dir=scratch_dir)
+	path = os.path.join(directory, "decisions.bin")
+	decisions = None
+
+	try:
+		decisions = np.memmap(path, dtype=decision_type, mode="w+", shape=(max(cells, 1),))
+
+		for i in range(1, n + 1):
+			efforts, conflicts = options[i - 1]
+			low, high, reachable_high = windows[i - 1]
+			row = decisions[offsets[i - 1]:offsets[i]]
+
+			current[:] = np.inf
+			for start in range(low, high + 1, block_size):
+				fill_layer_slice(previous, current, row, efforts, conflicts, start, min(start + block_size, high + 1),
+								 offset=low)
+
+			# Larger budgets than the effort of fully moderating groups 0..i-1 give the same result
+			if low <= high and high == reachable_high:
+				current[high + 1:] = current[high]
+
+			previous, current = current, previous
+
+			if progress is not None:
+				progress(i, n, int(offsets[i]))
+
+		fill_end = time.perf_counter()
+		decisions.flush()
+		flush_end = time.perf_counter()
+
+		# Reconstruct the optimal strategy, reading only the decision of the remaining effort of every layer
+		del decisions
+		decisions = np.memmap(path, dtype=decision_type, mode="r", shape=(max(cells, 1),))
+
+		optimal_strategy = [0] * n
+		remaining_effort = min(r_max, width - 1)
+
+		for i in range(n, 0, -1):
+			low, high, _ = windows[i - 1]
+			k = int(decisions[offsets[i - 1] + min(remaining_effort, high) - low])
+			optimal_strategy[i - 1] = k
+			remaining_effort -= int(options[i - 1][0][k])
+
+		end_time = time.perf_counter()
+	finally:
+		# The mapping must be closed before its file can be removed on every platform
+		del decisions
+		shutil.rmtree(directory, ignore_errors=True)
+
+	if stats is not None:
+		item_size = np.dtype(decision_type).itemsize
+		stats["cells_total"] = n * (r_max + 1)
+		stats["cells_computed"] = cells
+		stats["table_bytes"] = previous.nbytes + current.nbytes
+		stats["file_bytes"] = max(cells, 1) * item_size
+		stats["bytes_written"] = cells * item_size
+		stats["bytes_read"] = n * item_size
+		stats["fill_time"] = fill_end - start_time
+		stats["flush_time"] = flush_end - fill_end
+		stats["reconstruction_time"] = end_time - flush_end
+		stats["time"] = end_time - start_time
+
+	return optimal_strategy
+
+
+def solve_batch(social_networks: List[SocialNetwork]) -> Tuple[List[List[int]], int]:
+	"""
+	Solves a batch of networks whose full moderation does not fit in R_max with one DP over padded
+	network x group x option arrays, and reconstructs all their strategies together. Returns the
+	strategies and the number of (network, budget) cells computed.
+
+	The costs of every option are computed for the whole batch at once from the per-agent constants of
+	the groups. Every network only computes the budgets of its own windows (the windows of
+	`dynamic_bottom_up` without the bound trimming, which needs the greedy of every network): row b of a
+	layer holds the budgets low_b..high_b, shifted to start at column 0, so a layer is as wide as the widest
+	window of the batch. Networks with fewer groups keep their last window in the padded layers.
+	"""
+	batch = len(social_networks)
+	layers = max(len(social_network.groups) for social_network in social_networks)
+
+	# Per-agent constants of every group, zero for the padded groups
+	n = np.zeros((batch, layers), dtype=np.int64)
+	conflicts_per_agent = np.zeros((batch, layers), dtype=np.int64)
+	effort_numerators = np.zeros((batch, layers), dtype=np.int64)
+	for b, social_network in enumerate(social_networks):
+		for i, group in enumerate(social_network.groups):
+			n[b, i] = group.n
+			conflicts_per_agent[b, i] = (group.o_1 - group.o_2) ** 2
+			effort_numerators[b, i] = abs(group.o_1 - group.o_2) * fixed_point_rigidity(group.r)
+	r_max = np.array([social_network.r_max for social_network in social_networks], dtype=np.int64)
+
+	# Same effort as `calculate_group_effort`, ceil(E_i * k / RIGIDITY_SCALE), for every option
+	full_efforts = -(-effort_numerators * n // RIGIDITY_SCALE)
+	prefix_efforts = np.cumsum(full_efforts, axis=1)
+	max_efforts = prefix_efforts[:, -1]
+	width = int(np.max(np.minimum(r_max, max_efforts))) + 1
+
+	k = np.arange(int(n.max()) + 1, dtype=np.int64)
+	option_count = len(k)
+	exists = k[None, None, :] <= n[:, :, None]
+	# Padded options cost more than any budget; padded groups only have the option k = 0, at no cost
+	efforts = np.where(exists, -(-effort_numerators[:, :, None] * k // RIGIDITY_SCALE), width)
+	conflicts = np.where(exists, (n[:, :, None] - k) * conflicts_per_agent[:, :, None], 0).astype(np.float64)
+
+	# Budgets reachable after layer i: at most the full effort of groups 0..i (larger budgets give the same
+	# result), and at least R_max minus the full effort of the following groups
+	lows = np.maximum(0, r_max[:, None] - (max_efforts[:, None] - prefix_efforts))
+	highs = np.minimum(np.minimum(r_max, max_efforts)[:, None], prefix_efforts)
+	saturated = np.ones((batch, layers), dtype=bool) # Budgets above high give the result of high
+
+	widths = np.maximum(0, highs - lows + 1)
+	row_width = max(1, int(widths.max()))
+	rows = np.arange(batch)
+	row_offsets = rows[:, None] * row_width
+	columns = np.arange(row_width)
+
+	# Base case: no groups, no conflict for every budget
+	previous = np.zeros((batch, row_width))
+	previous_lows = np.zeros(batch, dtype=np.int64)
+	previous_widths = np.ones(batch, dtype=np.int64)
+	previous_saturated = np.ones(batch, dtype=bool)
+
+	current = np.empty((batch, row_width))
+	decisions = np.zeros((batch, layers, row_width), dtype=np.min_scalar_type(option_count - 1))
+	cells_computed = 0
+
+	for i in range(layers):
+		layer_width = int(widths[:, i].max())
+		current.fill(np.inf)
+		window = current[:, :layer_width]
+		decision = decisions[:, i, :layer_width]
+		budgets = lows[:, i, None] + columns[None, :layer_width]
+		in_window = columns[None, :layer_width] < widths[:, i, None]
+		last_column = previous_widths[:, None] - 1
+
+		for k in range(option_count):
+			effort = efforts[:, i, k]
+			if not np.any(effort <= highs[:, i]):
+				break # Efforts increase with k in every network
+
+			# candidates[b, j] = previous[b, low_b + j - effort[b]], in the columns of the previous layer
+			sources = budgets - effort[:, None] - previous_lows[:, None]
+			valid = in_window & (sources >= 0) & (previous_saturated[:, None] | (sources <= last_column))
+			sources = np.maximum(np.minimum(sources, last_column), 0)
+			candidates = np.take(previous, row_offsets + sources) + conflicts[:, i, k, None]
+			better = valid & (candidates < window)
+			np.copyto(window, candidates, where=better)
+			np.copyto(decision, k, where=better)
+
+		cells_computed += batch * layer_width
+
+		previous, current = current, previous
+		previous_lows = lows[:, i]
+		previous_widths = widths[:, i]
+		previous_saturated = saturated[:, i]
+
+	# Reconstruct every strategy from its own R_max
+	strategies = np.zeros((batch, layers), dtype=np.int64)
+	remaining_effort = np.minimum(r_max, max_efforts)
+	for i in range(layers - 1, -1, -1):
+		k = decisions[rows, i, np.minimum(remaining_effort, highs[:, i]) - lows[:, i]].astype(np.int64)
+		strategies[:, i] = k
+		remaining_effort -= efforts[rows, i, k]
+
+	return ([strategies[b, :len(social_network.groups)].tolist() for b, social_network in enumerate(social_networks)],
+			cells_computed)
+
+
+def dynamic_bottom_up_batch(social_networks: List[SocialNetwork], max_cells: int = BATCH_MAX_CELLS,
+							progress: Optional[Callable[[int, int, int], None]] = None) -> List[List[int]]:
+	"""
+	Finds the optimal strategy of many (small) social networks at once, advancing the DP layers of all
+	of them together with vectorized operations over network x budget arrays.
+
+	Networks whose full moderation fits in R_max are solved directly, and networks with more than
+	`BATCH_MAX_NETWORK_CELLS` groups * budgets (or groups of more than `BATCH_MAX_AGENTS` agents) with
+	`dynamic_bottom_up`: for them the Python overhead per layer is negligible, and its bound trimming
+	computes fewer budgets. The others are bucketed by the number of budgets their DP needs
+	(min(R_max, max effort) + 1), their number of groups and their largest group, all rounded up to a
+	power of 2, so padding at most doubles any of them. Every bucket is sorted by R_max and split in
+	batches of at most `max_cells` decision cells (networks * groups * budgets), solved by `solve_batch`.
+	Every strategy is optimal, with the same internal conflict as the one of `dynamic_bottom_up`.
+
+	Parameters
+	----------
+	social_networks : List[SocialNetwork]
+		The networks to optimize.
+	max_cells : int
+		Maximum number of decision cells of a batch; it bounds the memory, about one byte per cell for
+		networks of up to 255 agents per group.
+	progress : Callable[[int, int, int], None], optional
+		Called after every batch with the number of networks solved, the total number of networks and the
+		number of (network, group, effort) states explored so far.
+
+	Returns
+	-------
+	List[List[int]]
+		The best strategy of every network, in the same order.
+
+	Raises
+	------
+	ValueError
+		If max_cells is not positive.
+
+	Notes
+	-----
+	- Time complexity: O(∑ over batches of networks * groups * options * width); the Python overhead is
+	  paid once per (group, option) of a batch instead of once per network, so it pays off for networks
+	  of tens of groups and budgets, where that overhead dominates the DP.
+	"""
+	if max_cells <= 0:
+		raise ValueError("Error: max_cells must be positive")
+
+	strategies: List[Optional[List[int]]] = [None] * len(social_networks)
+	buckets = {}
+	large = []
+	done = 0
+	explored = 0
+
+	for index, social_network in enumerate(social_networks):
+		max_effort = calculate_max_effort(social_network)
+		if max_effort <= social_network.r_max:
+			strategies[index] = [group.n for group in social_network.groups]
+			done += 1
+			continue
+
+		width = min(social_network.r_max, max_effort) + 1
+		max_agents = max(group.n for group in social_network.groups)
+		# Large networks gain nothing from batching, and their efforts may not fit in int64
+		if width * len(social_network.groups) > BATCH_MAX_NETWORK_CELLS or max_agents > BATCH_MAX_AGENTS:
+			large.append(index)
+			continue
+
+		# Bucket by budgets, number of groups and options per group, all rounded up to a power of 2
+		key = ((width - 1).bit_length(), len(social_network.groups).bit_length(), max_agents.bit_length())
+		buckets.setdefault(key, []).append(index)
+
+	for index in large:
+		stats = {}
+		strategies[index] = dynamic_bottom_up(social_networks[index], stats=stats)
+		done += 1
+		explored += stats["cells_computed"]
+		if progress is not None:
+			progress(done, len(social_networks), explored)
+
+	for (width_bits, _, _), indices in sorted(buckets.items()):
+		# Networks with close R_max reach close budgets
+		indices.sort(key=lambda index: social_networks[index].r_max)
+		start = 0
+		while start < len(indices):
+			# Grow the batch while its padded decision table fits in max_cells (at least one network)
+			stop = start + 1
+			layers = len(social_networks[indices[start]].groups)
+			while stop < len(indices):
+				layers = max(layers, len(social_networks[indices[stop]].groups))
+				if (stop + 1 - start) * layers * (1 << width_bits) > max_cells:
+					break
+				stop += 1
+
+			batch_strategies, cells_computed = solve_batch([social_networks[index] for index in indices[start:stop]])
+			for index, strategy in zip(indices[start:stop], batch_strategies):
+				strategies[index] = strategy
+
+			done += stop - start
+			explored += cells_computed
+			if progress is not None:
+				progress(done, len(social_networks), explored)
+			start = stop
+
+	if progress is not None and not buckets and not large:
+		progress(done, len(social_networks), explored)
+
+	return strategies
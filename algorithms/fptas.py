@@ -0,0 +1,186 @@
+import math
+from typing import List, NamedTuple
+
+import numpy as np
+
+from algorithms.dynamic import network_options
+from algorithms.greedy import greedy_moderation_with_radix_sort
+from classes.social_network import SocialNetwork, calculate_max_effort
+
+DEFAULT_EPSILON = 0.1
+
+
+class FPTASSolution(NamedTuple):
+	strategy: List[int]
+	removed_conflict: int
+	removed_conflict_bound: float
+
+
+def fractional_removed_conflict(social_network: SocialNetwork) -> float:
+	"""
+	Upper bound on the conflict numerator (∑ n_i * (o_i,1 - o_i,2)²) that any applicable strategy can
+	remove: the fractional knapsack that moderates agents by decreasing conflict/effort rate and may
+	moderate a fraction of an agent, ignoring the rounding up of the effort.
+	"""
+	free_conflict = 0
+	paid_groups = []
+
+	for group in social_network.groups:
+		conflict_per_agent = (group.o_1 - group.o_2) ** 2
+		effort_per_agent = abs(group.o_1 - group.o_2) * group.r
+		if effort_per_agent == 0:
+			free_conflict += group.n * conflict_per_agent
+		else:
+			paid_groups.append((conflict_per_agent / effort_per_agent, group.n * effort_per_agent,
+								group.n * conflict_per_agent))
+
+	removed = float(free_conflict)
+	remaining_effort = social_network.r_max
+
+	for rate, effort, conflict in sorted(paid_groups, reverse=True):
+		if effort <= remaining_effort:
+			removed += conflict
+			remaining_effort -= effort
+		else:
+			removed += rate * remaining_effort
+			break
+
+	return removed
+
+
+def fptas_solve(social_network: SocialNetwork, epsilon: float = DEFAULT_EPSILON) -> FPTASSolution:
+	"""
+	Finds a strategy whose removed conflict is within a factor (1 + ε) of the optimal removed conflict,
+	with a dynamic program over rounded conflict values instead of efforts.
+
+	The conflict removed by moderating k agents of a group, k * (o_1 - o_2)², is divided by
+	K = ε * LB / ((1 + ε) * n), where LB is the conflict removed by a known applicable strategy, and
+	rounded down. For every reachable rounded total the DP keeps the least effort that reaches it, and the
+	best total within R_max gives the strategy. Rounding loses less than K per group, so the strategy
+	removes at least OPT - n * K >= OPT / (1 + ε).
+
+	Parameters
+	----------
+	social_network : SocialNetwork
+		The social network to optimize.
+	epsilon : float
+		The approximation factor. Smaller values give better strategies and longer runs.
+
+	Returns
+	-------
+	FPTASSolution
+		The strategy, the conflict numerator it removes and an upper bound on the conflict numerator that
+		the optimal strategy removes (at most (1 + ε) times the removed conflict).
+
+	Raises
+	------
+	ValueError
+		If epsilon is not positive.
+
+	Notes
+	-----
+	- Time complexity: O(∑ min(n_i, n * (1 + ε) / ε) * n * (1 + ε) / ε): it does not depend on R_max.
+	- Space complexity: O(n² * (1 + ε) / ε) for the decisions, stored in the smallest integer type that fits.
+	"""
+	if epsilon <= 0:
+		raise ValueError("Error: epsilon must be positive")
+
+	groups = social_network.groups
+	n = len(groups)
+	r_max = social_network.r_max
+
+	# Check if the effort required to moderate the entire social network is less than or equal to the
+	# max effort allowed. If we have enough effort to moderate the entire social network, the optimal
+	# strategy is to moderate all agents in all groups
+	if calculate_max_effort(social_network) <= r_max:
+		strategy = [group.n for group in groups]
+		removed = sum(group.n * (group.o_1 - group.o_2) ** 2 for group in groups)
+		return FPTASSolution(strategy, removed, removed)
+
+	options = network_options(social_network)
+	# removable[i][k] = conflict numerator removed by moderating k agents of group i
+	removable = [np.arange(group.n + 1, dtype=np.int64) * (group.o_1 - group.o_2) ** 2 for group in groups]
+
+	# Lower bound: the best of the greedy strategy and of moderating as much as possible of a single group
+	greedy_strategy = greedy_moderation_with_radix_sort(social_network)
+	lower_bound = sum(k * (group.o_1 - group.o_2) ** 2 for group, k in zip(groups, greedy_strategy))
+	best_single = (0, 0)
+	for i, (efforts, _) in enumerate(options):
+		k = int(np.searchsorted(efforts, r_max, side="right")) - 1
+		if removable[i][k] > best_single[1]:
+			best_single = (i, int(removable[i][k]))
+
+	if best_single[1] > lower_bound:
+		lower_bound = best_single[1]
+		greedy_strategy = [0] * n
+		greedy_strategy[best_single[0]] = int(np.searchsorted(options[best_single[0]][0], r_max, side="right")) - 1
+
+	if lower_bound == 0:
+		return FPTASSolution([0] * n, 0, 0.0) # No applicable strategy removes any conflict
+
+	upper_bound = fractional_removed_conflict(social_network)
+	scale = epsilon * lower_bound / ((1 + epsilon) * n)
+	max_profit = math.floor(upper_bound / scale)
+
+	# min_effort[p] = least effort reaching a rounded removed conflict of exactly p with the groups so far
+	unreachable = np.iinfo(np.int64).max // 4
+	min_effort = np.full(max_profit + 1, unreachable, dtype=np.int64)
+	min_effort[0] = 0
+	decision_type = np.min_scalar_type(max((group.n for group in groups), default=0))
+	decisions = np.zeros((n, max_profit + 1), dtype=decision_type)
+
+	for i in range(n):
+		efforts, _ = options[i]
+		profits = np.floor(removable[i] / scale).astype(np.int64)
+
+		# Several k may round to the same profit; the smallest one needs the least effort
+		applicable = efforts <= r_max
+		distinct_profits, first_k = np.unique(profits[applicable], return_index=True)
+
+		updated = min_effort.copy()
+		decision = decisions[i]
+		for profit, k in zip(distinct_profits, first_k):
+			if profit == 0 or profit > max_profit:
+				continue
+			candidates = min_effort[:max_profit + 1 - profit] + efforts[k]
+			better = candidates < updated[profit:]
+			np.copyto(updated[profit:], candidates, where=better)
+			np.copyto(decision[profit:], int(k), where=better)
+
+		min_effort = updated
+
+	# Reconstruct the strategy of the largest rounded removed conflict that fits in R_max
+	profit = int(np.flatnonzero(min_effort <= r_max)[-1])
+	strategy = [0] * n
+	for i in range(n - 1, -1, -1):
+		k = int(decisions[i, profit])
+		strategy[i] = k
+		profit -= int(math.floor(removable[i][k] / scale))
+
+	removed = sum(int(removable[i][k]) for i, k in enumerate(strategy))
+	if removed < lower_bound: # Cannot happen with exact arithmetic, but keeps the guarantee under rounding
+		strategy = list(greedy_strategy)
+		removed = lower_bound
+
+	return FPTASSolution(strategy, removed, min(upper_bound, removed + n * scale))
+
+
+def fptas_moderation(social_network: SocialNetwork, epsilon: float = DEFAULT_EPSILON) -> List[int]:
+	"""
+	Finds a strategy that removes at least 1 / (1 + ε) of the conflict removed by the optimal strategy.
+	See `fptas_solve`.
+
+	Parameters
+	----------
+	social_network : SocialNetwork
+		The social network to optimize.
+	epsilon : float
+		The approximation factor.
+
+	Returns
+	-------
+	List[int]
+		The strategy as a list of integers where each value represents
+			the number of agents to moderate in the corresponding group.
+	"""
+	return fptas_solve(social_network, epsilon).strategy
@@ -1,8 +1,8 @@
 import heapq
-import math
-from typing import List
+from typing import Callable, List, Optional
 
 from classes.agent_group import create_agent_group
+from classes.cost_index import cost_index
 from classes.social_network import SocialNetwork, calculate_max_effort
 
 
@@ -49,21 +49,20 @@ def greedy_discrepancy_rigidity_heap(social_network: SocialNetwork) -> List[int]
 			reduction = abs(group.o_1 - group.o_2) / group.r  # Reduction per unit of effort
 			heapq.heappush(heap, (-reduction, i))
 
+	costs = cost_index(social_network)
+
 	while remaining_budget > 0 and heap:
 		_, best_index = heapq.heappop(heap)
-		group = groups[best_index]
 
-		effort_per_agent = abs(group.o_1 - group.o_2) * group.r
-		if effort_per_agent == 0 or effort_per_agent > remaining_budget:
-			continue  # Avoid division by zero or exceeding budget
+		if costs.effort_numerators[best_index] == 0:
+			continue  # Avoid division by zero
 
-		max_agents_moderatable = group.n  # Can't moderate more agents than we have
-		max_possible = remaining_budget // effort_per_agent  # Max we can afford
-		agents_to_moderate = min(max_agents_moderatable, max_possible) # Calculate how many agents we can actually moderate
+		# Max we can afford, which can't be more agents than we have
+		agents_to_moderate = costs.max_agents(best_index, remaining_budget)
 
 		if agents_to_moderate > 0:
 			strategy[best_index] = agents_to_moderate
-			remaining_budget -= math.ceil(agents_to_moderate * effort_per_agent)
+			remaining_budget -= costs.effort(best_index, agents_to_moderate)
 
 	return strategy
 
@@ -180,7 +179,8 @@ def radix_sort_groups(groups):
 	return [group for group, _ in reversed(processed_groups)]
 
 
-def greedy_moderation_with_radix_sort(social_network: SocialNetwork) -> List[int]:
+def greedy_moderation_with_radix_sort(social_network: SocialNetwork,
+									  progress: Optional[Callable[[int, int, int], None]] = None) -> List[int]:
 	"""
 	Implements a greedy moderation strategy by first sorting the groups using Radix Sort based on
 	their discrepancy-to-rigidity ratio (|o_1 - o_2| / r) in descending order. The algorithm then moderates
@@ -190,6 +190,9 @@ def greedy_moderation_with_radix_sort(social_network: SocialNetwork) -> List[int
 	----------
 	social_network : SocialNetwork
 		The social network containing agent groups and the available effort budget.
+	progress : Callable[[int, int, int], None], optional
+		Called once the strategy is built with the number of groups processed, the total number of
+		groups and the number of groups explored.
 
 	Returns
 	-------
@@ -240,24 +243,26 @@ def greedy_moderation_with_radix_sort(social_network: SocialNetwork) -> List[int
 	for i, group in enumerate(social_network.groups):
 		group_to_index[id(group)] = i
 
+	costs = cost_index(social_network)
+
 	for group in sorted_groups:
 		if remaining_r <= 0:
 			break # No more budget available
 
 		#index = social_network.groups.index(group)
 		index = group_to_index[id(group)]
-		max_agents_moderatable = group.n
 
-		effort_per_agent = abs(group.o_1 - group.o_2) * group.r
-		if effort_per_agent == 0 or effort_per_agent > remaining_r:
+		if costs.effort_numerators[index] == 0:
 			continue
 
-		max_possible = remaining_r // effort_per_agent  # Max number of agents we can afford to moderate
-
-		agents_to_moderate = min(max_agents_moderatable, max_possible) # The number of agents we can actually moderate
+		# The number of agents we can actually moderate
+		agents_to_moderate = costs.max_agents(index, remaining_r)
 
 		if agents_to_moderate > 0:
 			strategy[index] += agents_to_moderate
-			remaining_r -= math.ceil(agents_to_moderate * effort_per_agent)
+			remaining_r -= costs.effort(index, agents_to_moderate)
+
+	if progress is not None:
+		progress(n, n, n)
 
 	return strategy
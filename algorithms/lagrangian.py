@@ -0,0 +1,197 @@
+from fractions import Fraction
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from classes.agent_group import RIGIDITY_SCALE
+from classes.cost_index import CostIndex, cost_index
+from classes.social_network import SocialNetwork
+
+# Maximum number of bisection steps on the multiplier
+MAX_BISECTION_STEPS = 200
+
+
+class LagrangianSolution(NamedTuple):
+	strategy: List[int]
+	conflict: int # Conflict numerator ∑ (n_i - e_i) * (o_i,1 - o_i,2)² left by the strategy
+	lower_bound: Fraction # Lower bound on the conflict numerator left by the optimal strategy
+	multiplier: float # The multiplier λ of the bound, in conflict per unit of effort
+
+
+def group_ratios(costs: CostIndex) -> Tuple[NDArray[np.bool_], NDArray[np.float64]]:
+	"""
+	Returns which groups need effort to be moderated and the conflict per unit of effort of every group:
+	infinite for the free ones and -infinite for the ones without conflict.
+	"""
+	_, conflicts_per_agent, effort_numerators, _ = costs.columns()
+	paid = effort_numerators > 0
+	with np.errstate(divide="ignore", invalid="ignore"):
+		ratios = np.where(paid, conflicts_per_agent / effort_numerators * RIGIDITY_SCALE, np.inf)
+	ratios[conflicts_per_agent == 0] = -np.inf # Nothing to gain by moderating these groups
+	return paid, ratios
+
+
+def relaxation(costs: CostIndex, r_max: int) -> Tuple[Fraction, float, NDArray[np.bool_]]:
+	"""
+	Maximizes the Lagrangian bound L(λ) of a network whose full moderation does not fit in R_max (see
+	`lagrangian_solve`). Returns the bound on the conflict numerator, the multiplier and which groups the
+	relaxation moderates fully at that multiplier.
+	"""
+	n, conflicts_per_agent, effort_numerators, _ = costs.columns()
+	total_conflict = int(np.dot(n, conflicts_per_agent))
+
+	paid, ratios = group_ratios(costs)
+
+	# Fractional effort of moderating every agent of the groups with a ratio above λ
+	fractional_efforts = n * (effort_numerators / RIGIDITY_SCALE)
+
+	def spent(multiplier: float) -> float:
+		return float(np.sum(fractional_efforts, where=paid & (ratios > multiplier)))
+
+	# Smallest λ whose fully moderated groups fit in R_max: spent(low) > R_max >= spent(high)
+	low, high = 0.0, float(np.max(ratios, where=paid, initial=0.0))
+	if spent(low) <= r_max:
+		high = low
+	for _ in range(MAX_BISECTION_STEPS):
+		if not np.any((ratios > low) & (ratios < high)):
+			break # No group ratio lies between the bounds, so high is the ratio of a group
+		middle = (low + high) / 2
+		if spent(middle) > r_max:
+			low = middle
+		else:
+			high = middle
+
+	if high > 0:
+		# Snap λ to the group b with the smallest ratio above it and compare ratios exactly:
+		# c_i / e_i > c_b / e_b  <=>  c_i * E_b > c_b * E_i, with E the effort numerators
+		candidates = np.flatnonzero(paid & (ratios >= high))
+		b = int(candidates[np.argmin(ratios[candidates])])
+		c_b, E_b = int(conflicts_per_agent[b]), int(effort_numerators[b])
+		above = conflicts_per_agent * E_b > c_b * effort_numerators
+		multiplier = float(ratios[b])
+
+		# L(λ) * E_b = E_b * ∑_{not above} n_i c_i + c_b * ∑_{above} n_i E_i - c_b * SCALE * R_max
+		kept = total_conflict - int(np.dot(n[above], conflicts_per_agent[above]))
+		above_n, above_E = n[above], effort_numerators[above]
+		above_effort = (int(np.dot(above_n, above_E // RIGIDITY_SCALE)) * RIGIDITY_SCALE
+						+ int(np.dot(above_n, above_E % RIGIDITY_SCALE)))
+		lower_bound = Fraction(E_b * kept + c_b * above_effort - c_b * RIGIDITY_SCALE * r_max, E_b)
+	else:
+		above = conflicts_per_agent > 0
+		multiplier = 0.0
+		lower_bound = Fraction(0)
+
+	return max(lower_bound, Fraction(0)), multiplier, above
+
+
+def lagrangian_solve(social_network: SocialNetwork) -> LagrangianSolution:
+	"""
+	Finds a strategy and a lower bound on the optimal internal conflict by relaxing the R_max constraint
+	with a multiplier λ.
+
+	Moderating k agents of group i costs at least k * e_i, with e_i = |o_1 - o_2| * r the effort per agent,
+	so for every λ >= 0 the optimal conflict numerator is at least
+		L(λ) = ∑ n_i * min(c_i, λ * e_i) - λ * R_max,
+	where c_i = (o_1 - o_2)² is the conflict per agent: every group decides on its own to moderate all its
+	agents (if c_i > λ * e_i) or none. The bound is largest at the multiplier where the groups moderated
+	fully stop fitting in R_max, which is found by bisection over the vectors of the cost index; it is
+	then snapped to the ratio c_b / e_b of a group and evaluated exactly.
+
+	The groups the relaxation moderates are moderated fully and, since the effort of a group is rounded
+	up, the strategy is repaired to fit in R_max by removing agents from the groups with the lowest ratio
+	first. The effort left is given to the other groups by decreasing ratio.
+
+	Parameters
+	----------
+	social_network : SocialNetwork
+		The social network to optimize.
+
+	Returns
+	-------
+	LagrangianSolution
+		The strategy, the conflict numerator it leaves, the lower bound on the optimal conflict numerator
+		and the multiplier of the bound. Dividing by the number of groups gives internal conflicts.
+
+	Notes
+	-----
+	- Time complexity: O(n * MAX_BISECTION_STEPS) vector operations plus O(m log m) to repair the
+	  strategy, where m is the number of groups it touches.
+	- The exact bound assumes fewer than 9 * 10^9 agents in total (the effort sums stay in int64).
+	"""
+	groups = social_network.groups
+	r_max = social_network.r_max
+	costs = cost_index(social_network)
+	n, conflicts_per_agent, effort_numerators, full_efforts = costs.columns()
+	total_conflict = int(np.dot(n, conflicts_per_agent))
+
+	# If we have enough effort to moderate the entire social network, moderate all agents in all groups
+	if costs.max_effort <= r_max:
+		return LagrangianSolution([group.n for group in groups], 0, Fraction(0), 0.0)
+
+	lower_bound, multiplier, above = relaxation(costs, r_max)
+	paid, ratios = group_ratios(costs)
+	strategy = np.zeros(len(groups), dtype=np.int64)
+
+	# Primal: moderate fully the groups above λ (the free ones always are)
+	strategy[above] = n[above]
+	remaining_effort = r_max - int(np.sum(full_efforts[above]))
+
+	# Repair: the rounded efforts may exceed R_max, remove agents from the lowest ratios first
+	if remaining_effort < 0:
+		moderated = np.flatnonzero(above & paid)
+		for i in moderated[np.argsort(ratios[moderated], kind="stable")]:
+			i = int(i)
+			k = costs.max_agents(i, int(full_efforts[i]) + remaining_effort)
+			remaining_effort += int(full_efforts[i]) - costs.effort(i, k)
+			strategy[i] = k
+			if remaining_effort >= 0:
+				break
+
+	# Give the effort left to the other groups by decreasing ratio
+	one_agent_efforts = -(-effort_numerators // RIGIDITY_SCALE)
+	candidates = np.flatnonzero(~above & paid & (conflicts_per_agent > 0) & (one_agent_efforts <= remaining_effort))
+	for i in candidates[np.argsort(-ratios[candidates], kind="stable")]:
+		if remaining_effort <= 0:
+			break
+		i = int(i)
+		k = costs.max_agents(i, remaining_effort)
+		if k > 0:
+			strategy[i] = k
+			remaining_effort -= costs.effort(i, k)
+
+	conflict = total_conflict - int(np.dot(strategy, conflicts_per_agent))
+	return LagrangianSolution(strategy.tolist(), conflict, lower_bound, multiplier)
+
+
+def lagrangian_moderation(social_network: SocialNetwork) -> List[int]:
+	"""
+	Finds a strategy to minimize internal conflict with the Lagrangian relaxation of the R_max constraint.
+	See `lagrangian_solve`, which also returns a lower bound on the optimal internal conflict.
+
+	Parameters
+	----------
+	social_network : SocialNetwork
+		The social network to optimize.
+
+	Returns
+	-------
+	List[int]
+		The strategy as a list of integers where each value represents
+			the number of agents to moderate in the corresponding group.
+	"""
+	return lagrangian_solve(social_network).strategy
+
+
+def lagrangian_lower_bound(social_network: SocialNetwork) -> Fraction:
+	"""
+	Lower bound on the conflict numerator ∑ (n_i - e_i) * (o_i,1 - o_i,2)² left by any applicable strategy.
+
+	At its best multiplier the Lagrangian bound equals the fractional knapsack bound: groups moderated by
+	decreasing conflict/effort rate, with a fraction of an agent allowed and the rounding up of the effort
+	ignored.
+	"""
+	costs = cost_index(social_network)
+	if costs.max_effort <= social_network.r_max:
+		return Fraction(0)
+	return relaxation(costs, social_network.r_max)[0]
@@ -0,0 +1,181 @@
+import math
+import time
+from typing import List, Optional
+
+from algorithms.greedy import greedy_moderation_with_radix_sort
+from classes.cost_index import cost_index
+from classes.social_network import SocialNetwork, calculate_max_effort
+
+
+class LocalSearch:
+	"""
+	Improves an applicable strategy with add, remove and transfer moves between groups.
+
+	The per-group constants of the cost index of the network (conflict per agent and exact effort per
+	agent) give the effort and conflict change of moderating or releasing k agents of any group in O(1),
+	so a transfer is scored in O(#donors).
+	"""
+	def __init__(self, social_network: SocialNetwork, strategy: List[int]):
+		self.costs = cost_index(social_network)
+		self.n = self.costs.n
+		self.conflict_per_agent = self.costs.conflicts_per_agent
+
+		self.strategy = [int(e) for e in strategy]
+		self.remaining_effort = social_network.r_max - sum(self.effort(i, e) for i, e in enumerate(self.strategy))
+
+		# Groups by decreasing conflict removed per unit of effort (free groups first)
+		effort_numerators = self.costs.effort_numerators
+		self.order = sorted(
+			(i for i in range(len(self.n)) if self.conflict_per_agent[i] > 0),
+			key=lambda i: -self.conflict_per_agent[i] / effort_numerators[i] if effort_numerators[i] > 0 else -math.inf
+		)
+
+	def effort(self, i: int, k: int) -> int:
+		"""Effort of moderating k agents of group i."""
+		return self.costs.effort(i, k)
+
+	def max_addition(self, i: int, budget: int) -> int:
+		"""Largest number of extra agents of group i that can be moderated with `budget` more effort."""
+		limit = self.effort(i, self.strategy[i]) + budget
+		return max(self.costs.max_agents(i, limit) - self.strategy[i], 0)
+
+	def fill(self) -> bool:
+		"""Adds as many agents as the remaining effort allows, by decreasing rate. Returns if it added any."""
+		improved = False
+
+		for i in self.order:
+			if self.remaining_effort < 0:
+				break
+			m = self.max_addition(i, self.remaining_effort)
+			if m > 0:
+				self.remaining_effort -= self.effort(i, self.strategy[i] + m) - self.effort(i, self.strategy[i])
+				self.strategy[i] += m
+				improved = True
+
+		return improved
+
+	def min_removal(self, i: int, need: int) -> int:
+		"""Fewest agents of group i whose release frees at least `need` effort (or all its moderated agents)."""
+		s_i = self.strategy[i]
+		if self.costs.effort_numerators[i] == 0:
+			return 0
+
+		# Keep the most agents whose effort leaves `need` free
+		return s_i - min(s_i, self.costs.max_agents(i, self.effort(i, s_i) - need))
+
+	def best_transfer(self, neighbourhood: int, deadline: float = math.inf) -> Optional[tuple]:
+		"""
+		Finds the first transfer that reduces the conflict: add m agents to one of the `neighbourhood` best
+		receiver groups and free the effort they need (beyond the remaining effort) by releasing the fewest
+		agents of the groups with the worst conflict/effort rate. The scan stops (returning None) once
+		`time.perf_counter()` passes `deadline`.
+
+		Returns
+		-------
+		Optional[Tuple[List[Tuple[int, int]], int, int]]
+			([(donor, t), ...], receiver, m) or None if no transfer improves the strategy.
+		"""
+		receivers = [j for j in self.order if self.strategy[j] < self.n[j]][:neighbourhood]
+		donors = [i for i in reversed(self.order) if self.strategy[i] > 0 and self.costs.effort_numerators[i] > 0]
+
+		for j in receivers:
+			s_j = self.strategy[j]
+			for m in range(1, self.n[j] - s_j + 1):
+				if time.perf_counter() > deadline:
+					return None
+
+				gain = m * self.conflict_per_agent[j]
+				need = self.effort(j, s_j + m) - self.effort(j, s_j) - self.remaining_effort
+
+				removals = []
+				loss = 0
+				for i in donors:
+					if need <= 0 or loss >= gain:
+						break
+					if i == j:
+						continue
+					t = self.min_removal(i, need)
+					need -= self.effort(i, self.strategy[i]) - self.effort(i, self.strategy[i] - t)
+					loss += t * self.conflict_per_agent[i]
+					removals.append((i, t))
+
+				if loss >= gain:
+					continue # The releases cost more than m agents gain, but they may free enough for more
+				if need > 0:
+					break # Not even releasing every donor pays for m agents, nor for more
+				return removals, j, m
+
+		return None
+
+	def apply_transfer(self, removals: List[tuple], j: int, m: int) -> None:
+		for i, t in removals:
+			self.remaining_effort += self.effort(i, self.strategy[i]) - self.effort(i, self.strategy[i] - t)
+			self.strategy[i] -= t
+		self.remaining_effort -= self.effort(j, self.strategy[j] + m) - self.effort(j, self.strategy[j])
+		self.strategy[j] += m
+
+	def run(self, max_iterations: int, time_limit: float, neighbourhood: int) -> List[int]:
+		deadline = time.perf_counter() + time_limit
+
+		self.fill()
+		for _ in range(max_iterations):
+			if time.perf_counter() > deadline:
+				break
+
+			move = self.best_transfer(neighbourhood, deadline)
+			if move is None:
+				break
+
+			self.apply_transfer(*move)
+			self.fill()
+
+		return self.strategy
+
+
+def local_search_moderation(social_network: SocialNetwork, initial_strategy: Optional[List[int]] = None,
+							max_iterations: int = 10_000, time_limit: float = 1.0,
+							neighbourhood: int = 32) -> List[int]:
+	"""
+	Refines a strategy (the greedy one by default) with local search.
+
+	The search first spends the effort left over by the initial strategy, then repeatedly applies the first
+	transfer of agents from the groups with the worst conflict/effort rate to another group that reduces
+	the internal conflict, spending again any effort left over after each transfer, until no transfer
+	improves the strategy or the budget of iterations or time runs out. The result is never worse than the
+	initial strategy.
+
+	Parameters
+	----------
+	social_network : SocialNetwork
+		The social network to optimize.
+	initial_strategy : List[int], optional
+		An applicable strategy to start from. The greedy strategy is used when it is not given.
+	max_iterations : int
+		Maximum number of transfers applied.
+	time_limit : float
+		Maximum number of seconds spent searching.
+	neighbourhood : int
+		Number of groups (with the best conflict/effort rate that can still be moderated) considered as
+		receivers of every transfer.
+
+	Returns
+	-------
+	List[int]
+		A list where each index represents an agent group, and the value at that index represents
+		the number of agents moderated from that group.
+
+	Notes
+	-----
+	- Each move is evaluated in O(1) per donor group. An iteration tries up to max(n_i) sizes m for each of
+	  the `neighbourhood` receivers, each with up to n donors, so it takes O(neighbourhood * max(n_i) * n)
+	  in the worst case; `time_limit` is also checked between the sizes, so one iteration cannot overrun it.
+	"""
+	# Check if the effort required to moderate the entire social network is less than or equal to the max effort allowed.
+	# If we have enough effort to moderate the entire social network, the optimal strategy is to moderate all agents in all groups.
+	if calculate_max_effort(social_network) <= social_network.r_max:
+		return [group.n for group in social_network.groups]
+
+	if initial_strategy is None:
+		initial_strategy = greedy_moderation_with_radix_sort(social_network)
+
+	return LocalSearch(social_network, initial_strategy).run(max_iterations, time_limit, neighbourhood)
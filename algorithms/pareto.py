@@ -0,0 +1,155 @@
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from classes.cost_index import cost_index
+from classes.social_network import SocialNetwork
+
+
+class ParetoFrontier(NamedTuple):
+	efforts: NDArray[np.int64]
+	conflicts: NDArray[np.int64]
+	layer_sizes: List[int]
+	parents: List[NDArray[np.integer]]
+	choices: List[NDArray[np.integer]]
+	n_groups: int
+
+	def trade_off(self) -> List[Tuple[int, float]]:
+		"""
+		Returns the budget/internal conflict trade-off described by the final frontier.
+
+		Returns
+		-------
+		List[Tuple[int, float]]
+			A list of (effort, IC) pairs sorted by increasing effort. Every pair is optimal: no strategy
+			reaches a lower IC with the same or less effort.
+		"""
+		denominator = self.n_groups if self.n_groups > 0 else 1
+		return [(int(e), c / denominator) for e, c in zip(self.efforts, self.conflicts)]
+
+
+def pareto_frontier(social_network: SocialNetwork) -> ParetoFrontier:
+	"""
+	Builds the Pareto frontier of non-dominated (effort, conflict) states, group by group
+	(Nemhauser-Ullmann).
+
+	After processing groups 0..i-1 the frontier holds, sorted by increasing effort, every partial
+	strategy for which no other partial strategy has both less or equal effort and less or equal
+	conflict. Each new group is merged by combining every frontier state with every option k of the
+	group, discarding the combinations that exceed R_max and pruning the dominated ones.
+
+	Parameters
+	----------
+	social_network : SocialNetwork
+		The social network to optimize.
+
+	Returns
+	-------
+	ParetoFrontier
+		The final frontier (efforts and conflict numerators), the frontier size after every layer and
+		the back-pointers needed to reconstruct the strategy of any frontier state.
+
+	Notes
+	-----
+	- Time complexity: O(∑ F_i * (n_i + 1) * log(F_i * (n_i + 1))) where F_i is the frontier size before
+	  processing group i. It does not depend on R_max, so it is the right choice when R_max is huge but
+	  few (effort, conflict) combinations are non-dominated.
+	- Back-pointers are stored per layer as one parent index and one choice per surviving state, using
+	  the smallest integer types that fit.
+	"""
+	groups = social_network.groups
+	r_max = social_network.r_max
+
+	# Base case: no groups, no effort and no conflict
+	efforts = np.zeros(1, dtype=np.int64)
+	conflicts = np.zeros(1, dtype=np.int64)
+
+	layer_sizes = [1]
+	parents = []
+	choices = []
+
+	costs = cost_index(social_network)
+
+	for i, group in enumerate(groups):
+		n_i = group.n
+		k = np.arange(n_i + 1)
+		group_efforts, group_conflicts = costs.options(i)
+
+		# Combine every frontier state with every option of the current group
+		candidate_efforts = (efforts[:, None] + group_efforts[None, :]).ravel()
+		candidate_conflicts = (conflicts[:, None] + group_conflicts[None, :]).ravel()
+		candidate_parents = np.repeat(np.arange(len(efforts)), n_i + 1)
+		candidate_choices = np.tile(k, len(efforts))
+
+		# Discard the combinations that exceed the available effort
+		feasible = candidate_efforts <= r_max
+		candidate_efforts = candidate_efforts[feasible]
+		candidate_conflicts = candidate_conflicts[feasible]
+		candidate_parents = candidate_parents[feasible]
+		candidate_choices = candidate_choices[feasible]
+
+		# Sort by effort (ties by conflict) and keep only the states that strictly improve the conflict of
+		# every state with less or equal effort
+		order = np.lexsort((candidate_conflicts, candidate_efforts))
+		sorted_conflicts = candidate_conflicts[order]
+		keep = np.ones(len(order), dtype=bool)
+		keep[1:] = sorted_conflicts[1:] < np.minimum.accumulate(sorted_conflicts)[:-1]
+		survivors = order[keep]
+
+		efforts = candidate_efforts[survivors]
+		conflicts = candidate_conflicts[survivors]
+		parents.append(candidate_parents[survivors].astype(np.min_scalar_type(layer_sizes[-1])))
+		choices.append(candidate_choices[survivors].astype(np.min_scalar_type(n_i)))
+		layer_sizes.append(len(efforts))
+
+	return ParetoFrontier(efforts, conflicts, layer_sizes, parents, choices, len(groups))
+
+
+def pareto_strategy(frontier: ParetoFrontier, index: int) -> List[int]:
+	"""
+	Reconstructs the strategy of a state of the final frontier by following its back-pointers.
+
+	Parameters
+	----------
+	frontier : ParetoFrontier
+		The frontier returned by `pareto_frontier`.
+	index : int
+		The position of the state in the final frontier.
+
+	Returns
+	-------
+	List[int]
+		The strategy as a list of integers where each value represents the number of agents to moderate
+		in the corresponding group.
+	"""
+	strategy = [0] * frontier.n_groups
+
+	for i in range(frontier.n_groups - 1, -1, -1):
+		strategy[i] = int(frontier.choices[i][index])
+		index = int(frontier.parents[i][index])
+
+	return strategy
+
+
+def pareto_moderation(social_network: SocialNetwork) -> List[int]:
+	"""
+	Finds the optimal strategy to minimize internal conflict in a social network using the Pareto
+	frontier of (effort, conflict) states.
+
+	Parameters
+	----------
+	social_network : SocialNetwork
+		The social network to optimize.
+
+	Returns
+	-------
+	List[int]
+		The best strategy as a list of integers where each value represents
+			the number of agents to moderate in the corresponding group.
+	"""
+	frontier = pareto_frontier(social_network)
+
+	# The frontier is sorted by increasing effort and strictly decreasing conflict, so the last state is the
+	# one with the least conflict among the applicable strategies
+	return pareto_strategy(frontier, len(frontier.efforts) - 1)
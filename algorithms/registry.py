@@ -0,0 +1,96 @@
+import importlib
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from classes.social_network import SocialNetwork
+
+
+class SolverInfo(NamedTuple):
+	"""
+	A registered solver: where it is implemented and what it guarantees.
+
+	The implementation is only imported the first time it is requested with `get_solver`, so listing the
+	solvers (for a menu or the command line) does not load NumPy or any algorithm module.
+	"""
+	label: str # Name shown to users
+	module: str
+	function: str
+	exact: bool # Whether it always finds the optimal strategy
+	memory: str # Memory class of the solver, in terms of n groups and R_max
+	progress: bool # Whether it accepts a `progress(done, total, explored)` callback
+	options: Tuple[str, ...] = () # Keyword arguments that can be passed to it through `solve`
+
+
+SOLVERS: Dict[str, SolverInfo] = {
+	"greedy": SolverInfo("Greedy", "algorithms.greedy", "greedy_moderation_with_radix_sort", False, "O(n)", True),
+	"greedy_heap": SolverInfo("Greedy (heap)", "algorithms.greedy", "greedy_discrepancy_rigidity_heap", False, "O(n)",
+							  False),
+	"local_search": SolverInfo("Local search", "algorithms.local_search", "local_search_moderation", False, "O(n)",
+							   False),
+	"lagrangian": SolverInfo("Lagrangian relaxation", "algorithms.lagrangian", "lagrangian_moderation", False, "O(n)",
+							 False),
+	"fptas": SolverInfo("FPTAS", "algorithms.fptas", "fptas_moderation", False, "O(n² / ε)", False, ("epsilon",)),
+	"brute_force": SolverInfo("Brute force", "algorithms.brute_force", "brute_force", True, "O(n)", True),
+	"brute_force_vectorized": SolverInfo("Brute force (vectorized)", "algorithms.brute_force", "brute_force_vectorized",
+										 True, "O(n * block)", True),
+	"dynamic": SolverInfo("Dynamic programming", "algorithms.dynamic", "dynamic_bottom_up", True, "O(n * R_max)", True),
+	"dynamic_top_down": SolverInfo("Dynamic programming (top-down)", "algorithms.dynamic", "dynamic_top_down", True,
+								   "O(n * R_max)", False),
+	"dynamic_parallel": SolverInfo("Dynamic programming (parallel)", "algorithms.dynamic", "dynamic_bottom_up_parallel",
+								   True, "O(n * R_max)", True),
+	"dynamic_out_of_core": SolverInfo("Dynamic programming (out-of-core)", "algorithms.dynamic",
+									  "dynamic_bottom_up_out_of_core", True, "O(R_max) + disk", True),
+	"core": SolverInfo("Core hybrid", "algorithms.core", "core_moderation", True, "O(core * R_max)", False),
+	"pareto": SolverInfo("Pareto frontier", "algorithms.pareto", "pareto_moderation", True, "O(n * frontier)", False),
+}
+
+
+def solver_names(exact: Optional[bool] = None) -> List[str]:
+	"""Names of the registered solvers, optionally only the exact (True) or heuristic (False) ones."""
+	return [name for name, info in SOLVERS.items() if exact is None or info.exact == exact]
+
+
+def get_solver(name: str) -> Callable[..., List[int]]:
+	"""
+	Returns the function that implements a registered solver, importing its module if needed.
+
+	Raises
+	------
+	ValueError
+		If no solver is registered with that name.
+	"""
+	if name not in SOLVERS:
+		raise ValueError(f"Error: unknown solver {name}, expected one of {', '.join(SOLVERS)}")
+
+	info = SOLVERS[name]
+	return getattr(importlib.import_module(info.module), info.function)
+
+
+def check_options(name: str, options: Optional[dict]) -> dict:
+	"""
+	Returns the options of a solver run (an empty dict if there are none).
+
+	Raises
+	------
+	ValueError
+		If the solver does not accept one of the options.
+	"""
+	options = dict(options or {})
+	unknown = sorted(set(options) - set(SOLVERS[name].options))
+	if unknown:
+		accepted = ", ".join(SOLVERS[name].options) or "none"
+		raise ValueError(f"Error: the {name} solver does not accept {', '.join(unknown)} (accepted options: {accepted})")
+	return options
+
+
+def solve(name: str, social_network: SocialNetwork, progress: Optional[Callable[[int, int, int], None]] = None,
+		  options: Optional[dict] = None) -> List[int]:
+	"""
+	Runs a registered solver on a social network. The progress callback is only passed to the solvers
+	that report progress, and `options` (such as the "epsilon" of the FPTAS) are passed as keyword
+	arguments to the solvers that accept them.
+	"""
+	solver = get_solver(name)
+	kwargs = check_options(name, options)
+	if progress is not None and SOLVERS[name].progress:
+		kwargs["progress"] = progress
+	return solver(social_network, **kwargs)
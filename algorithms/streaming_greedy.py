@@ -0,0 +1,252 @@
+import heapq
+import struct
+import tempfile
+from typing import Callable, Iterator, Optional, TextIO, Tuple
+
+from classes.agent_group import (RIGIDITY_SCALE, AgentGroup, create_agent_group,
+                                 fixed_point_rigidity)
+
+# Groups with a lower rigidity are moderated first, by decreasing discrepancy (as in the in-memory greedy)
+R_MIN = 10**-6
+# Scaling factor of the discrepancy-to-rigidity ratio used to sort the other groups
+RATIO_FACTOR = 10**6
+MAX_DISCREPANCY = 200
+
+# The scaled ratios are grouped in logarithmic buckets with 2^SUB_BUCKET_BITS sub-buckets per power of 2
+SUB_BUCKET_BITS = 5
+RATIO_BUCKETS = 64 << SUB_BUCKET_BITS
+BUCKETS = MAX_DISCREPANCY + 1 + RATIO_BUCKETS
+
+# Default number of groups after the break bucket kept in memory at the same time
+DEFAULT_BUFFER_SIZE = 1 << 12
+
+# Every strategy value is spooled to disk as one fixed-size record
+RECORD = struct.Struct("<q")
+
+
+def ratio_bucket(key: int) -> int:
+	"""Logarithmic bucket of a scaled ratio. Larger keys never get smaller buckets."""
+	if key < 2 << SUB_BUCKET_BITS:
+		return key
+	shift = key.bit_length() - SUB_BUCKET_BITS - 1
+	return min(RATIO_BUCKETS - 1, (shift << SUB_BUCKET_BITS) + (key >> shift))
+
+
+def greedy_position(index: int, group: AgentGroup) -> Tuple[int, tuple]:
+	"""
+	Returns the bucket of a group in the order of `greedy_moderation_with_radix_sort` and the exact key of
+	that order (smaller keys are moderated first).
+
+	The in-memory greedy first takes the groups with r < R_MIN by decreasing discrepancy, in input order
+	on ties, and then the rest by decreasing scaled ratio, in reverse input order on ties (the radix sort
+	is stable and its output is reversed).
+	"""
+	discrepancy = abs(group.o_1 - group.o_2)
+	if group.r < R_MIN:
+		return MAX_DISCREPANCY - discrepancy, (0, -discrepancy, index)
+
+	key = int(round(discrepancy / group.r * RATIO_FACTOR))
+	return MAX_DISCREPANCY + RATIO_BUCKETS - ratio_bucket(key), (1, -key, -index)
+
+
+def read_groups(file: TextIO) -> Iterator[Tuple[int, AgentGroup]]:
+	"""
+	Reads the groups of a network in the TXT format one line at a time. Once every group has been
+	yielded, the network's R_max is yielded with index -1.
+	"""
+	n_groups = int(file.readline().strip())
+
+	for i in range(n_groups):
+		line = file.readline()
+		parts = line.strip().split(",")
+		if len(parts) != 4:
+			raise ValueError(f"Error: invalid format on line {i + 2}: {line}")
+		yield i, create_agent_group(int(parts[0]), int(parts[1]), int(parts[2]), float(parts[3]))
+
+	line = file.readline()
+	if not line:
+		raise ValueError(f"Error: unexpected end of file on line {n_groups + 2}")
+	yield -1, int(line.strip())
+
+
+def effort(effort_numerator: int, k: int) -> int:
+	return -(-effort_numerator * k // RIGIDITY_SCALE)
+
+
+def max_agents(n: int, effort_numerator: int, budget: int) -> int:
+	return min(n, max(budget, 0) * RIGIDITY_SCALE // effort_numerator)
+
+
+def streaming_greedy(input_path: str, output_path: str, buffer_size: int = DEFAULT_BUFFER_SIZE,
+					 progress: Optional[Callable[[int, int, int], None]] = None,
+					 stats: Optional[dict] = None) -> Tuple[int, float]:
+	"""
+	Computes the strategy of `greedy_moderation_with_radix_sort` for a network stored in a TXT file and
+	writes it to another file in the `write_output` format, reading the groups one at a time so the
+	memory used does not depend on the number of groups.
+
+	The greedy takes every group fully, in its order, until one does not fit in the remaining effort
+	(the break group), and then gives as many agents as still fit to each following group.
+	- The first pass builds a histogram of full-moderation efforts over fixed buckets of the greedy order
+	  (discrepancies of the groups with r < R_MIN, then logarithmic buckets of the ratio), and finds the
+	  bucket where the cumulative effort exceeds R_max. Every group in an earlier bucket is moderated
+	  fully.
+	- The second pass writes those decisions to a spool file and keeps, among the groups of the break
+	  bucket and later buckets that could afford one agent, the `buffer_size` first ones in the exact
+	  greedy order. The greedy is then run over them with the effort left. If the buffer was too small
+	  and effort remains, another pass collects the next candidates.
+	Finally the effort and internal conflict (accumulated along the way) and the spooled strategy are
+	written to the output file.
+
+	Parameters
+	----------
+	input_path : str
+		The network, in the TXT format.
+	output_path : str
+		Where the result is written, in the `write_output` format.
+	buffer_size : int
+		Maximum number of candidate groups kept in memory.
+	progress : Callable[[int, int, int], None], optional
+		Called after every pass with the number of passes done, the number of passes known so far and
+		the number of groups read.
+	stats : dict, optional
+		If given, it is filled with "passes", "candidates" (groups simulated after the break bucket) and
+		"groups_read".
+
+	Returns
+	-------
+	Tuple[int, float]
+		The effort and the internal conflict of the strategy.
+
+	Notes
+	-----
+	- Memory: O(BUCKETS + buffer_size), independent of the number of groups. The spool file takes
+	  8 bytes per group on disk.
+	- The result is the same as `write_output(path, social_network, greedy_moderation_with_radix_sort(...))`.
+	"""
+	if buffer_size <= 0:
+		raise ValueError("Error: buffer_size must be positive")
+
+	groups_read = 0
+	passes = 0
+
+	# First pass: total effort and histogram of full-moderation efforts by bucket of the greedy order
+	histogram = [0] * BUCKETS
+	max_effort = 0
+	n_groups = 0
+
+	with open(input_path, "r") as file:
+		for i, group in read_groups(file):
+			if i < 0:
+				r_max = group
+				break
+
+			n_groups += 1
+			effort_numerator = abs(group.o_1 - group.o_2) * fixed_point_rigidity(group.r)
+			full_effort = effort(effort_numerator, group.n)
+			max_effort += full_effort
+			if effort_numerator > 0:
+				histogram[greedy_position(i, group)[0]] += full_effort
+
+	passes += 1
+	groups_read += n_groups
+	if progress is not None:
+		progress(passes, 2, groups_read)
+
+	# If every agent can be moderated, the greedy moderates all agents in all groups
+	moderate_all = max_effort <= r_max
+
+	break_bucket = BUCKETS
+	remaining_effort = r_max
+	if not moderate_all:
+		for bucket, bucket_effort in enumerate(histogram):
+			if bucket_effort > remaining_effort:
+				break_bucket = bucket
+				break
+			remaining_effort -= bucket_effort
+
+	total_effort = 0
+	numerator = 0
+	candidates_simulated = 0
+
+	with tempfile.TemporaryFile() as spool:
+		# The second pass also spools the decisions of every group; later passes only collect candidates
+		spooling = True
+		last_key = None
+		while True:
+			candidates = [] # Max-heap (by greedy order) of the first candidates after last_key
+			full = False
+
+			with open(input_path, "r") as file:
+				for i, group in read_groups(file):
+					if i < 0:
+						break
+
+					effort_numerator = abs(group.o_1 - group.o_2) * fixed_point_rigidity(group.r)
+					bucket, key = greedy_position(i, group)
+
+					if spooling:
+						e_i = group.n if moderate_all or (effort_numerator > 0 and bucket < break_bucket) else 0
+						spool.write(RECORD.pack(e_i))
+						total_effort += effort(effort_numerator, e_i)
+						numerator += (group.n - e_i) * (group.o_1 - group.o_2) ** 2
+
+					if moderate_all or effort_numerator == 0 or bucket < break_bucket or group.n == 0:
+						continue
+					if last_key is not None and key <= last_key:
+						continue # Already simulated in a previous pass
+					if effort(effort_numerator, 1) > remaining_effort:
+						continue # Cannot afford a single agent with the effort left
+
+					item = (tuple(-value for value in key), i, group.n, effort_numerator, (group.o_1 - group.o_2) ** 2)
+					if len(candidates) < buffer_size:
+						heapq.heappush(candidates, item)
+					elif item > candidates[0]:
+						heapq.heapreplace(candidates, item)
+						full = True
+					else:
+						full = True
+
+			passes += 1
+			groups_read += n_groups
+			spooling = False
+
+			# Greedy over the candidates, in order
+			for negated_key, i, n, effort_numerator, conflict_per_agent in sorted(candidates, reverse=True):
+				if remaining_effort <= 0:
+					break
+				last_key = tuple(-value for value in negated_key)
+				candidates_simulated += 1
+
+				e_i = max_agents(n, effort_numerator, remaining_effort)
+				if e_i > 0:
+					remaining_effort -= effort(effort_numerator, e_i)
+					total_effort += effort(effort_numerator, e_i)
+					numerator -= e_i * conflict_per_agent
+					spool.seek(i * RECORD.size)
+					spool.write(RECORD.pack(e_i))
+
+			if progress is not None:
+				progress(passes, passes + int(full and remaining_effort > 0), groups_read)
+
+			if not full or remaining_effort <= 0:
+				break
+
+		IC = numerator / (n_groups if n_groups > 0 else 1)
+
+		# Write the output: IC, effort and then the spooled strategy, one value per line
+		spool.seek(0)
+		with open(output_path, "w") as output:
+			output.write(f"{IC}\n{total_effort}")
+			while True:
+				chunk = spool.read(RECORD.size * 4096)
+				if not chunk:
+					break
+				output.write("".join(f"\n{e_i}" for (e_i,) in RECORD.iter_unpack(chunk)))
+
+	if stats is not None:
+		stats["passes"] = passes
+		stats["candidates"] = candidates_simulated
+		stats["groups_read"] = groups_read
+
+	return total_effort, IC
@@ -1,29 +1,72 @@
-from typing import List, Tuple
+from typing import Callable, List, NamedTuple, Optional, Tuple
 
-from algorithms.brute_force import brute_force
-from algorithms.dynamic import dynamic_bottom_up
-from algorithms.greedy import greedy_moderation_with_radix_sort
-from classes.social_network import (SocialNetwork, apply_strategy,
-                                    calculate_effort,
-                                    calculate_internal_conflict)
+from algorithms.registry import SOLVERS, check_options, get_solver, solve
+from classes.social_network import SocialNetwork, evaluate_strategy
+
+
+class ModerationResult(NamedTuple):
+	strategy: List[int]
+	effort: int
+	IC: float
+	optimality: str # "proven", "bounded(gap)" or "unknown", see `algorithms.certificate`
 
 
 def calculate_effort_and_IC(social_network: SocialNetwork, strategy: List[int]) -> Tuple[float, float]:
-	effort = calculate_effort(social_network, strategy)
-	modified_network = apply_strategy(social_network, strategy)
-	IC = calculate_internal_conflict(modified_network)
+	effort, IC, _ = evaluate_strategy(social_network, strategy)
 	return effort, IC
 
-def modciFB(social_network: SocialNetwork) -> Tuple[List[int], float, float]:
-	strategy = brute_force(social_network)
-	return strategy, *calculate_effort_and_IC(social_network, strategy)
+def modci(solver: str, social_network: SocialNetwork,
+		  progress: Optional[Callable[[int, int, int], None]] = None, certify: bool = True,
+		  options: Optional[dict] = None) -> ModerationResult:
+	"""
+	Runs a registered solver and returns its strategy, effort, internal conflict and optimality.
+
+	With `certify`, an exact solver is skipped when the greedy strategy is proven optimal by the
+	fractional knapsack bound (and the greedy result is returned), and the result of a heuristic solver is
+	checked against that bound. Without it, heuristic results have an "unknown" optimality. The FPTAS
+	reports the bound of its own (1 + ε) guarantee in both cases. `options` are passed to the solver (see
+	`algorithms.registry.solve`).
+	"""
+	from algorithms.certificate import (PROVEN, UNKNOWN, certify_greedy, removed_conflict_optimality,
+										strategy_optimality)
+
+	get_solver(solver) # Rejects unknown solvers and options before any work
+	check_options(solver, options)
+	exact = SOLVERS[solver].exact
+	if certify and exact:
+		certificate = certify_greedy(social_network)
+		if certificate.optimality == PROVEN:
+			return ModerationResult(certificate.strategy, certificate.effort, certificate.IC, PROVEN)
+
+	if solver == "fptas":
+		from algorithms.fptas import fptas_solve
+
+		solution = fptas_solve(social_network, **check_options(solver, options))
+		effort, IC = calculate_effort_and_IC(social_network, solution.strategy)
+		optimality = removed_conflict_optimality(social_network, solution.removed_conflict,
+												 solution.removed_conflict_bound)
+		return ModerationResult(solution.strategy, effort, IC, optimality)
+
+	strategy = solve(solver, social_network, progress, options)
+	effort, IC = calculate_effort_and_IC(social_network, strategy)
+
+	if exact:
+		optimality = PROVEN
+	elif certify:
+		optimality = strategy_optimality(social_network, strategy)
+	else:
+		optimality = UNKNOWN
 
-def modciPD(social_network: SocialNetwork) -> Tuple[List[int], float, float]:
-	strategy = dynamic_bottom_up(social_network)
-	return strategy, *calculate_effort_and_IC(social_network, strategy)
+	return ModerationResult(strategy, effort, IC, optimality)
 
-def modciV(social_network: SocialNetwork) -> Tuple[List[int], float, float]:
+def modciFB(social_network: SocialNetwork,
+			progress: Optional[Callable[[int, int, int], None]] = None) -> ModerationResult:
+	return modci("brute_force", social_network, progress)
 
-	strategy = greedy_moderation_with_radix_sort(social_network)
+def modciPD(social_network: SocialNetwork,
+			progress: Optional[Callable[[int, int, int], None]] = None) -> ModerationResult:
+	return modci("dynamic", social_network, progress)
 
-	return strategy, *calculate_effort_and_IC(social_network, strategy)
+def modciV(social_network: SocialNetwork,
+		   progress: Optional[Callable[[int, int, int], None]] = None) -> ModerationResult:
+	return modci("greedy", social_network, progress)
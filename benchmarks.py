@@ -0,0 +1,492 @@
+import argparse
+import math
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+from tabulate import tabulate
+
+from algorithms.allocation import allocate_budget
+from algorithms.brute_force import (DEFAULT_BLOCK_SIZE, brute_force,
+                                    brute_force_vectorized)
+from algorithms.core import DEFAULT_CORE_RADIUS, core_moderation
+from algorithms.dp_cache import DEFAULT_CACHE_BYTES, DPRowCache, dynamic_bottom_up_cached
+from algorithms.dynamic import (BATCH_MAX_CELLS, OUT_OF_CORE_BLOCK_SIZE,
+                               dynamic_bottom_up, dynamic_bottom_up_batch,
+                               dynamic_bottom_up_out_of_core,
+                               dynamic_bottom_up_parallel)
+from algorithms.greedy import greedy_moderation_with_radix_sort
+from algorithms.local_search import local_search_moderation
+from classes.agent_group import create_agent_group
+from classes.results_store import ResultsReader, ResultsWriter, network_hash
+from classes.social_network import SocialNetwork, evaluate_strategy
+from main import load_social_network_from_txt, write_output
+
+
+def test_files(directory: str, tests: List[int]) -> List[str]:
+	"""Returns the existing files test_XX.txt of a directory for the given test numbers."""
+	files = []
+	for i in tests:
+		filename = os.path.join(directory, f"test_{i:02}.txt")
+		if os.path.exists(filename):
+			files.append(filename)
+		else:
+			print(f"Warning: {filename} not found. Skipping...")
+	return files
+
+
+def benchmark_parallel_dynamic(directory: str, tests: List[int], worker_counts: List[int]) -> None:
+	"""
+	Measures `dynamic_bottom_up_parallel` with different numbers of threads and prints the time and the
+	speedup with respect to one thread for every test file.
+	"""
+	results = []
+
+	for filename in test_files(directory, tests):
+		social_network = load_social_network_from_txt(filename)
+
+		times = []
+		for workers in worker_counts:
+			start_time = time.perf_counter()
+			dynamic_bottom_up_parallel(social_network, workers)
+			times.append(time.perf_counter() - start_time)
+
+		row = [os.path.basename(filename)]
+		for elapsed in times:
+			row.append(f"{elapsed:.3f} ({times[0] / elapsed:.2f}x)")
+		results.append(row)
+
+	headers = ["Test Case"] + [f"{workers} workers (s)" for workers in worker_counts]
+	print(f"CPUs available: {os.cpu_count()}")
+	print(tabulate(results, headers=headers, tablefmt="grid"))
+
+
+def timed(solver, *args) -> tuple:
+	"""Runs a solver and returns its strategy and the seconds it took."""
+	start_time = time.perf_counter()
+	strategy = solver(*args)
+	return strategy, time.perf_counter() - start_time
+
+
+def benchmark_local_search(directory: str, tests: List[int]) -> None:
+	"""
+	Compares the greedy strategy, its local search refinement and the optimal (DP) strategy, and prints
+	which fraction of the greedy-to-optimal gap the local search closes and how long it takes.
+	"""
+	results = []
+	gaps = [0, 0]
+
+	for filename in test_files(directory, tests):
+		social_network = load_social_network_from_txt(filename)
+
+		greedy_strategy, greedy_time = timed(greedy_moderation_with_radix_sort, social_network)
+		refined_strategy, refined_time = timed(local_search_moderation, social_network, greedy_strategy)
+		optimal_strategy, optimal_time = timed(dynamic_bottom_up, social_network)
+
+		greedy_IC = evaluate_strategy(social_network, greedy_strategy)[1]
+		refined_IC = evaluate_strategy(social_network, refined_strategy)[1]
+		optimal_IC = evaluate_strategy(social_network, optimal_strategy)[1]
+
+		gap = greedy_IC - optimal_IC
+		closed = (greedy_IC - refined_IC) / gap if gap > 0 else None
+		gaps[0] += greedy_IC - refined_IC
+		gaps[1] += gap
+
+		results.append([
+			os.path.basename(filename), f"{greedy_IC:.2f}", f"{refined_IC:.2f}", f"{optimal_IC:.2f}",
+			f"{closed:.0%}" if closed is not None else "-", f"{greedy_time:.4f}", f"{refined_time:.4f}",
+			f"{optimal_time:.4f}"
+		])
+
+	headers = ["Test Case", "Greedy IC", "Local search IC", "Optimal IC", "Gap closed", "Greedy (s)",
+			   "Local search (s)", "Dynamic (s)"]
+	print(tabulate(results, headers=headers, tablefmt="grid"))
+	if gaps[1] > 0:
+		print(f"Total gap closed: {gaps[0] / gaps[1]:.1%}")
+
+
+def benchmark_out_of_core(directory: str, tests: List[int], scratch_dir: Optional[str], block_size: int) -> None:
+	"""
+	Runs `dynamic_bottom_up_out_of_core` and prints the size of its decisions file, the I/O volume and the
+	write throughput, next to the time of the in-memory `dynamic_bottom_up`.
+	"""
+	results = []
+
+	for filename in test_files(directory, tests):
+		social_network = load_social_network_from_txt(filename)
+
+		memory_stats = {}
+		dynamic_bottom_up(social_network, stats=memory_stats)
+		stats = {}
+		dynamic_bottom_up_out_of_core(social_network, scratch_dir, block_size, stats=stats)
+		if not stats:
+			continue # Full moderation, no table
+
+		write_time = stats["fill_time"] + stats["flush_time"]
+		results.append([
+			os.path.basename(filename), f"{stats['file_bytes'] / 2 ** 20:.2f}", f"{stats['bytes_written'] / 2 ** 20:.2f}",
+			stats["bytes_read"], f"{stats['bytes_written'] / 2 ** 20 / write_time:.1f}", f"{stats['flush_time']:.4f}",
+			f"{stats['time']:.3f}", f"{memory_stats['time']:.3f}"
+		])
+
+	headers = ["Test Case", "File (MiB)", "Written (MiB)", "Read (B)", "Fill + write (MiB/s)", "Flush (s)",
+			   "Out-of-core (s)", "In memory (s)"]
+	print(tabulate(results, headers=headers, tablefmt="grid"))
+
+
+def benchmark_brute_force(directory: str, tests: List[int], block_size: int) -> None:
+	"""
+	Measures the throughput, in strategies per second, of `brute_force` and of `brute_force_vectorized`
+	with the given block size, and checks that both return the same strategy.
+	"""
+	results = []
+
+	for filename in test_files(directory, tests):
+		social_network = load_social_network_from_txt(filename)
+		total = math.prod(group.n + 1 for group in social_network.groups)
+
+		loop_strategy, loop_time = timed(brute_force, social_network)
+		vectorized_strategy, vectorized_time = timed(brute_force_vectorized, social_network, block_size)
+		same = (list(loop_strategy) if loop_strategy is not None else None) == vectorized_strategy
+
+		results.append([
+			os.path.basename(filename), total, f"{loop_time:.3f}", f"{vectorized_time:.3f}",
+			f"{total / loop_time:,.0f}", f"{total / vectorized_time:,.0f}", f"{loop_time / vectorized_time:.1f}x",
+			"yes" if same else "NO"
+		])
+
+	headers = ["Test Case", "Strategies", "Loop (s)", "Vectorized (s)", "Loop (strategies/s)",
+			   "Vectorized (strategies/s)", "Speedup", "Same strategy"]
+	print(tabulate(results, headers=headers, tablefmt="grid"))
+
+
+def benchmark_batch(directory: str, tests: List[int], copies: int, max_cells: int) -> None:
+	"""
+	Solves `copies` copies of every test network one at a time with `dynamic_bottom_up` and all together
+	with `dynamic_bottom_up_batch`, and prints the throughput of both in networks per second.
+	"""
+	networks = []
+	for filename in test_files(directory, tests):
+		social_network = load_social_network_from_txt(filename)
+		# Separate network objects, so no solver reuses the cost index of another copy
+		networks.extend(SocialNetwork(list(social_network.groups), social_network.r_max) for _ in range(copies))
+
+	if not networks:
+		return
+
+	single_strategies, single_time = timed(lambda: [dynamic_bottom_up(social_network) for social_network in networks])
+	batch_strategies, batch_time = timed(dynamic_bottom_up_batch, networks, max_cells)
+
+	same = all(evaluate_strategy(social_network, a)[1] == evaluate_strategy(social_network, b)[1]
+			   for social_network, a, b in zip(networks, single_strategies, batch_strategies))
+
+	results = [
+		["One at a time", len(networks), f"{single_time:.3f}", f"{len(networks) / single_time:,.0f}"],
+		["Batched", len(networks), f"{batch_time:.3f}", f"{len(networks) / batch_time:,.0f}"],
+	]
+	print(tabulate(results, headers=["Path", "Networks", "Time (s)", "Networks/s"], tablefmt="grid"))
+	print(f"Speedup: {single_time / batch_time:.1f}x, same IC: {'yes' if same else 'NO'}")
+
+
+def benchmark_allocation(directory: str, tests: List[int], copies: int, budget_fraction: float,
+						 concatenated: bool) -> None:
+	"""
+	Splits a budget of `budget_fraction` of the summed R_max between `copies` copies of every test network
+	with `allocate_budget`, and optionally solves the network that concatenates all of them with
+	`dynamic_bottom_up`, which must leave the same conflict.
+	"""
+	networks = []
+	for filename in test_files(directory, tests):
+		social_network = load_social_network_from_txt(filename)
+		networks.extend(SocialNetwork(list(social_network.groups), social_network.r_max) for _ in range(copies))
+
+	if not networks:
+		return
+
+	total_budget = int(sum(social_network.r_max for social_network in networks) * budget_fraction)
+	stats = {}
+	allocation, allocation_time = timed(allocate_budget, networks, total_budget, stats)
+
+	results = [["Allocation", f"{allocation_time:.3f}", allocation.conflict]]
+	if concatenated:
+		concatenated_network = SocialNetwork([group for social_network in networks for group in social_network.groups],
+											 total_budget)
+		strategy, concatenated_time = timed(dynamic_bottom_up, concatenated_network)
+		conflict = sum((group.n - k) * (group.o_1 - group.o_2) ** 2
+					   for group, k in zip(concatenated_network.groups, strategy))
+		results.append(["Concatenated DP", f"{concatenated_time:.3f}", conflict])
+
+	print(f"Networks: {len(networks)}, total budget: {total_budget}, convex curves: {stats['convex_networks']}, "
+		  f"candidate budgets: {stats['candidate_budgets']:,} of {stats['budgets_total']:,}")
+	print(f"Curves: {stats['curve_time']:.3f} s, merges: {stats['merge_time']:.3f} s")
+	print(tabulate(results, headers=["Method", "Time (s)", "Conflict numerator"], tablefmt="grid"))
+
+
+def benchmark_results_store(directory: str, tests: List[int], copies: int, scratch_dir: Optional[str],
+							reads: int) -> None:
+	"""
+	Writes `copies` greedy results of every test network with `write_output` (one file each) and to one
+	`ResultsWriter` store, and prints the time and disk usage of both and the time to read random results.
+	"""
+	results = []
+	work_dir = tempfile.mkdtemp(dir=scratch_dir)
+
+	try:
+		for filename in test_files(directory, tests):
+			social_network = load_social_network_from_txt(filename)
+			strategy = greedy_moderation_with_radix_sort(social_network)
+			effort, IC, _ = evaluate_strategy(social_network, strategy)
+			files_dir = os.path.join(work_dir, "files")
+			store_path = os.path.join(work_dir, "results.bin")
+			os.makedirs(files_dir)
+
+			start_time = time.perf_counter()
+			for i in range(copies):
+				write_output(os.path.join(files_dir, f"result_{i:06}.txt"), social_network, strategy)
+			files_time = time.perf_counter() - start_time
+			files_bytes = sum(entry.stat().st_size for entry in os.scandir(files_dir))
+
+			start_time = time.perf_counter()
+			network_id = network_hash(social_network)
+			with ResultsWriter(store_path) as writer:
+				for _ in range(copies):
+					writer.append(network_id, "greedy", strategy, effort, IC)
+			syncs = writer.syncs
+			store_time = time.perf_counter() - start_time
+			store_bytes = os.path.getsize(store_path) + os.path.getsize(store_path + ".index.csv")
+
+			indices = [random.randrange(copies) for _ in range(reads)]
+			start_time = time.perf_counter()
+			with ResultsReader(store_path) as reader:
+				for index in indices:
+					reader.read(index)
+			read_time = (time.perf_counter() - start_time) / reads
+
+			results.append([
+				os.path.basename(filename), len(social_network.groups), copies, f"{files_time:.3f}",
+				f"{store_time:.3f}", f"{files_time / store_time:.1f}x", f"{files_bytes / 2**20:.2f}",
+				f"{store_bytes / 2**20:.2f}", syncs, f"{read_time * 1000:.3f}"
+			])
+			shutil.rmtree(files_dir)
+			os.remove(store_path)
+			os.remove(store_path + ".index.csv")
+	finally:
+		shutil.rmtree(work_dir, ignore_errors=True)
+
+	headers = ["Test Case", "Groups", "Results", "Files (s)", "Store (s)", "Speedup", "Files (MiB)", "Store (MiB)",
+			   "Syncs", "Random read (ms)"]
+	print(tabulate(results, headers=headers, tablefmt="grid"))
+
+
+# Run in a fresh interpreter by benchmark_ui_startup: times the imports and the first frame of the UI,
+# building the results page too (as every start did before it was built lazily) when argv[2] is "eager"
+UI_STARTUP_SCRIPT = """
+import sys, time
+start_time = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import main_UI
+imported_time = time.perf_counter()
+app = main_UI.Main()
+if sys.argv[2] == "eager":
+	app.get_frame("Result")
+	app.show_frame("Menu")
+app.update()
+ready_time = time.perf_counter()
+app.destroy()
+print(imported_time - start_time, ready_time - start_time, "matplotlib" in sys.modules)
+"""
+
+
+def benchmark_ui_startup(runs: int) -> None:
+	"""
+	Starts the UI `runs` times in new interpreters, with the results page built lazily and eagerly, and
+	prints the median time until the modules are imported and until the first frame is drawn.
+	"""
+	ui_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "UI")
+	results = []
+
+	for mode in ("eager", "lazy"):
+		import_times, ready_times = [], []
+		for _ in range(runs):
+			output = subprocess.run([sys.executable, "-c", UI_STARTUP_SCRIPT, ui_dir, mode], capture_output=True,
+									text=True, check=True).stdout.split()
+			import_times.append(float(output[-3]))
+			ready_times.append(float(output[-2]))
+			matplotlib_loaded = output[-1]
+		results.append([mode, runs, f"{statistics.median(import_times):.3f}",
+						f"{statistics.median(ready_times):.3f}", matplotlib_loaded])
+
+	headers = ["Results page", "Runs", "Imports (s)", "First frame (s)", "matplotlib loaded"]
+	print(tabulate(results, headers=headers, tablefmt="grid"))
+
+
+def benchmark_core(directory: str, tests: List[int]) -> None:
+	"""
+	Compares `core_moderation` with `dynamic_bottom_up` and prints the size of the last core, the number
+	of widenings, the times and whether both strategies have the same internal conflict.
+	"""
+	results = []
+
+	for filename in test_files(directory, tests):
+		social_network = load_social_network_from_txt(filename)
+
+		stats = {}
+		core_strategy, core_time = timed(core_moderation, social_network, DEFAULT_CORE_RADIUS, stats)
+		optimal_strategy, optimal_time = timed(dynamic_bottom_up, social_network)
+		same = evaluate_strategy(social_network, core_strategy)[1] == evaluate_strategy(social_network, optimal_strategy)[1]
+
+		results.append([
+			os.path.basename(filename), len(social_network.groups), stats["core_size"], stats["widenings"],
+			stats["core_budget"], f"{core_time:.3f}", f"{optimal_time:.3f}", f"{optimal_time / core_time:.1f}x",
+			"yes" if same else "NO"
+		])
+
+	headers = ["Test Case", "Groups", "Core", "Widenings", "Core budget", "Core (s)", "Dynamic (s)", "Speedup",
+			   "Same IC"]
+	print(tabulate(results, headers=headers, tablefmt="grid"))
+
+
+def sweep_scenarios(social_network: SocialNetwork, scenarios: int, changed_groups: int) -> List[SocialNetwork]:
+	"""
+	Variants of a network for a scenario sweep: every scenario changes the rigidity of its last
+	`changed_groups` groups and lowers R_max, so all of them share the groups before.
+	"""
+	groups = social_network.groups
+	tail = min(changed_groups, len(groups))
+	variants = []
+	for s in range(scenarios):
+		changed = [create_agent_group(group.n, group.o_1, group.o_2, min(1.0, group.r * (1 + s / scenarios)))
+				   for group in groups[len(groups) - tail:]]
+		r_max = social_network.r_max * (scenarios - s) // scenarios
+		variants.append(SocialNetwork(groups[:len(groups) - tail] + changed, r_max))
+	return variants
+
+
+def benchmark_sweep(directory: str, tests: List[int], scenarios: int, changed_groups: int,
+					cache_bytes: int, spill_dir: Optional[str]) -> None:
+	"""
+	Solves a sweep of scenarios of every network with `dynamic_bottom_up` and with
+	`dynamic_bottom_up_cached` (sharing one row cache per network), and prints the layers reused, the
+	times and whether both strategies have the same internal conflict.
+	"""
+	results = []
+
+	for filename in test_files(directory, tests):
+		social_network = load_social_network_from_txt(filename)
+		variants = sweep_scenarios(social_network, scenarios, changed_groups)
+		cache = DPRowCache(cache_bytes, spill_dir)
+
+		reused = computed = 0
+		plain_time = cached_time = 0
+		same = True
+		for variant in variants:
+			plain_strategy, elapsed = timed(dynamic_bottom_up, variant)
+			plain_time += elapsed
+			stats = {}
+			cached_strategy, elapsed = timed(dynamic_bottom_up_cached, variant, cache, None, stats)
+			cached_time += elapsed
+			reused += stats["layers_reused"]
+			computed += stats["layers_computed"]
+			same &= evaluate_strategy(variant, plain_strategy)[1] == evaluate_strategy(variant, cached_strategy)[1]
+
+		cache.clear()
+		results.append([
+			os.path.basename(filename), len(variants), reused, computed, cache.spills, cache.disk_hits,
+			f"{plain_time:.3f}", f"{cached_time:.3f}", f"{plain_time / cached_time:.2f}x", "yes" if same else "NO"
+		])
+
+	headers = ["Test Case", "Scenarios", "Layers reused", "Layers computed", "Spills", "Disk hits",
+			   "Dynamic (s)", "Cached (s)", "Speedup", "Same IC"]
+	print(tabulate(results, headers=headers, tablefmt="grid"))
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Benchmarks of the moderation solvers.")
+	subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+	parallel_parser = subparsers.add_parser("parallel-dp", help="Speedup of the parallel DP versus the number of threads.")
+	parallel_parser.add_argument("--directory", default="time_tests")
+	parallel_parser.add_argument("--tests", type=int, nargs="+", default=list(range(2, 11)))
+	parallel_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+
+	local_search_parser = subparsers.add_parser("local-search", help="Gap closed by the local search after greedy.")
+	local_search_parser.add_argument("--directory", default="tests")
+	local_search_parser.add_argument("--tests", type=int, nargs="+", default=list(range(1, 31)))
+
+	out_of_core_parser = subparsers.add_parser("out-of-core", help="I/O volume and throughput of the out-of-core DP.")
+	out_of_core_parser.add_argument("--directory", default="time_tests")
+	out_of_core_parser.add_argument("--tests", type=int, nargs="+", default=list(range(2, 11)))
+	out_of_core_parser.add_argument("--scratch-dir", default=None, help="Where the decisions file is written.")
+	out_of_core_parser.add_argument("--block-size", type=int, default=OUT_OF_CORE_BLOCK_SIZE)
+
+	brute_force_parser = subparsers.add_parser("brute-force", help="Throughput of the loop and vectorized brute force.")
+	brute_force_parser.add_argument("--directory", default="tests")
+	brute_force_parser.add_argument("--tests", type=int, nargs="+", default=list(range(1, 8)))
+	brute_force_parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE)
+
+	batch_parser = subparsers.add_parser("batch", help="Throughput of the batched DP over many small networks.")
+	batch_parser.add_argument("--directory", default="tests")
+	batch_parser.add_argument("--tests", type=int, nargs="+", default=list(range(1, 31)))
+	batch_parser.add_argument("--copies", type=int, default=100, help="Copies of every network in the batch.")
+	batch_parser.add_argument("--max-cells", type=int, default=BATCH_MAX_CELLS)
+
+	allocation_parser = subparsers.add_parser("allocate", help="Split of one budget between many networks.")
+	allocation_parser.add_argument("--directory", default="tests")
+	allocation_parser.add_argument("--tests", type=int, nargs="+", default=list(range(1, 16)))
+	allocation_parser.add_argument("--copies", type=int, default=10, help="Copies of every network.")
+	allocation_parser.add_argument("--budget-fraction", type=float, default=0.25,
+								   help="Total budget as a fraction of the summed R_max of the networks.")
+	allocation_parser.add_argument("--concatenated", action="store_true",
+								   help="Also solve the concatenated network with the DP.")
+
+	store_parser = subparsers.add_parser("results-store", help="Per-file results versus the columnar results store.")
+	store_parser.add_argument("--directory", default="time_tests")
+	store_parser.add_argument("--tests", type=int, nargs="+", default=[10, 11])
+	store_parser.add_argument("--copies", type=int, default=200, help="Results written for every network.")
+	store_parser.add_argument("--scratch-dir", default=None, help="Where the results are written.")
+	store_parser.add_argument("--reads", type=int, default=100, help="Random results read back from the store.")
+
+	core_parser = subparsers.add_parser("core", help="Core hybrid solver versus the full DP.")
+	core_parser.add_argument("--directory", default="time_tests")
+	core_parser.add_argument("--tests", type=int, nargs="+", default=list(range(1, 11)))
+
+	sweep_parser = subparsers.add_parser("sweep", help="Layers reused by the prefix-keyed DP row cache in a scenario sweep.")
+	sweep_parser.add_argument("--directory", default="time_tests")
+	sweep_parser.add_argument("--tests", type=int, nargs="+", default=list(range(2, 11)))
+	sweep_parser.add_argument("--scenarios", type=int, default=8)
+	sweep_parser.add_argument("--changed-groups", type=int, default=2, help="Groups changed at the end of every scenario.")
+	sweep_parser.add_argument("--cache-bytes", type=int, default=DEFAULT_CACHE_BYTES)
+	sweep_parser.add_argument("--spill-dir", default=None, help="Where evicted rows are written.")
+
+	ui_startup_parser = subparsers.add_parser("ui-startup", help="Cold start time of the UI.")
+	ui_startup_parser.add_argument("--runs", type=int, default=5, help="Interpreters started for every mode.")
+
+	args = parser.parse_args()
+
+	if args.benchmark == "parallel-dp":
+		benchmark_parallel_dynamic(args.directory, args.tests, args.workers)
+	elif args.benchmark == "local-search":
+		benchmark_local_search(args.directory, args.tests)
+	elif args.benchmark == "out-of-core":
+		benchmark_out_of_core(args.directory, args.tests, args.scratch_dir, args.block_size)
+	elif args.benchmark == "brute-force":
+		benchmark_brute_force(args.directory, args.tests, args.block_size)
+	elif args.benchmark == "batch":
+		benchmark_batch(args.directory, args.tests, args.copies, args.max_cells)
+	elif args.benchmark == "allocate":
+		benchmark_allocation(args.directory, args.tests, args.copies, args.budget_fraction, args.concatenated)
+	elif args.benchmark == "results-store":
+		benchmark_results_store(args.directory, args.tests, args.copies, args.scratch_dir, args.reads)
+	elif args.benchmark == "core":
+		benchmark_core(args.directory, args.tests)
+	elif args.benchmark == "sweep":
+		benchmark_sweep(args.directory, args.tests, args.scenarios, args.changed_groups, args.cache_bytes,
+						args.spill_dir)
+	elif args.benchmark == "ui-startup":
+		benchmark_ui_startup(args.runs)
@@ -1,5 +1,9 @@
 from typing import NamedTuple
 
+# Rigidities are used as fixed-point integers with this many units per 1, so that efforts are computed with
+# exact integer arithmetic (in floating point, ceil(|o_1 - o_2| * r * k) misrounds cases like 0.29 * 100)
+RIGIDITY_SCALE = 10**9
+
 
 class AgentGroup(NamedTuple):
 	n: int
@@ -65,3 +69,16 @@ def create_agent_group(n: int, o_1: int, o_2: int, r: float):
 		raise ValueError("Error: the resistance must be between 0 and 1")
 
 	return AgentGroup(n, o_1, o_2, r)
+
+def fixed_point_rigidity(r: float) -> int:
+	"""Returns the rigidity as an integer number of 1 / RIGIDITY_SCALE units."""
+	return round(r * RIGIDITY_SCALE)
+
+def calculate_group_effort(group: AgentGroup, k: int) -> int:
+	"""
+	Calculates the effort of moderating k agents of a group, ceil(|o_1 - o_2| * r * k), exactly.
+
+	The rigidity is rounded to the nearest 1 / RIGIDITY_SCALE, which keeps every rigidity written with
+	up to 9 decimals exact, and the ceiling is an integer division.
+	"""
+	return -(-abs(group.o_1 - group.o_2) * fixed_point_rigidity(group.r) * k // RIGIDITY_SCALE)
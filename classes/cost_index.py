@@ -0,0 +1,134 @@
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+from numpy.typing import NDArray
+
+from classes.agent_group import RIGIDITY_SCALE, AgentGroup, fixed_point_rigidity
+from classes.social_network import SocialNetwork
+
+# Number of networks whose cost index is kept by `cost_index`
+COST_INDEX_CACHE_SIZE = 8
+
+
+class GroupCosts(NamedTuple):
+	"""
+	The exact costs of every option k = 0..n_i of a group: efforts[k] is the effort of moderating k agents
+	and conflicts[k] the conflict numerator that remains in the group, (n_i - k) * (o_1 - o_2)².
+	"""
+	efforts: NDArray[np.int64]
+	conflicts: NDArray[np.int64]
+
+
+def group_costs(group: AgentGroup) -> GroupCosts:
+	"""
+	Computes the costs of every option of a group with integer arithmetic. The vectors are read-only.
+
+	Notes
+	-----
+	- The products |o_1 - o_2| * fixed-point r * k stay below 2^63 for groups of up to 4.6 * 10^7 agents.
+	"""
+	conflict_per_agent = (group.o_1 - group.o_2) ** 2
+	effort_numerator = abs(group.o_1 - group.o_2) * fixed_point_rigidity(group.r)
+
+	k = np.arange(group.n + 1, dtype=np.int64)
+	efforts = -(-k * effort_numerator // RIGIDITY_SCALE)
+	conflicts = (group.n - k) * conflict_per_agent
+	efforts.flags.writeable = False
+	conflicts.flags.writeable = False
+
+	return GroupCosts(efforts, conflicts)
+
+
+class GroupColumns(NamedTuple):
+	"""The per-group constants of a network as read-only int64 vectors, for vectorized solvers."""
+	n: NDArray[np.int64]
+	conflicts_per_agent: NDArray[np.int64]
+	effort_numerators: NDArray[np.int64]
+	full_efforts: NDArray[np.int64] # Effort of moderating every agent of the group
+
+
+class CostIndex:
+	"""
+	Precomputed costs of the groups of a social network, shared by the solvers.
+
+	The per-agent constants of every group are computed in O(n) when the index is built: the conflict
+	per agent (o_1 - o_2)² and the effort numerator |o_1 - o_2| * fixed-point r, the effort per agent in
+	1 / RIGIDITY_SCALE units. Any effort is then an exact integer ceiling division. The vectors of costs of
+	every option of a group (`options`) are built the first time they are requested, so solvers that only
+	need a few efforts per group (the greedy ones) stay O(n).
+	"""
+	def __init__(self, social_network: SocialNetwork):
+		groups = social_network.groups
+
+		self.n = [group.n for group in groups]
+		self.conflicts_per_agent = [(group.o_1 - group.o_2) ** 2 for group in groups]
+		self.effort_numerators = [abs(group.o_1 - group.o_2) * fixed_point_rigidity(group.r) for group in groups]
+		self.max_effort = sum(self.effort(i, n) for i, n in enumerate(self.n))
+
+		self.groups = groups
+		self._options: List[Optional[GroupCosts]] = [None] * len(groups)
+		self._columns: Optional[GroupColumns] = None
+		self._lock = threading.Lock()
+
+	def effort(self, i: int, k: int) -> int:
+		"""Effort of moderating k agents of group i, ceil(|o_1 - o_2| * r * k)."""
+		return -(-self.effort_numerators[i] * k // RIGIDITY_SCALE)
+
+	def max_agents(self, i: int, budget: int) -> int:
+		"""Largest number of agents of group i that can be moderated with `budget` effort."""
+		if self.effort_numerators[i] == 0:
+			return self.n[i]
+		return min(self.n[i], max(budget, 0) * RIGIDITY_SCALE // self.effort_numerators[i])
+
+	def options(self, i: int) -> GroupCosts:
+		"""The effort and remaining conflict vectors of every option k = 0..n_i of group i."""
+		costs = self._options[i]
+		if costs is None:
+			with self._lock:
+				costs = self._options[i]
+				if costs is None:
+					costs = self._options[i] = group_costs(self.groups[i])
+		return costs
+
+	def columns(self) -> GroupColumns:
+		"""The per-group constants as vectors, built the first time they are requested."""
+		if self._columns is None:
+			with self._lock:
+				if self._columns is None:
+					full_efforts = [self.effort(i, n) for i, n in enumerate(self.n)]
+					columns = GroupColumns(*(np.array(values, dtype=np.int64) for values in (
+						self.n, self.conflicts_per_agent, self.effort_numerators, full_efforts)))
+					for column in columns:
+						column.flags.writeable = False
+					self._columns = columns
+		return self._columns
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def cost_index(social_network: SocialNetwork) -> CostIndex:
+	"""
+	Returns the cost index of a social network, building it only the first time it is requested for the
+	same network object (among the last `COST_INDEX_CACHE_SIZE` networks).
+	"""
+	key = id(social_network)
+
+	with _cache_lock:
+		entry = _cache.get(key)
+		# The network is kept in the entry, so its id cannot be reused by another network while cached
+		if entry is not None and entry[0] is social_network:
+			_cache.move_to_end(key)
+			return entry[1]
+
+	index = CostIndex(social_network)
+
+	with _cache_lock:
+		_cache[key] = (social_network, index)
+		_cache.move_to_end(key)
+		while len(_cache) > COST_INDEX_CACHE_SIZE:
+			_cache.popitem(last=False)
+
+	return index
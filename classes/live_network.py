@@ -0,0 +1,179 @@
+from bisect import bisect_left, insort
+from typing import Dict, List
+
+from classes.agent_group import (RIGIDITY_SCALE, AgentGroup,
+                                 calculate_group_effort, fixed_point_rigidity)
+from classes.social_network import SocialNetwork
+
+# Groups with a lower rigidity are moderated first by the greedy, by decreasing discrepancy
+R_MIN = 10**-6
+# Scaling factor of the discrepancy-to-rigidity ratio that orders the other groups
+RATIO_FACTOR = 10**6
+
+
+def greedy_key(group_id: int, group: AgentGroup) -> tuple:
+	"""
+	Position of a group in the order of `greedy_moderation_with_radix_sort` (smaller keys first): groups
+	with r < R_MIN by decreasing discrepancy and input order, then the rest by decreasing scaled ratio
+	and reverse input order. Group ids increase with the input order.
+	"""
+	discrepancy = abs(group.o_1 - group.o_2)
+	if group.r < R_MIN:
+		return (0, -discrepancy, group_id)
+	return (1, -int(round(discrepancy / group.r * RATIO_FACTOR)), -group_id)
+
+
+def key_group_id(key: tuple) -> int:
+	return key[2] if key[0] == 0 else -key[2]
+
+
+class LiveNetwork:
+	"""
+	A mutable social network whose groups can be added, updated and removed one at a time.
+
+	Every edit updates in O(1) the conflict numerator ∑ n_i * (o_i,1 - o_i,2)², the effort of moderating
+	every agent and the total number of agents, and moves the group in a list sorted by the greedy order:
+	a binary search in O(log n) plus a list insertion or deletion in O(n) (a single memory move, which stays
+	small next to the greedy pass that follows an edit). Groups are identified by the id returned when they
+	are added; the order of the groups (in `to_social_network`) is the order in which they were added.
+
+	The greedy strategy is cached position by position along the index, together with the effort left
+	after every position. The greedy decision of a group only depends on the groups before it, so an edit
+	only discards the cached positions from the edited one on, and the next `greedy_moderation` resumes
+	from there (and stops as soon as the effort runs out).
+	"""
+	def __init__(self, r_max: int):
+		self.r_max = r_max
+		self.groups: Dict[int, AgentGroup] = {}
+		self.conflict_numerator = 0
+		self.max_effort = 0
+		self.total_agents = 0
+
+		self._next_id = 0
+		self._keys: Dict[int, tuple] = {}
+		self._order: List[tuple] = []
+
+		# _decisions[p] and _remaining[p] are the greedy decision of the group at position p of the order
+		# and the effort left after it
+		self._decisions: List[int] = []
+		self._remaining: List[int] = []
+		self.last_resolved = 0 # Positions evaluated by the last `greedy_moderation`
+
+	@classmethod
+	def from_social_network(cls, social_network: SocialNetwork) -> "LiveNetwork":
+		live_network = cls(social_network.r_max)
+
+		# The index is sorted once instead of inserting the groups one at a time
+		for group_id, group in enumerate(social_network.groups):
+			live_network.groups[group_id] = group
+			live_network._keys[group_id] = greedy_key(group_id, group)
+			live_network._account(group, 1)
+		live_network._order = sorted(live_network._keys.values())
+		live_network._next_id = len(social_network.groups)
+
+		return live_network
+
+	def to_social_network(self) -> SocialNetwork:
+		return SocialNetwork(list(self.groups.values()), self.r_max)
+
+	def __len__(self) -> int:
+		return len(self.groups)
+
+	def internal_conflict(self) -> float:
+		"""The same value as `calculate_internal_conflict`, in O(1)."""
+		return self.conflict_numerator / (len(self.groups) if len(self.groups) > 0 else 1)
+
+	def add_group(self, group: AgentGroup) -> int:
+		"""Adds a group after every other group and returns its id."""
+		group_id = self._next_id
+		self._next_id += 1
+
+		self.groups[group_id] = group
+		self._account(group, 1)
+		self._insert_key(group_id, group)
+
+		return group_id
+
+	def update_group(self, group_id: int, group: AgentGroup) -> None:
+		"""Replaces a group, keeping its id and its position among the groups."""
+		old_group = self._get(group_id)
+
+		self.groups[group_id] = group
+		self._account(old_group, -1)
+		self._account(group, 1)
+		self._remove_key(group_id)
+		self._insert_key(group_id, group)
+
+	def remove_group(self, group_id: int) -> AgentGroup:
+		group = self._get(group_id)
+
+		del self.groups[group_id]
+		self._account(group, -1)
+		self._remove_key(group_id)
+
+		return group
+
+	def set_r_max(self, r_max: int) -> None:
+		if r_max != self.r_max:
+			self.r_max = r_max
+			self._invalidate(0)
+
+	def greedy_moderation(self) -> List[int]:
+		"""
+		Returns the strategy of `greedy_moderation_with_radix_sort` for `to_social_network()`, resuming the
+		cached greedy from the first position changed since the last call.
+		"""
+		# If we have enough effort to moderate the entire social network, moderate all agents in all groups
+		if self.max_effort <= self.r_max:
+			self.last_resolved = 0
+			return [group.n for group in self.groups.values()]
+
+		start = len(self._decisions)
+		remaining = self._remaining[-1] if self._remaining else self.r_max
+
+		for key in self._order[start:]:
+			if remaining <= 0:
+				break # No more budget available, every following group gets 0
+
+			group = self.groups[key_group_id(key)]
+			effort_numerator = abs(group.o_1 - group.o_2) * fixed_point_rigidity(group.r)
+
+			e_i = 0
+			if effort_numerator > 0:
+				e_i = min(group.n, remaining * RIGIDITY_SCALE // effort_numerator)
+				remaining -= calculate_group_effort(group, e_i)
+
+			self._decisions.append(e_i)
+			self._remaining.append(remaining)
+
+		self.last_resolved = len(self._decisions) - start
+
+		decisions = {key_group_id(key): e_i for key, e_i in zip(self._order, self._decisions) if e_i > 0}
+		return [decisions.get(group_id, 0) for group_id in self.groups]
+
+	def _get(self, group_id: int) -> AgentGroup:
+		if group_id not in self.groups:
+			raise KeyError(f"Error: unknown group {group_id}")
+		return self.groups[group_id]
+
+	def _account(self, group: AgentGroup, sign: int) -> None:
+		self.conflict_numerator += sign * group.n * (group.o_1 - group.o_2) ** 2
+		self.max_effort += sign * calculate_group_effort(group, group.n)
+		self.total_agents += sign * group.n
+
+	def _insert_key(self, group_id: int, group: AgentGroup) -> None:
+		key = greedy_key(group_id, group)
+		self._keys[group_id] = key
+		self._invalidate(bisect_left(self._order, key))
+		insort(self._order, key)
+
+	def _remove_key(self, group_id: int) -> None:
+		key = self._keys.pop(group_id)
+		position = bisect_left(self._order, key)
+		self._invalidate(position)
+		del self._order[position]
+
+	def _invalidate(self, position: int) -> None:
+		"""Discards the cached greedy decisions from a position of the order on."""
+		del self._decisions[position:]
+		del self._remaining[position:]
@@ -0,0 +1,240 @@
+import csv
+import hashlib
+import io
+import os
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from classes.agent_group import fixed_point_rigidity
+from classes.social_network import SocialNetwork
+
+# Strategy bytes kept in memory before they are written and synced
+DEFAULT_BUFFER_BYTES = 8 * 2**20
+# Results kept in memory before they are written and synced
+DEFAULT_SYNC_RECORDS = 1024
+
+INDEX_SUFFIX = ".index.csv"
+INDEX_FIELDS = ["index", "network_hash", "solver", "IC", "effort", "time", "groups", "dtype", "offset"]
+
+
+class ResultMetadata(NamedTuple):
+	"""The index row of a result: where its strategy is stored and what it achieves."""
+	index: int
+	network_hash: str
+	solver: str
+	IC: float
+	effort: int
+	time: float # Seconds the solver took
+	groups: int # Length of the strategy
+	dtype: str # NumPy type of the stored strategy
+	offset: int # Position of the strategy in the data file, in bytes
+
+
+class ResultRecord(NamedTuple):
+	metadata: ResultMetadata
+	strategy: List[int]
+
+
+def network_hash(social_network: SocialNetwork) -> str:
+	"""Returns a digest of the groups (with their rigidity in fixed point) and the R_max of a network."""
+	digest = hashlib.blake2b(digest_size=16)
+	digest.update(str(social_network.r_max).encode())
+	for group in social_network.groups:
+		digest.update(f";{group.n},{group.o_1},{group.o_2},{fixed_point_rigidity(group.r)}".encode())
+	return digest.hexdigest()
+
+
+def index_path(path: str) -> str:
+	return path + INDEX_SUFFIX
+
+
+def read_index_rows(path: str) -> Tuple[List[ResultMetadata], int]:
+	"""
+	Reads the complete rows of the index of a results store and returns them with the size in bytes of the
+	index up to the last of them (0 if not even the header is complete). A last row torn by an interrupted
+	write has no line terminator and is left out.
+	"""
+	if not os.path.exists(index_path(path)):
+		return [], 0
+
+	with open(index_path(path), "rb") as file:
+		data = file.read()
+
+	size = 0
+	for line in data.splitlines(keepends=True):
+		if not line.endswith(b"\n"):
+			break
+		size += len(line)
+
+	if size == 0:
+		return [], 0
+
+	rows = csv.DictReader(io.StringIO(data[:size].decode(), newline=""))
+	return [ResultMetadata(int(row["index"]), row["network_hash"], row["solver"], float(row["IC"]),
+						   int(row["effort"]), float(row["time"]), int(row["groups"]), row["dtype"],
+						   int(row["offset"]))
+			for row in rows], size
+
+
+def read_index(path: str) -> List[ResultMetadata]:
+	"""Reads the index of a results store, or returns an empty one if the store does not exist yet."""
+	return read_index_rows(path)[0]
+
+
+class ResultsWriter:
+	"""
+	Appends many results to one store: the strategies, one after the other, as raw arrays of the smallest
+	unsigned integer type that fits each of them in the data file `path`, and one metadata row per result
+	in the CSV index `path + INDEX_SUFFIX`.
+
+	Results are buffered and written in batches, every `sync_every` results or `buffer_bytes` strategy
+	bytes, and each batch is synced to disk (the data file before the index, so the index never points to
+	missing data). Opening an existing store appends to it; data written after the last indexed result and
+	a torn last index row (by an interrupted batch) are discarded.
+	"""
+	def __init__(self, path: str, buffer_bytes: int = DEFAULT_BUFFER_BYTES, sync_every: int = DEFAULT_SYNC_RECORDS,
+				 fsync: bool = True):
+		if buffer_bytes <= 0 or sync_every <= 0:
+			raise ValueError("Error: buffer_bytes and sync_every must be positive")
+
+		self.path = path
+		self.buffer_bytes = buffer_bytes
+		self.sync_every = sync_every
+		self.fsync = fsync
+
+		index, index_size = read_index_rows(path)
+		self.count = len(index)
+		self.end = 0
+		if index:
+			last = index[-1]
+			self.end = last.offset + last.groups * np.dtype(last.dtype).itemsize
+
+		if os.path.exists(index_path(path)):
+			os.truncate(index_path(path), index_size)
+		self.data_file = open(path, "r+b" if os.path.exists(path) else "w+b")
+		self.data_file.truncate(self.end)
+		self.data_file.seek(self.end)
+		self.index_file = open(index_path(path), "a", newline="")
+		self.index_writer = csv.writer(self.index_file)
+		if index_size == 0:
+			self.index_writer.writerow(INDEX_FIELDS)
+
+		self.pending_data: List[bytes] = []
+		self.pending_rows: List[list] = []
+		self.pending_bytes = 0
+		self.syncs = 0
+
+	def append(self, network_hash: str, solver: str, strategy: List[int], effort: int, IC: float,
+			   time: float = 0.0) -> int:
+		"""Adds a result and returns its index in the store."""
+		values = np.asarray(strategy, dtype=np.int64)
+		if len(values) > 0 and values.min() < 0:
+			raise ValueError("Error: a strategy cannot moderate a negative number of agents")
+
+		dtype = np.min_scalar_type(int(values.max()) if len(values) > 0 else 0).newbyteorder("<")
+		data = values.astype(dtype).tobytes()
+
+		index = self.count
+		self.pending_rows.append([index, network_hash, solver, repr(float(IC)), int(effort), repr(float(time)),
+								  len(values), dtype.str, self.end])
+		self.pending_data.append(data)
+		self.pending_bytes += len(data)
+		self.count += 1
+		self.end += len(data)
+
+		if len(self.pending_rows) >= self.sync_every or self.pending_bytes >= self.buffer_bytes:
+			self.flush()
+
+		return index
+
+	def flush(self) -> None:
+		"""Writes the buffered results and syncs them to disk."""
+		if not self.pending_rows:
+			return
+
+		self.data_file.write(b"".join(self.pending_data))
+		self.data_file.flush()
+		if self.fsync:
+			os.fsync(self.data_file.fileno())
+
+		self.index_writer.writerows(self.pending_rows)
+		self.index_file.flush()
+		if self.fsync:
+			os.fsync(self.index_file.fileno())
+
+		self.pending_data.clear()
+		self.pending_rows.clear()
+		self.pending_bytes = 0
+		self.syncs += 1
+
+	def close(self) -> None:
+		self.flush()
+		self.data_file.close()
+		self.index_file.close()
+
+	def __enter__(self) -> "ResultsWriter":
+		return self
+
+	def __exit__(self, *_) -> None:
+		self.close()
+
+
+class ResultsReader:
+	"""Reads the results of a store written by `ResultsWriter`, any of them in O(1) after loading the index."""
+	def __init__(self, path: str):
+		if not os.path.exists(path):
+			raise FileNotFoundError(f"Error: {path} not found")
+
+		self.path = path
+		self.index = read_index(path)
+		self.data_file = open(path, "rb")
+
+	def __len__(self) -> int:
+		return len(self.index)
+
+	def metadata(self, index: int) -> ResultMetadata:
+		if not 0 <= index < len(self.index):
+			raise IndexError(f"Error: no result {index} in {self.path}")
+		return self.index[index]
+
+	def read(self, index: int) -> ResultRecord:
+		"""Reads one result, seeking directly to its strategy."""
+		metadata = self.metadata(index)
+		dtype = np.dtype(metadata.dtype)
+		self.data_file.seek(metadata.offset)
+		strategy = np.frombuffer(self.data_file.read(metadata.groups * dtype.itemsize), dtype=dtype)
+		return ResultRecord(metadata, strategy.astype(np.int64).tolist())
+
+	def __iter__(self) -> Iterator[ResultRecord]:
+		for index in range(len(self.index)):
+			yield self.read(index)
+
+	def close(self) -> None:
+		self.data_file.close()
+
+	def __enter__(self) -> "ResultsReader":
+		return self
+
+	def __exit__(self, *_) -> None:
+		self.close()
+
+
+def export_text(path: str, directory: str, indices: Optional[List[int]] = None) -> List[str]:
+	"""
+	Writes results of a store as separate files in the format of `main.write_output` (IC, effort and one
+	line per group), named result_<index>.txt, and returns their paths. The IC and the effort come from
+	the index, so the networks are not needed.
+	"""
+	os.makedirs(directory, exist_ok=True)
+	paths = []
+
+	with ResultsReader(path) as reader:
+		for index in range(len(reader)) if indices is None else indices:
+			metadata, strategy = reader.read(index)
+			output_path = os.path.join(directory, f"result_{metadata.index:06}.txt")
+			with open(output_path, "w") as file:
+				file.write(f"{metadata.IC}\n{metadata.effort}\n" + "\n".join(map(str, strategy)))
+			paths.append(output_path)
+
+	return paths
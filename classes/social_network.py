@@ -1,7 +1,7 @@
-import math
-from typing import List, NamedTuple
+from typing import List, NamedTuple, Tuple
 
-from classes.agent_group import AgentGroup, create_agent_group
+from classes.agent_group import (AgentGroup, calculate_group_effort,
+                                 create_agent_group)
 
 
 class SocialNetwork(NamedTuple):
@@ -121,7 +121,8 @@ def calculate_effort(social_network: SocialNetwork, strategy: List[int]) -> int:
 
 	The effort is calculated according to the formula:
 	Effort(SN,E) = sum(ceil(|o_i,1 - o_i,2| * r_i * e_i))
-	where e_i is the number of agents in group i whose opinions will be modified.
+	where e_i is the number of agents in group i whose opinions will be modified, with exact integer
+	arithmetic (see `calculate_group_effort`).
 
 	Parameters
 	----------
@@ -156,13 +157,62 @@ def calculate_effort(social_network: SocialNetwork, strategy: List[int]) -> int:
 	for i, group in enumerate(groups):
 		e_i = strategy[i]
 		if e_i > 0:
-			effort += math.ceil(
-				abs(group.o_1 - group.o_2) * group.r * strategy[i]
-			)
+			effort += calculate_group_effort(group, e_i)
 
 	return effort
 
 
+def evaluate_strategy(social_network: SocialNetwork, strategy: List[int]) -> Tuple[int, float, bool]:
+	"""
+	Calculates, in a single pass over the groups, the effort of a strategy, the internal conflict of the
+	network after applying it and whether it is applicable.
+
+	This gives the same values as `calculate_effort` and `calculate_internal_conflict(apply_strategy(...))`
+	without building the modified network.
+
+	Parameters
+	----------
+	social_network: SocialNetwork
+
+	strategy: List[int]
+		A sequence of integers [e_0,e_1,...,e_(n - 1)] where e_i indicates the
+		number of agents to be removed from group i.
+
+	Returns
+	-------
+	Tuple[int, float, bool]
+		The effort required to implement the strategy, the internal conflict of the modified network and
+		whether the effort does not exceed R_max.
+
+	Raises
+	------
+	ValueError
+		If the length of the strategy does not match the number of agent groups.
+		If any strategy value exceeds the number of agents in its corresponding group.
+	"""
+	groups = social_network.groups
+	n = len(groups)
+
+	if len(strategy) != n:
+		raise ValueError("Error: the length of strategy must be equal to the number of agent groups")
+
+	effort = 0
+	numerator = 0
+
+	for group, e_i in zip(groups, strategy):
+		if e_i > group.n:
+			raise ValueError("Error: strategy value cannot be greater than the number of agents in the group")
+
+		discrepancy = group.o_1 - group.o_2
+		if e_i > 0:
+			effort += calculate_group_effort(group, e_i)
+		numerator += (group.n - e_i) * discrepancy**2
+
+	IC = numerator / (n if n > 0 else 1)
+
+	return effort, IC, effort <= social_network.r_max
+
+
 def calculate_max_effort(social_network: SocialNetwork) -> int:
 	"""
 	Calculates the effort required to reduce the entire social network's internal conflict to zero.
@@ -186,8 +236,6 @@ def calculate_max_effort(social_network: SocialNetwork) -> int:
 	for group in groups:
 		e_i = group.n
 		if e_i > 0:
-			effort += math.ceil(
-				abs(group.o_1 - group.o_2) * group.r * e_i
-			)
+			effort += calculate_group_effort(group, e_i)
 
 	return effort
@@ -1,20 +1,23 @@
+import argparse
+import io
+import json
 import os
-from typing import List
+import sys
+from collections import deque
+from typing import Callable, Iterator, List, Optional, TextIO, Tuple, Union
 import time
 
-from tabulate import tabulate  # Library for displaying formatted tables
-
-from algorithms.brute_force import brute_force
-from algorithms.dynamic import dynamic_bottom_up, dynamic_top_down
-from algorithms.greedy import (greedy_discrepancy_rigidity_heap,
-                               greedy_moderation_with_radix_sort)
+from algorithms.registry import SOLVERS, check_options, solve
 from classes.agent_group import create_agent_group
-from classes.social_network import (SocialNetwork, apply_strategy,
-                                    calculate_effort,
-                                    calculate_internal_conflict)
+from classes.social_network import SocialNetwork, evaluate_strategy
+
 
+# Number of groups parsed between two progress reports while loading a file
+LOAD_PROGRESS_INTERVAL = 1000
 
-def load_social_network_from_txt(file_path: str) -> SocialNetwork:
+
+def load_social_network_from_txt(file_path: str,
+								 progress: Optional[Callable[[int, int, int], None]] = None) -> SocialNetwork:
 	"""
 	Loads a social network from a TXT file following the specified format.
 
@@ -22,6 +25,9 @@ def load_social_network_from_txt(file_path: str) -> SocialNetwork:
 	----------
 	file_path : str
 		The path to the TXT file containing the social network data.
+	progress : Callable[[int, int, int], None], optional
+		Called every `LOAD_PROGRESS_INTERVAL` groups (and once the file is read) with the number of bytes
+		read, the number of groups parsed and the number of groups declared in the file.
 
 	Returns
 	-------
@@ -32,26 +38,82 @@ def load_social_network_from_txt(file_path: str) -> SocialNetwork:
 	------
 	ValueError
 		If the file format is incorrect or contains invalid values.
+
+	Notes
+	-----
+	The file is parsed line by line, so a format error is raised as soon as the wrong line is read.
 	"""
 	with open(file_path, "r") as file:
-		lines = file.readlines()
+		return read_social_network(file, progress)
+
+
+def read_social_network(file: TextIO,
+						progress: Optional[Callable[[int, int, int], None]] = None) -> SocialNetwork:
+	"""
+	Reads one social network in the TXT format from an open text stream.
+
+	Only the lines of one network are consumed, so several networks written one after the other in the
+	same stream can be read by calling this function repeatedly.
+
+	Parameters
+	----------
+	file : TextIO
+		The stream to read from, positioned at the first line of the network.
+	progress : Callable[[int, int, int], None], optional
+		See `load_social_network_from_txt`.
+
+	Returns
+	-------
+	SocialNetwork
+		A SocialNetwork object containing the agent groups and the maximum effort available.
+
+	Raises
+	------
+	ValueError
+		If the format is incorrect or contains invalid values.
+	"""
+	# Progress is the position in the underlying bytes, which the lengths of the decoded lines do not give
+	# (newline translation, multi-byte characters). Streams without one count the encoded lines instead
+	buffer = getattr(file, "buffer", None)
+	if buffer is not None and not buffer.seekable():
+		buffer = None
+	encoded_bytes = 0
+
+	def read_line(line_number: int) -> str:
+		nonlocal encoded_bytes
+		line = file.readline()
+		if not line:
+			raise ValueError(f"Error: unexpected end of file on line {line_number}")
+		if progress is not None and buffer is None:
+			encoded_bytes += len(line.encode())
+		return line
+
+	def bytes_read() -> int:
+		return buffer.tell() if buffer is not None else encoded_bytes
 
 	# Extract the number of agent groups
-	n_groups = int(lines[0].strip())
+	n_groups = int(read_line(1).strip())
 
 	agent_groups = []
 
 	# Extract each agent group's data
 	for i in range(1, n_groups + 1):
-		parts = lines[i].strip().split(",")
+		line = read_line(i + 1)
+		parts = line.strip().split(",")
 		if len(parts) != 4:
-			raise ValueError(f"Error: invalid format on line {i + 1}: {lines[i]}")
+			raise ValueError(f"Error: invalid format on line {i + 1}: {line}")
 
 		n, o_1, o_2, r = int(parts[0]), int(parts[1]), int(parts[2]), float(parts[3])
 		agent_groups.append(create_agent_group(n, o_1, o_2, r))
 
+		if progress is not None and i % LOAD_PROGRESS_INTERVAL == 0:
+			progress(bytes_read(), i, n_groups)
+
 	# Extract the maximum effort available
-	r_max = int(lines[n_groups + 1].strip())
+	r_max = int(read_line(n_groups + 2).strip())
+
+	if progress is not None:
+		progress(bytes_read(), n_groups, n_groups)
 
 	return SocialNetwork(agent_groups, r_max)
 
@@ -60,9 +122,9 @@ def write_output(path: str, social_network: SocialNetwork, strategy: List[int])
 	"""
 	Writes the results of applying a moderation strategy to a social network to a file.
 
-	This function calculates the effort required to implement the strategy,
-	applies the strategy to create a modified network, calculates the resulting
-	internal conflict, and writes these results to a text file.
+	This function calculates the effort required to implement the strategy and
+	the internal conflict that results from applying it, and writes these results
+	to a text file.
 
 	Parameters
 	----------
@@ -88,17 +150,20 @@ def write_output(path: str, social_network: SocialNetwork, strategy: List[int])
 	- Line 2: the effort required to implement the strategy.
 	- Line 3 and beyond: each value of the strategy on a separate line.
 	"""
-	effort = calculate_effort(social_network, strategy)
-	modified_network = apply_strategy(social_network, strategy)
-	IC = calculate_internal_conflict(modified_network)
-
 	with open(path, "w") as file:
-		file.write(f"{IC}\n")
-		file.write(f"{effort}\n")
-		file.write('\n'.join(map(str, strategy)))
+		file.write(format_output(social_network, strategy))
+
+
+def format_output(social_network: SocialNetwork, strategy: List[int]) -> str:
+	"""
+	Returns the text that `write_output` writes for a strategy (without a trailing newline).
+	"""
+	effort, IC, _ = evaluate_strategy(social_network, strategy)
 
+	return f"{IC}\n{effort}\n" + '\n'.join(map(str, strategy))
 
-def run_tests(directory: str, num_tests: int, strategies: dict) -> None:
+
+def run_tests(directory: str, num_tests: int, solvers: List[str]) -> None:
 	"""
 	Executes a series of tests on social network moderation strategies and compares their performance.
 
@@ -108,11 +173,15 @@ def run_tests(directory: str, num_tests: int, strategies: dict) -> None:
 		The folder where the test files are located.
 	num_tests : int
 		The number of test files (assumes they are named test_01.txt, test_02.txt, ...).
-	strategies : dict[str, Callable]
-		A dictionary mapping strategy names to their corresponding functions. Each function should take
-		a social network object as input and return a solution for moderating internal conflict.
+	solvers : List[str]
+		Names of the solvers to compare, as registered in `algorithms.registry.SOLVERS`.
 	"""
+	from tabulate import tabulate  # Library for displaying formatted tables
+
+	from algorithms.certificate import PROVEN, certify_greedy
+
 	results = []
+	skipped_runs = 0
 
 	for i in range(1, num_tests + 1):
 		test_case_name = f"test_{i:02}" # Format test case name with leading zero if i < 10
@@ -126,35 +195,267 @@ def run_tests(directory: str, num_tests: int, strategies: dict) -> None:
 		social_network = load_social_network_from_txt(filename)
 		max_effort = social_network.r_max
 
+		# When the greedy strategy is proven optimal, the exact solvers do not need to run
+		certificate = certify_greedy(social_network)
+
 		partial_results = [test_case_name]
-		for strategy_name, strategy_func in strategies.items():
+		for solver in solvers:
+			if SOLVERS[solver].exact and certificate.optimality == PROVEN:
+				partial_results.append(certificate.IC)
+				skipped_runs += 1
+				continue
+
 			start_time = time.perf_counter()
-			solution = strategy_func(social_network)
+			solution = solve(solver, social_network)
 			end_time = time.perf_counter()
 			execution_time = end_time - start_time
-			modified_network = apply_strategy(social_network, solution)
-			final_conflict = calculate_internal_conflict(modified_network)
+			_, final_conflict, _ = evaluate_strategy(social_network, solution)
 
 			# Save the results
 			#partial_results.append(strategy_name)
 			partial_results.append(final_conflict)
 			#partial_results.append(execution_time)
 
+		partial_results.append(certificate.optimality)
+
 		# Save the results
 		#if final_conflict > 0:
 		results.append(partial_results)
 
 	# Display the results in a tabulate table
-	headers = ["Test Case", "Dynamic", "With heap", "With radix sort"]
+	headers = ["Test Case"] + [SOLVERS[solver].label for solver in solvers] + ["Greedy optimality"]
 	#headers = ["Test Case", "Discrepancy/rigidity time", "With heap time", "With radix sort time"]
 	#headers = ["Test Case", "With heap time", "With radix sort time"]
 	print(tabulate(results, headers=headers, tablefmt="plain"))
+	print(f"Exact solver runs skipped: {skipped_runs}")
+
+
+def iter_text_networks(stream: TextIO) -> Iterator[Union[SocialNetwork, ValueError]]:
+	"""
+	Reads social networks in the TXT format written one after the other in a stream, one at a time.
+	Blank lines between networks are ignored. A network that cannot be read is yielded as the ValueError
+	that describes it, and reading goes on after its lines (or after its first line, if even the number
+	of groups cannot be read).
+	"""
+	line_number = 0
+	while True:
+		line = stream.readline()
+		line_number += 1
+		if not line:
+			return
+		if not line.strip():
+			continue
+
+		try:
+			n_groups = int(line.strip())
+		except ValueError:
+			yield ValueError(f"Error: invalid number of groups on line {line_number}: {line.strip()}")
+			continue
+
+		# Only the lines of the current network are kept in memory
+		record = [line] + [stream.readline() for _ in range(n_groups + 1)]
+		try:
+			yield read_social_network(io.StringIO("".join(record)))
+		except ValueError as e:
+			yield ValueError(f"Error: invalid network starting on line {line_number}: {e}")
+		line_number += n_groups + 1
+
+
+def iter_ndjson_networks(stream: TextIO) -> Iterator[Union[SocialNetwork, ValueError]]:
+	"""
+	Reads social networks from a stream with one JSON object per line, of the form
+	{"groups": [[n, o_1, o_2, r], ...], "r_max": R_max}. A line that is not a valid network is yielded as
+	the ValueError that describes it.
+	"""
+	for line_number, line in enumerate(stream, start=1):
+		if not line.strip():
+			continue
+
+		try:
+			record = json.loads(line)
+			agent_groups = [create_agent_group(int(n), int(o_1), int(o_2), float(r)) for n, o_1, o_2, r in record["groups"]]
+			yield SocialNetwork(agent_groups, int(record["r_max"]))
+		except (KeyError, TypeError, ValueError) as e:
+			yield ValueError(f"Error: invalid network on line {line_number}: {e}")
+
+
+def solve_stream_record(solver: str, social_network: SocialNetwork,
+						options: Optional[dict] = None) -> Tuple[List[int], int, float, str, float]:
+	from algorithms.wrappers import modci
+
+	start_time = time.perf_counter()
+	strategy, effort, IC, optimality = modci(solver, social_network, options=options)
+	return [int(e) for e in strategy], effort, IC, optimality, time.perf_counter() - start_time
+
+
+def run_stream(input_stream: TextIO, output_stream: TextIO, solver: str = "greedy", input_format: str = "text",
+			   output_format: str = "text", workers: int = 1, max_pending: int = 0, ordered: bool = False,
+			   results_store: Optional[str] = None, options: Optional[dict] = None) -> int:
+	"""
+	Solves a stream of social networks and writes every result as soon as it is ready.
+
+	A network that cannot be read or solved does not stop the stream: its error is written in its place,
+	as {"index": i, "error": message} with the "ndjson" output format and to stderr otherwise.
+
+	Parameters
+	----------
+	input_stream : TextIO
+		Networks in the TXT format written one after the other ("text"), or one JSON object per line
+		("ndjson", see `iter_ndjson_networks`).
+	output_stream : TextIO
+		Where results are written, in the `write_output` format followed by a blank line ("text"), or as
+		one JSON object per line with the input index, IC, effort, optimality and strategy ("ndjson").
+	solver : str
+		One of the names in `algorithms.registry.SOLVERS`.
+	workers : int
+		Number of networks solved at the same time (in separate processes).
+	max_pending : int
+		Maximum number of networks read but not yet written (2 * workers when it is 0). Input is only
+		read when there is room, so memory stays bounded no matter how long the stream is.
+	ordered : bool
+		Whether results are written in input order. Otherwise they are written as they finish.
+	results_store : str, optional
+		If given, results are appended to this store (see `classes.results_store.ResultsWriter`) instead of
+		being written to output_stream.
+	options : dict, optional
+		Options of the solver, such as the "epsilon" of the FPTAS (see `algorithms.registry.solve`).
+
+	Returns
+	-------
+	int
+		The number of networks that failed.
+	"""
+	# Imported here so loading a file (from the UI or the service) does not pay for multiprocessing
+	from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+	options = check_options(solver, options) # Fails before reading any network
+	networks = iter_text_networks(input_stream) if input_format == "text" else iter_ndjson_networks(input_stream)
+	max_pending = max_pending if max_pending > 0 else 2 * workers
+
+	writer = None
+	if results_store is not None:
+		from classes.results_store import ResultsWriter, network_hash
+
+		writer = ResultsWriter(results_store)
+
+	def emit(index: int, social_network: SocialNetwork, result: Tuple[List[int], int, float, str, float]) -> None:
+		strategy, effort, IC, optimality, elapsed = result
+		if writer is not None:
+			writer.append(network_hash(social_network), solver, strategy, effort, IC, elapsed)
+			return
+		if output_format == "ndjson":
+			output_stream.write(json.dumps({"index": index, "IC": IC, "effort": effort, "optimality": optimality,
+											"strategy": strategy}) + "\n")
+		else:
+			output_stream.write(format_output(social_network, strategy) + "\n\n")
+		output_stream.flush()
+
+	failures = 0
+
+	def finish(index: int, social_network: Optional[SocialNetwork], future: Future) -> None:
+		nonlocal failures
+		try:
+			result = future.result()
+		except Exception as e:
+			failures += 1
+			if output_format == "ndjson" and writer is None:
+				output_stream.write(json.dumps({"index": index, "error": str(e)}) + "\n")
+				output_stream.flush()
+			else:
+				print(f"Network {index}: {e}", file=sys.stderr)
+			return
+		emit(index, social_network, result)
+
+	try:
+		with ProcessPoolExecutor(max_workers=workers) as pool:
+			pending = deque() # (index, social network, future), in input order
+
+			def drain(limit: int) -> None:
+				"""Writes the finished results, waiting for more until at most `limit` networks are pending."""
+				while pending:
+					if ordered:
+						index, social_network, future = pending[0]
+						if not future.done() and len(pending) <= limit:
+							return
+						pending.popleft()
+						finish(index, social_network, future)
+					else:
+						finished = [item for item in pending if item[2].done()]
+						for item in finished:
+							pending.remove(item)
+							finish(*item)
+						if len(pending) <= limit:
+							return
+						wait([future for _, _, future in pending], return_when=FIRST_COMPLETED)
+
+			for index, social_network in enumerate(networks):
+				if isinstance(social_network, ValueError):
+					# Unreadable networks take their place in the output like the others
+					future = Future()
+					future.set_exception(social_network)
+					social_network = None
+				else:
+					try:
+						future = pool.submit(solve_stream_record, solver, social_network, options)
+					except Exception as e: # A broken pool fails the remaining networks one by one
+						future = Future()
+						future.set_exception(e)
+				pending.append((index, social_network, future))
+				drain(max_pending - 1)
+
+			drain(0)
+	finally:
+		if writer is not None:
+			writer.close() # Syncs the results still buffered
+
+	return failures
 
 
 if __name__ == "__main__":
-	strategies = {
-		"Dynamic": dynamic_bottom_up,
-		"Heap-Based Greedy": greedy_discrepancy_rigidity_heap,
-		"Radix Sort Greedy": greedy_moderation_with_radix_sort,
-	}
-	run_tests("tests", 30, strategies)
+	parser = argparse.ArgumentParser(description="Moderation of internal conflict of opinion in social networks.")
+	subparsers = parser.add_subparsers(dest="command")
+
+	stream_parser = subparsers.add_parser("stream", help="Solve networks read from stdin and write the results to stdout.")
+	stream_parser.add_argument("--solver", choices=list(SOLVERS), default="greedy")
+	stream_parser.add_argument("--epsilon", type=float, default=None,
+							   help="Approximation factor of the fptas solver (default: 0.1).")
+	stream_parser.add_argument("--input-format", choices=["text", "ndjson"], default="text")
+	stream_parser.add_argument("--output-format", choices=["text", "ndjson"], default="text")
+	stream_parser.add_argument("--workers", type=int, default=1, help="Number of networks solved at the same time.")
+	stream_parser.add_argument("--max-pending", type=int, default=0,
+							   help="Maximum number of networks in flight (default: 2 * workers).")
+	stream_parser.add_argument("--ordered", action="store_true", help="Write the results in input order.")
+	stream_parser.add_argument("--results-store", default=None,
+							   help="Append the results to this binary store instead of writing them to stdout.")
+
+	export_parser = subparsers.add_parser("export-results", help="Write the results of a store as separate text files.")
+	export_parser.add_argument("store", help="The data file of the store.")
+	export_parser.add_argument("directory", help="Where the result_<index>.txt files are written.")
+
+	greedy_file_parser = subparsers.add_parser(
+		"greedy-file", help="Greedy strategy of a network too large for memory, read from and written to files."
+	)
+	greedy_file_parser.add_argument("input", help="The network, in the TXT format.")
+	greedy_file_parser.add_argument("output", help="Where the result is written.")
+	greedy_file_parser.add_argument("--buffer-size", type=int, default=4096,
+									help="Maximum number of candidate groups kept in memory.")
+
+	args = parser.parse_args()
+
+	if args.command == "greedy-file":
+		from algorithms.streaming_greedy import streaming_greedy
+
+		streaming_greedy(args.input, args.output, args.buffer_size)
+	elif args.command == "stream":
+		options = {"epsilon": args.epsilon} if args.epsilon is not None else {}
+		failures = run_stream(sys.stdin, sys.stdout, args.solver, args.input_format, args.output_format,
+							  args.workers, args.max_pending, args.ordered, args.results_store, options)
+		if failures > 0:
+			print(f"{failures} networks failed", file=sys.stderr)
+			sys.exit(1)
+	elif args.command == "export-results":
+		from classes.results_store import export_text
+
+		print(f"Exported {len(export_text(args.store, args.directory))} results to {args.directory}")
+	else:
+		run_tests("tests", 30, ["dynamic", "greedy_heap", "greedy"])
@@ -0,0 +1,405 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+from algorithms.registry import SOLVERS, check_options, get_solver
+from classes.social_network import SocialNetwork, evaluate_strategy
+from main import load_social_network_from_txt, read_social_network
+
+
+# Seconds a request waits for its solver before it fails
+DEFAULT_REQUEST_TIMEOUT = 300.0
+# Largest number of strategies the exhaustive solvers are allowed to enumerate for one request
+DEFAULT_MAX_STRATEGIES = 10**9
+# Solvers whose running time grows with the number of strategies ∏(n_i + 1)
+EXHAUSTIVE_SOLVERS = ("brute_force", "brute_force_vectorized")
+
+
+class UnknownNetwork(LookupError):
+	pass
+
+
+def warm_up_worker() -> None:
+	"""Imports the solvers (and NumPy) once when a worker process starts."""
+	for solver in SOLVERS:
+		get_solver(solver)
+
+
+def solve_in_worker(solver: str, social_network: SocialNetwork,
+					options: Optional[dict] = None) -> Tuple[List[int], int, float, str]:
+	from algorithms.wrappers import modci
+
+	strategy, effort, IC, optimality = modci(solver, social_network, options=options)
+	return [int(e) for e in strategy], int(effort), float(IC), optimality
+
+
+def solve_greedy_batch_in_worker(social_networks: List[SocialNetwork]) -> List[Tuple[List[int], int, float, str]]:
+	return [solve_in_worker("greedy", social_network) for social_network in social_networks]
+
+
+class NetworkCache:
+	"""
+	Keeps the most recently used networks in memory, keyed by the SHA-1 of their TXT representation.
+	"""
+	def __init__(self, capacity: int):
+		self.capacity = capacity
+		self.networks = OrderedDict()
+		self.lock = threading.Lock()
+
+	def get(self, network_id: str) -> Optional[SocialNetwork]:
+		with self.lock:
+			social_network = self.networks.get(network_id)
+			if social_network is not None:
+				self.networks.move_to_end(network_id)
+			return social_network
+
+	def put(self, network_id: str, social_network: SocialNetwork) -> None:
+		with self.lock:
+			self.networks[network_id] = social_network
+			self.networks.move_to_end(network_id)
+			while len(self.networks) > self.capacity:
+				self.networks.popitem(last=False)
+
+	def __len__(self) -> int:
+		return len(self.networks)
+
+
+class GreedyBatcher:
+	"""
+	Groups greedy requests that arrive close together into a single task for the worker pool, so the
+	per-task dispatch cost is shared by every request of the batch.
+
+	A batch is sent when it reaches `max_batch_size` requests or `max_delay` seconds after its first
+	request arrived, whichever happens first.
+	"""
+	def __init__(self, pool: ProcessPoolExecutor, max_batch_size: int, max_delay: float):
+		self.pool = pool
+		self.max_batch_size = max_batch_size
+		self.max_delay = max_delay
+		self.pending = []
+		self.condition = threading.Condition()
+		self.batches_sent = 0
+		self.thread = threading.Thread(target=self.run, daemon=True)
+		self.thread.start()
+
+	def submit(self, social_network: SocialNetwork) -> Future:
+		future = Future()
+		with self.condition:
+			self.pending.append((social_network, future))
+			self.condition.notify()
+		return future
+
+	def run(self) -> None:
+		while True:
+			with self.condition:
+				while not self.pending:
+					self.condition.wait()
+
+				deadline = time.monotonic() + self.max_delay
+				while len(self.pending) < self.max_batch_size:
+					remaining = deadline - time.monotonic()
+					if remaining <= 0:
+						break
+					self.condition.wait(remaining)
+
+				batch = self.pending[:self.max_batch_size]
+				self.pending = self.pending[self.max_batch_size:]
+				self.batches_sent += 1
+
+			networks = [social_network for social_network, _ in batch]
+			futures = [future for _, future in batch]
+			try:
+				self.pool.submit(solve_greedy_batch_in_worker, networks).add_done_callback(
+					lambda done, futures=futures: self.resolve(done, futures)
+				)
+			except Exception as e: # A broken pool fails the batch, not the batcher
+				for future in futures:
+					self.settle(future, error=e)
+
+	@staticmethod
+	def resolve(done: Future, futures: List[Future]) -> None:
+		try:
+			results = done.result()
+			if len(results) != len(futures):
+				raise RuntimeError(f"Error: {len(results)} results for a batch of {len(futures)} requests")
+		except Exception as e:
+			for future in futures:
+				GreedyBatcher.settle(future, error=e)
+			return
+
+		for future, result in zip(futures, results):
+			GreedyBatcher.settle(future, result)
+
+	@staticmethod
+	def settle(future: Future, result: object = None, error: Optional[Exception] = None) -> None:
+		try:
+			if error is not None:
+				future.set_exception(error)
+			else:
+				future.set_result(result)
+		except InvalidStateError:
+			pass # Cancelled by a request that timed out
+
+
+class Metrics:
+	"""Request count, errors and latency of every endpoint since the service started."""
+	def __init__(self):
+		self.start_time = time.monotonic()
+		self.endpoints = {}
+		self.lock = threading.Lock()
+
+	def record(self, endpoint: str, latency: float, failed: bool) -> None:
+		with self.lock:
+			stats = self.endpoints.setdefault(endpoint, {"requests": 0, "errors": 0, "total_latency": 0.0,
+														 "max_latency": 0.0})
+			stats["requests"] += 1
+			stats["errors"] += int(failed)
+			stats["total_latency"] += latency
+			stats["max_latency"] = max(stats["max_latency"], latency)
+
+	def snapshot(self) -> dict:
+		with self.lock:
+			uptime = time.monotonic() - self.start_time
+			return {
+				"uptime": uptime,
+				"endpoints": {
+					endpoint: {
+						"requests": stats["requests"],
+						"errors": stats["errors"],
+						"mean_latency": stats["total_latency"] / stats["requests"],
+						"max_latency": stats["max_latency"],
+						"throughput": stats["requests"] / uptime if uptime > 0 else 0.0,
+					}
+					for endpoint, stats in self.endpoints.items()
+				},
+			}
+
+
+class SolverService:
+	"""
+	Solver state shared by every request: the warm worker pool, the network cache, the greedy batcher
+	and the metrics.
+	"""
+	def __init__(self, workers: int, cache_size: int, batch_size: int, batch_delay: float,
+				 request_timeout: float = DEFAULT_REQUEST_TIMEOUT, max_strategies: int = DEFAULT_MAX_STRATEGIES):
+		self.workers = workers
+		self.pool = ProcessPoolExecutor(max_workers=workers, initializer=warm_up_worker)
+		self.pool_lock = threading.Lock()
+		self.pools_replaced = 0
+		self.request_timeout = request_timeout
+		self.max_strategies = max_strategies
+
+		self.cache = NetworkCache(cache_size)
+		self.batcher = GreedyBatcher(self.pool, batch_size, batch_delay)
+		self.metrics = Metrics()
+
+	def load(self, request: dict) -> Tuple[str, SocialNetwork]:
+		"""
+		Returns the network referenced by a request, loading and caching it if needed.
+
+		A request references a network with exactly one of "network_id" (of a network loaded before),
+		"text" (the network in TXT format) or "path" (of a TXT file readable by the service).
+		"""
+		if "network_id" in request:
+			social_network = self.cache.get(request["network_id"])
+			if social_network is None:
+				raise UnknownNetwork(f"Error: unknown network {request['network_id']}")
+			return request["network_id"], social_network
+
+		if "text" in request:
+			text = request["text"]
+			network_id = hashlib.sha1(text.encode()).hexdigest()
+			social_network = self.cache.get(network_id)
+			if social_network is None:
+				social_network = read_social_network(io.StringIO(text))
+		elif "path" in request:
+			with open(request["path"], "rb") as file:
+				network_id = hashlib.sha1(file.read()).hexdigest()
+			social_network = self.cache.get(network_id)
+			if social_network is None:
+				social_network = load_social_network_from_txt(request["path"])
+		else:
+			raise ValueError("Error: the request must contain \"network_id\", \"text\" or \"path\"")
+
+		self.cache.put(network_id, social_network)
+		return network_id, social_network
+
+	def solve(self, request: dict) -> dict:
+		solver = request.get("solver", "greedy")
+		if solver not in SOLVERS:
+			raise ValueError(f"Error: unknown solver {solver}, expected one of {', '.join(SOLVERS)}")
+
+		options = {"epsilon": float(request["epsilon"])} if "epsilon" in request else {}
+		check_options(solver, options)
+
+		network_id, social_network = self.load(request)
+
+		if solver in EXHAUSTIVE_SOLVERS:
+			from algorithms.brute_force import strategy_count
+
+			total = strategy_count(social_network)
+			if total > self.max_strategies:
+				raise ValueError(f"Error: too many strategies for {solver} ({total:.3g}, at most {self.max_strategies})")
+
+		pool = self.pool
+		if solver == "greedy":
+			future = self.batcher.submit(social_network)
+		else:
+			future = pool.submit(solve_in_worker, solver, social_network, options)
+
+		try:
+			strategy, effort, IC, optimality = future.result(timeout=self.request_timeout)
+		except TimeoutError:
+			future.cancel()
+			self.replace_pool(pool)
+			raise TimeoutError(f"Error: the {solver} solver did not finish in {self.request_timeout} s")
+		return {"network_id": network_id, "solver": solver, "strategy": strategy, "effort": effort, "IC": IC,
+				"optimality": optimality}
+
+	def evaluate(self, request: dict) -> dict:
+		if "strategy" not in request:
+			raise ValueError("Error: the request must contain \"strategy\"")
+
+		network_id, social_network = self.load(request)
+		effort, IC, applicable = evaluate_strategy(social_network, request["strategy"])
+		return {"network_id": network_id, "effort": effort, "IC": IC, "applicable": applicable}
+
+	def replace_pool(self, pool: ProcessPoolExecutor) -> None:
+		"""
+		Replaces a pool whose worker is stuck in a job that timed out (a running job cannot be cancelled) by
+		a new one, and kills its processes. Other jobs still running in that pool fail.
+		"""
+		with self.pool_lock:
+			if self.pool is not pool:
+				return # Already replaced after another timeout
+			self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up_worker)
+			self.batcher.pool = self.pool
+			self.pools_replaced += 1
+
+		# The executor has no public way to stop its workers
+		for process in list(pool._processes.values()):
+			process.kill()
+		pool.shutdown(wait=False, cancel_futures=True)
+
+	def shutdown(self) -> None:
+		self.pool.shutdown(cancel_futures=True)
+
+
+class SolverServer(ThreadingHTTPServer):
+	daemon_threads = True
+	# Many clients may connect at once when they send batches of small requests
+	request_queue_size = 128
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+	service: SolverService = None
+
+	def do_GET(self) -> None:
+		if self.path == "/metrics":
+			self.reply(200, self.service.metrics.snapshot())
+		elif self.path == "/health":
+			self.reply(200, {"status": "ok", "cached_networks": len(self.service.cache),
+							 "pools_replaced": self.service.pools_replaced})
+		else:
+			self.reply(404, {"error": f"Error: unknown endpoint {self.path}"})
+
+	def do_POST(self) -> None:
+		endpoints = {
+			"/load": lambda request: {"network_id": self.service.load(request)[0]},
+			"/solve": self.service.solve,
+			"/evaluate": self.service.evaluate,
+		}
+
+		if self.path not in endpoints:
+			self.reply(404, {"error": f"Error: unknown endpoint {self.path}"})
+			return
+
+		start_time = time.perf_counter()
+		failed = True
+		try:
+			length = int(self.headers.get("Content-Length", 0))
+			request = json.loads(self.rfile.read(length) or b"{}")
+			response = endpoints[self.path](request)
+			failed = False
+			self.reply(200, response)
+		except UnknownNetwork as e:
+			self.reply(404, {"error": str(e)})
+		except TimeoutError as e:
+			self.reply(504, {"error": str(e)})
+		except Exception as e:
+			self.reply(400, {"error": str(e)})
+		finally:
+			self.service.metrics.record(self.path, time.perf_counter() - start_time, failed)
+
+	def reply(self, status: int, body: dict) -> None:
+		data = json.dumps(body).encode()
+		self.send_response(status)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+
+	def log_message(self, format: str, *args) -> None:
+		pass # Requests are accounted in /metrics instead
+
+
+def create_server(host: str = "127.0.0.1", port: int = 8765, workers: int = os.cpu_count() or 1,
+				  cache_size: int = 32, batch_size: int = 64, batch_delay: float = 0.005,
+				  request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+				  max_strategies: int = DEFAULT_MAX_STRATEGIES) -> SolverServer:
+	"""
+	Creates the solver HTTP server. Call `serve_forever()` on the result to start serving, and
+	`shutdown()` followed by `server.service.shutdown()` to stop it.
+
+	Endpoints
+	---------
+	- POST /load: {"text" | "path"} -> {"network_id"}
+	- POST /solve: {"network_id" | "text" | "path", "solver", "epsilon" (FPTAS only)} -> {"strategy", "effort",
+	  "IC", "optimality", ...}
+	- POST /evaluate: {"network_id" | "text" | "path", "strategy"} -> {"effort", "IC", "applicable", ...}
+	- GET /metrics: per-endpoint request count, errors, mean/max latency and throughput.
+	- GET /health
+
+	A /solve request whose solver does not finish in `request_timeout` seconds fails with status 504, and
+	the worker pool is replaced so the stuck worker does not keep serving later requests. The exhaustive
+	solvers reject networks with more than `max_strategies` strategies.
+	"""
+	service = SolverService(workers, cache_size, batch_size, batch_delay, request_timeout, max_strategies)
+	handler = type("SolverRequestHandler", (RequestHandler,), {"service": service})
+	server = SolverServer((host, port), handler)
+	server.service = service
+	return server
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Local solver service for social network moderation.")
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=8765)
+	parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of warm worker processes.")
+	parser.add_argument("--cache-size", type=int, default=32, help="Number of networks kept in memory.")
+	parser.add_argument("--batch-size", type=int, default=64, help="Maximum number of greedy requests per batch.")
+	parser.add_argument("--batch-delay", type=float, default=0.005,
+						help="Seconds to wait for more greedy requests before sending a batch.")
+	parser.add_argument("--request-timeout", type=float, default=DEFAULT_REQUEST_TIMEOUT,
+						help="Seconds a /solve request waits for its solver.")
+	parser.add_argument("--max-strategies", type=int, default=DEFAULT_MAX_STRATEGIES,
+						help="Largest number of strategies the brute force solvers may enumerate.")
+	args = parser.parse_args()
+
+	server = create_server(args.host, args.port, args.workers, args.cache_size, args.batch_size, args.batch_delay,
+						   args.request_timeout, args.max_strategies)
+	print(f"Serving on http://{args.host}:{args.port}")
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.service.shutdown()